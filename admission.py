@@ -0,0 +1,167 @@
+"""Memory-bounded admission for renders running at the same time.
+
+Every render is charged an estimate of the memory it holds while it runs.
+A render starts only once its estimate fits beside those already running;
+otherwise it waits its turn (first come, first served) for up to
+RENDER_ADMISSION_WAIT seconds and is then rejected with RenderRejected. A
+burst of requests therefore queues instead of pushing the container past
+its memory limit. A render larger than the whole budget runs alone.
+
+Estimates come from the template: resident memory per concurrent render
+was measured at 5-7x the uncompressed XML for the python-docx path, up to
+2x for the fragment path and up to 2.5x for the streaming path, plus the
+output. benchmarks/bench_load.py checks a budget against peak RSS. With
+PROPOSAL_TRACE_MEMORY=1 each render's traced peak raises its template's
+estimate when it is higher. tracemalloc does not see lxml's own
+allocations, so a traced peak only ever raises an estimate; under
+concurrency it also counts other renders' allocations and errs high.
+
+Environment settings:
+    RENDER_MEMORY_MB        memory for renders in flight (default half the
+                            container's memory limit when there is one,
+                            otherwise unlimited; 0 disables admission)
+    RENDER_ADMISSION_WAIT   seconds a render may wait for memory (default 30)
+"""
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+
+from instrumentation import register_collector
+from template_cache import TEMPLATE_CACHE
+
+# Resident bytes per uncompressed XML byte while a render runs, by engine
+ENGINE_FACTORS = {"docx": 7, "fragments": 2, "stream": 3}
+_CGROUP_LIMITS = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+
+class RenderRejected(RuntimeError):
+    """Raised when a render waited too long for memory"""
+
+
+def container_memory_limit():
+    """The cgroup memory limit in bytes, or None when unlimited or unknown"""
+    for path in _CGROUP_LIMITS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge page-aligned number
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+class MemoryBudget:
+    """A weighted semaphore over bytes, charged per render from its estimate"""
+
+    def __init__(self, limit_bytes, max_wait=30.0, cache=TEMPLATE_CACHE):
+        self.limit = limit_bytes
+        self.max_wait = max_wait
+        self.cache = cache
+        self.in_use = 0
+        self.running = 0
+        self.rejected = 0
+        self._sizes = {}
+        self._learned = {}
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def estimate(self, template_path, engine):
+        """Bytes a render of this template with this engine is charged"""
+        digest = self.cache.digest(template_path)
+        sizes = self._sizes.get(digest)
+        if sizes is None:
+            with zipfile.ZipFile(template_path) as z:
+                xml = sum(info.file_size for info in z.infolist() if info.filename.endswith((".xml", ".rels")))
+            sizes = self._sizes[digest] = (xml, os.path.getsize(template_path))
+        xml, size = sizes
+        # The output buffer and the bytes copied out of it
+        estimate = xml * ENGINE_FACTORS[engine] + 2 * size
+        return max(estimate, self._learned.get((digest, engine), 0))
+
+    def learn(self, template_path, engine, peak_bytes):
+        """Raise the template's estimate to a measured peak"""
+        key = (self.cache.digest(template_path), engine)
+        if peak_bytes > self._learned.get(key, 0):
+            self._learned[key] = peak_bytes
+
+    @contextmanager
+    def admit(self, template_path, engine, timeout=None):
+        """Hold the render's share of the budget for the enclosed block"""
+        cost = min(self.estimate(template_path, engine), self.limit)
+        deadline = time.monotonic() + (self.max_wait if timeout is None else timeout)
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while self._waiters[0] is not ticket or self.in_use + cost > self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise RenderRejected("Not enough memory for another render right now, try again shortly")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                # The next in line may fit now, or may now be at the head
+                self._cond.notify_all()
+            self.in_use += cost
+            self.running += 1
+        try:
+            yield cost
+        finally:
+            with self._cond:
+                self.in_use -= cost
+                self.running -= 1
+                self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "limit_bytes": self.limit,
+                "in_use_bytes": self.in_use,
+                "running": self.running,
+                "waiting": len(self._waiters),
+                "rejected": self.rejected,
+            }
+
+
+def _from_env():
+    limit_mb = os.environ.get("RENDER_MEMORY_MB")
+    if limit_mb is None:
+        container = container_memory_limit()
+        limit = container // 2 if container else 0
+    else:
+        limit = int(float(limit_mb) * 1024 * 1024)
+    if limit <= 0:
+        return None
+    return MemoryBudget(limit, max_wait=float(os.environ.get("RENDER_ADMISSION_WAIT", 30)))
+
+
+RENDER_BUDGET = _from_env()
+
+
+def _budget_metrics():
+    if RENDER_BUDGET is None:
+        return ""
+    stats = RENDER_BUDGET.snapshot()
+    lines = [
+        "# HELP proposal_render_memory_bytes Render memory budget and the estimates currently admitted",
+        "# TYPE proposal_render_memory_bytes gauge",
+        f'proposal_render_memory_bytes{{kind="limit"}} {stats["limit_bytes"]}',
+        f'proposal_render_memory_bytes{{kind="in_use"}} {stats["in_use_bytes"]}',
+        "# HELP proposal_render_admission Renders running and waiting for memory",
+        "# TYPE proposal_render_admission gauge",
+        f'proposal_render_admission{{state="running"}} {stats["running"]}',
+        f'proposal_render_admission{{state="waiting"}} {stats["waiting"]}',
+        "# HELP proposal_render_rejected_total Renders rejected after waiting too long for memory",
+        "# TYPE proposal_render_rejected_total counter",
+        f"proposal_render_rejected_total {stats['rejected']}",
+    ]
+    return "\n".join(lines)
+
+
+register_collector(_budget_metrics)
@@ -0,0 +1,274 @@
+"""Headless HTTP rendering API for programmatic proposal requests.
+
+POST /render takes one JSON object shaped like a batch.py JSONL row and
+returns the rendered document:
+
+    {"proposal": "Make & CRM Automation", "client_name": "Acme",
+     "client_email": "ops@acme.com", "client_number": "+1 555 0100",
+     "country": "USA", "date": "2026-01-05", "currency": "USD",
+     "prices": {"M-Price": 1500, "C-Price": 900}, "team": {"P1": 1},
+     "output_format": "docx"}
+
+Renders run on a thread pool behind an asyncio semaphore and share the
+template cache, render cache and PDF pool with the Streamlit UI when both
+run in one process. Requests beyond the concurrency limit wait; once too
+many are waiting, or a render waited too long for memory (admission.py),
+the API answers 503 with Retry-After. A body with wrongly typed or
+negative fields, or text the document cannot hold, is answered 400, and a
+PDF conversion that times out, or waits too long for a LibreOffice
+worker, 504. Successful renders are recorded in the proposal history
+(history_store.py).
+
+A body listing "proposals" instead of one "proposal" renders a bundle
+(bundle.py): the proposals render in parallel and come back as a zip, or
+with "bundle": "docx" merged into one document. A bundle takes one
+concurrency slot.
+
+    python api.py --port 8000
+
+The API listens on 127.0.0.1 unless told otherwise. With PROPOSAL_API_TOKEN
+set, /render requires "Authorization: Bearer <token>". It refuses to listen
+on any other address without a token, unless --allow-unauthenticated (or
+PROPOSAL_API_ALLOW_UNAUTHENTICATED=1) says it is meant to be open, e.g.
+behind an authenticating proxy.
+
+Environment settings:
+    PROPOSAL_API_PORT          also serve the API from the Streamlit process
+    PROPOSAL_API_HOST          address to listen on (default 127.0.0.1)
+    PROPOSAL_API_TOKEN         bearer token /render requires
+    PROPOSAL_API_ALLOW_UNAUTHENTICATED
+                               1 to listen on a non-loopback address
+                               without a token
+    API_CONCURRENCY            renders running at once (default 4)
+    API_MAX_PENDING            requests allowed to wait for a slot (default 32)
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import threading
+from urllib.parse import quote
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from admission import RenderRejected
+from batch import _parse_date, resolve_bundle, resolve_row
+from bundle import ZIP_MIME, assemble_bundle, render_bundle
+from history_store import get_history_store
+from instrumentation import RenderTrace
+from pdf_pool import PDF_MIME, PdfConversionError, PdfPoolBusy, PdfTimeout, pdf_filename
+from prewarm import prewarm, prewarm_paths
+from proposal_config import PROPOSAL_CONFIG
+from renderer import DOCX_MIME, render_document, render_pdf
+from template_registry import get_template_registry
+
+
+class RenderLimiter:
+    """Bounds running renders and rejects requests once too many are waiting"""
+
+    def __init__(self, concurrency=4, max_pending=32):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        # Requests running or waiting for a slot
+        self.pending = 0
+        self._semaphore = None
+
+    @property
+    def slots(self):
+        # Created lazily so it binds to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+
+def _error(status, message, retry_after=None):
+    headers = {"Retry-After": str(retry_after)} if retry_after else None
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_exposure(host, token, allow_unauthenticated=False):
+    """Raise ValueError when host would expose the API to others without a token"""
+    if not token and not allow_unauthenticated and not _is_loopback(host):
+        raise ValueError(
+            f"Refusing to serve the API on {host} without PROPOSAL_API_TOKEN; "
+            "set a token or pass --allow-unauthenticated (PROPOSAL_API_ALLOW_UNAUTHENTICATED=1)"
+        )
+
+
+def _authorized(request):
+    token = request.app.state.token
+    if not token:
+        return True
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+def _render(selected_proposal, template_path, placeholders, output_format):
+    trace = RenderTrace(selected_proposal)
+    render = render_pdf if output_format == "pdf" else render_document
+    data = render(template_path, placeholders, trace=trace)
+    trace.finish(
+        output_format=output_format.upper(),
+        output_bytes=len(data),
+        cache_hit=trace.cache_hit,
+        source="api",
+    )
+    return data
+
+
+async def render_endpoint(request):
+    if not _authorized(request):
+        return JSONResponse({"error": "Missing or wrong API token"}, status_code=401,
+                            headers={"WWW-Authenticate": "Bearer"})
+    limiter = request.app.state.limiter
+    try:
+        row = json.loads(await request.body())
+        if not isinstance(row, dict):
+            raise ValueError("Request body must be a JSON object")
+        output_format = str(row.get("output_format") or "docx").lower()
+        if output_format not in ("docx", "pdf"):
+            raise ValueError(f"Unknown output_format: {output_format!r}")
+        bundle_format = None
+        if row.get("proposals"):
+            items, filename = resolve_bundle(row)
+            bundle_format = row.get("bundle") or "zip"
+            if output_format == "pdf" and bundle_format == "docx":
+                raise ValueError('A merged bundle is a .docx, use "bundle": "zip" for PDFs')
+        else:
+            selected_proposal, placeholders, filename = resolve_row(row)
+            items = [(selected_proposal, placeholders, filename)]
+    except ValueError as e:
+        return _error(400, str(e))
+    templates_dir = request.app.state.templates_dir
+
+    if limiter.pending >= limiter.concurrency + limiter.max_pending:
+        return _error(503, "Too many renders in progress, try again shortly", retry_after=1)
+    limiter.pending += 1
+    try:
+        async with limiter.slots:
+            if bundle_format:
+                files = await run_in_threadpool(
+                    render_bundle, items, templates_dir,
+                    lambda *args: _render(*args, output_format),
+                )
+            else:
+                template_path = os.path.join(templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"])
+                files = [(filename, await run_in_threadpool(
+                    _render, selected_proposal, template_path, placeholders, output_format,
+                ))]
+    except FileNotFoundError as e:
+        return _error(404, f"Template file not found: {os.path.basename(e.filename or '') or e}")
+    except ValueError as e:
+        # Input the renderer cannot write, e.g. control characters in a client name
+        return _error(400, str(e))
+    except (PdfPoolBusy, RenderRejected) as e:
+        return _error(503, str(e), retry_after=5)
+    except PdfTimeout as e:
+        return _error(504, str(e), retry_after=5)
+    except PdfConversionError as e:
+        return _error(502, f"PDF conversion failed: {e}")
+    finally:
+        limiter.pending -= 1
+
+    history = get_history_store()
+    if history is not None:
+        client = {"name": row.get("client_name", ""), "email": row.get("client_email", ""),
+                  "date": _parse_date(row.get("date"))}
+        for (selected_proposal, placeholders, _), (member_name, member) in zip(items, files):
+            if output_format == "pdf":
+                member_name = pdf_filename(member_name)
+            template_path = os.path.join(templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"])
+            history.record(selected_proposal, client, placeholders, output_format, member_name, template_path, member)
+
+    if bundle_format:
+        if output_format == "pdf":
+            files = [(pdf_filename(member_name), member) for member_name, member in files]
+        data = await run_in_threadpool(assemble_bundle, files, bundle_format)
+        mime = DOCX_MIME if bundle_format == "docx" else ZIP_MIME
+    elif output_format == "pdf":
+        data, filename, mime = files[0][1], pdf_filename(filename), PDF_MIME
+    else:
+        data, mime = files[0][1], DOCX_MIME
+    return Response(data, media_type=mime, headers={
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    })
+
+
+async def health_endpoint(request):
+    limiter = request.app.state.limiter
+    return JSONResponse({"status": "ok", "pending": limiter.pending, "concurrency": limiter.concurrency})
+
+
+def create_app(templates_dir=".", concurrency=None, max_pending=None, token=None):
+    """The API application; token defaults to PROPOSAL_API_TOKEN"""
+    app = Starlette(routes=[
+        Route("/render", render_endpoint, methods=["POST"]),
+        Route("/health", health_endpoint, methods=["GET"]),
+    ])
+    app.state.templates_dir = templates_dir
+    app.state.token = token if token is not None else os.environ.get("PROPOSAL_API_TOKEN") or None
+    app.state.limiter = RenderLimiter(
+        concurrency=concurrency or int(os.environ.get("API_CONCURRENCY", 4)),
+        max_pending=max_pending or int(os.environ.get("API_MAX_PENDING", 32)),
+    )
+    return app
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_api_server(port=None, host=None, templates_dir="."):
+    """Serve the API from a background thread once per process; a no-op without a port"""
+    global _server
+    port = port or os.environ.get("PROPOSAL_API_PORT")
+    if not port:
+        return None
+    host = host or os.environ.get("PROPOSAL_API_HOST") or "127.0.0.1"
+    with _server_lock:
+        if _server is None:
+            app = create_app(templates_dir)
+            check_exposure(host, app.state.token, os.environ.get("PROPOSAL_API_ALLOW_UNAUTHENTICATED") == "1")
+            config = uvicorn.Config(app, host=host, port=int(port), log_level="warning")
+            _server = uvicorn.Server(config)
+            threading.Thread(target=_server.run, daemon=True).start()
+        return _server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proposal rendering HTTP API")
+    parser.add_argument("--host", default=os.environ.get("PROPOSAL_API_HOST") or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--templates-dir", default=".", help="directory holding the .docx templates")
+    parser.add_argument("--allow-unauthenticated", action="store_true",
+                        default=os.environ.get("PROPOSAL_API_ALLOW_UNAUTHENTICATED") == "1",
+                        help="serve a non-loopback --host without PROPOSAL_API_TOKEN")
+    args = parser.parse_args()
+    app = create_app(args.templates_dir)
+    try:
+        check_exposure(args.host, app.state.token, args.allow_unauthenticated)
+    except ValueError as e:
+        parser.error(str(e))
+    get_template_registry(args.templates_dir)
+    # The first request should find its template warm
+    prewarm(prewarm_paths(args.templates_dir))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,272 +1,34 @@
 import streamlit as st
-from docx import Document
-from datetime import datetime
+from datetime import datetime, timedelta
+import logging
 import os
-from docx.oxml.ns import qn
-from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
-import uuid
-import tempfile
-
-# Proposal configurations
-PROPOSAL_CONFIG = {
-    "Make, Manychat & CRM Automation": {
-        "template": "Make, Manychat & CRM Automation.docx",
-        "pricing_fields": [
-            ("ManyChat Automation", "MC-Price"),
-            ("Make Automation", "M-Price"),
-            ("CRM Automations", "C-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Make & Manychat Automation": {
-        "template": "Make & Manychat Automation.docx",
-        "pricing_fields": [
-            ("ManyChat Automation", "MC-Price"),
-            ("Make Automation", "M-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Ai Calling, Make, Manychat and CRM Automation": {
-        "template": "Ai Calling, Make, Manychat and CRM Automation.docx",
-        "pricing_fields": [
-            ("AI Calling + CRM Integration", "AI-Price"),
-            ("ManyChat & Make Automation", "MM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Calling, Make & CRM Automation": {
-        "template": "AI Calling, Make & CRM Automation.docx",
-        "pricing_fields": [
-            ("AI Calling", "AI-Price"),
-            ("Make Automation", "M-Price"),
-            ("CRM Automations", "C-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Calling(Basic) & CRM Automation": {
-        "template": "AI Calling(Basic) & CRM Automation.docx",
-        "pricing_fields": [
-            ("AI Calling(Basic)", "AI-Price"),
-            ("CRM Automation", "CC-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Calling, Make & Manychat Automation": {
-        "template": "Ai Calling, Make & Manychat Automation.docx",
-        "pricing_fields": [
-            ("AI Calling(Basic)", "AI-Price"),
-            ("ManyChat Automation", "MC-Price"),
-            ("Make Automation", "M-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Ai Calling + CRM Intergration, Make & Manychat Automation, CRM Automation": {
-        "template": "Ai Calling + CRM Intergration, Make & Manychat Automation, CRM Automation.docx",
-        "pricing_fields": [
-            ("AI Calling + CRM Integration", "AI-Price"),
-            ("ManyChat & Make Automation", "MM-Price"),
-            ("CRM Automation", "CC-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Calling(Basic) & CRM Automation & Email Automation": {
-        "template": "AI Calling(Basic) & CRM Automation & Email Automation.docx",
-        "pricing_fields": [
-            ("AI Calling(Basic)", "AI-Price"),
-            ("CRM Automation", "CC-Price"),
-            ("Email Automation", "E-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Manychat & CRM Automation": {
-        "template": "Manychat & CRM Automation.docx",
-        "pricing_fields": [
-            ("ManyChat Automation", "MC-Price"),
-            ("CRM Automations", "C-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Make & CRM Automation": {
-        "template": "Make & CRM Automation.docx",
-        "pricing_fields": [
-            ("Make Automation", "M-Price"),
-            ("CRM Automations", "C-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Make, CRM Automation & AI Content Creation": {
-        "template": "Make, CRM Automation & AI Content Creation.docx",
-        "pricing_fields": [
-            ("Make Automation", "M-Price"),
-            ("CRM Automations", "C-Price"),
-            ("AI Content Creation", "ACC-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Automations Proposal and LPW": {
-        "template": "AI Automations Proposal and LPW.docx",
-        "pricing_fields": [
-            ("AI Calling with CRM Connection", "AI-Price"),
-            ("Landing Page Website", "Land-Price"),
-            ("ManyChat & Make Automation", "M&MC-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Calling with CRM Connection & Make": {
-        "template": "AI Calling with  CRM Connection & Make.docx",
-        "pricing_fields": [
-            ("AI Calling with CRM Connection", "AI with CRM-Price"),
-            ("Make Automation", "M-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "AI Based Search Engine Website": {
-        "template": "AI Based Search Engine Website Technical Consultation proposal.docx",
-        "pricing_fields": [
-            ("Design", "Design-Price"),
-            ("Development", "Dev-Price"),
-            ("Testing & Deployment", "TD-Price"),
-            ("Annual Maintenance", "AM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Community App": {
-        "template": "Community App Tech Proposal.docx",
-        "pricing_fields": [
-            ("Design", "Design-Price"),
-            ("AI/ML & Development", "AIML-Price"),
-            ("QA & Project Management", "QA-Price"),
-            ("Annual Maintenance", "AM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Job Portal Website": {
-        "template": "Job portal website Tech Proposal.docx",
-        "pricing_fields": [
-            ("Design", "Design-Price"),
-            ("Development", "Dev-Price"),
-            ("Automations", "Automation-Price"),
-            ("Testing & Deployment", "TD-Price"),
-            ("Annual Maintenance", "AM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Shopify Website": {
-        "template": "Shopify Website.docx",
-        "pricing_fields": [
-            ("Development", "Dev-Price"),
-            ("Design", "Design-Price"),
-            ("Testing and Live", "Testing-Price"),
-            ("Annual Maintenance", "AM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Single Vendor Ecommerce Website": {
-        "template": "Single Vendor Ecommerce website.docx",
-        "pricing_fields": [
-            ("Development", "Dev-Price"),
-            ("Design", "Design-Price"),
-            ("Website Bot", "WB-Price"),
-            ("Testing and Deployment", "TD-Price"),
-            ("Annual Maintenance", "AM-Price")
-        ],
-        "team_type": "general",
-        "special_fields": [("VDate", "<<")]
-    },
-    "Web Based AI Fintech Proposal": {
-    "template": "Web based AI Fintech proposal.docx",
-    "pricing_fields": [
-        ("Development", "Dev-Price"),
-        ("Design", "Design-Price"),
-        ("AI/ML Models", "AIML-Price"),
-        ("Annual Maintenance", "AM-Price")
-    ],
-    "team_type": "general",
-    "special_fields": [("VDate", "<<")]
-}
-}
-
-def apply_formatting(new_run, original_run):
-    """Copy formatting from original run to new run"""
-    if original_run.font.name:
-        new_run.font.name = original_run.font.name
-        new_run._element.rPr.rFonts.set(qn('w:eastAsia'), original_run.font.name)
-    if original_run.font.size:
-        new_run.font.size = original_run.font.size
-    if original_run.font.color.rgb:
-        new_run.font.color.rgb = original_run.font.color.rgb
-    new_run.bold = original_run.bold
-    new_run.italic = original_run.italic
-
-def replace_in_paragraph(para, placeholders):
-    """Handle paragraph replacements preserving formatting"""
-    original_runs = para.runs.copy()
-    full_text = para.text
-    for ph, value in placeholders.items():
-        full_text = full_text.replace(ph, str(value))
-
-    if full_text != para.text:
-        para.clear()
-        new_run = para.add_run(full_text)
-        if original_runs:
-            original_run = next((r for r in original_runs if r.text), None)
-            if original_run:
-                apply_formatting(new_run, original_run)
-
-def replace_and_format(doc, placeholders):
-    """Enhanced replacement with table cell handling"""
-    # Process paragraphs
-    for para in doc.paragraphs:
-        replace_in_paragraph(para, placeholders)
-
-    # Process tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                if cell.tables:
-                    for nested_table in cell.tables:
-                        for nested_row in nested_table.rows:
-                            for nested_cell in nested_row.cells:
-                                for para in nested_cell.paragraphs:
-                                    replace_in_paragraph(para, placeholders)
-                else:
-                    for para in cell.paragraphs:
-                        replace_in_paragraph(para, placeholders)
-                cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-    return doc
+import threading
+import time
+from contextlib import nullcontext
+from render_cache import RENDER_CACHE
+from instrumentation import start_metrics_server
+from pdf_pool import pdf_filename, PDF_MIME
+from history_store import get_history_store, TemplateChanged
+from proposal_config import PROPOSAL_CONFIG, MATRIX_2X2_TEMPLATES, MARKETING_TEAM_ROLES, GENERAL_TEAM_ROLES
+from pricing import scenario_grid
+from proposals import (
+    validate_phone_number, build_placeholders, bundle_placeholders, proposal_filename
+)
+
+# python-docx, lxml and the render engines are imported where they are used, or by the
+# boot thread, so the first page does not wait for them
+
+logger = logging.getLogger("proposal.app")
+
+JOB_POLL_SECONDS = 0.5
 
 def get_marketing_team_details():
     """Collect team composition details specifically for marketing proposals"""
     st.subheader("Marketing Team Composition")
-    team_roles = {
-        "Project Manager": "PM",
-        "Content Writers": "CW",
-        "Graphic Designer": "GD",
-        "SEO Specialists": "SE",
-        "Social Media Manager": "SM",
-        "Ad Campaign Manager": "AC"
-    }
     team_details = {}
     cols = st.columns(3)
 
-    for idx, (role, placeholder) in enumerate(team_roles.items()):
+    for idx, (role, placeholder) in enumerate(MARKETING_TEAM_ROLES.items()):
         with cols[idx % 3]:
             count = st.number_input(
                 f"{role} Count:",
@@ -274,26 +36,16 @@ def get_marketing_team_details():
                 step=1,
                 key=f"marketing_team_{placeholder}"
             )
-            team_details[f"<<{placeholder}>>"] = str(count)
+            team_details[placeholder] = count
     return team_details
 
 def get_general_team_details():
     """Collect team composition for non-marketing proposals"""
     st.subheader("Team Composition")
-    team_roles = {
-        "Project Manager": "P1",
-        "Frontend Developers": "F1",
-        "Business Analyst": "B1",
-        "AI/ML Developers": "A1",
-        "UI/UX Members": "U1",
-        "System Architect": "S1",
-        "Backend Developers": "BD1",
-        "AWS Developer": "AD1"
-    }
     team_details = {}
     cols = st.columns(2)
 
-    for idx, (role, placeholder) in enumerate(team_roles.items()):
+    for idx, (role, placeholder) in enumerate(GENERAL_TEAM_ROLES.items()):
         with cols[idx % 2]:
             count = st.number_input(
                 f"{role} Count:",
@@ -301,323 +53,450 @@ def get_general_team_details():
                 step=1,
                 key=f"team_{placeholder}"
             )
-            team_details[f"<<{placeholder}>>"] = str(count)
+            team_details[placeholder] = count
     return team_details
 
-def remove_empty_rows(table):
-    """Remove rows from the table where the second cell is empty or has no value."""
-    rows_to_remove = []
-    for row in table.rows:
-        if len(row.cells) > 1 and row.cells[1].text.strip() == "":
-            rows_to_remove.append(row)
-    # Remove rows in reverse order to avoid index issues
-    for row in reversed(rows_to_remove):
-        table._tbl.remove(row._element)
-
-def validate_phone_number(country, phone_number):
-    """Validate phone number based on country"""
-    if country.lower() == "india":
-        if not phone_number.startswith("+91"):
-            return False
-    else:
-        if not phone_number.startswith("+1"):
-            return False
-    return True
-
-def format_number_with_commas(number):
-    """Format number with commas (e.g., 10000 -> 10,000)"""
-    return f"{number:,}"
+@st.cache_resource
+def start_shared_services():
+    """Process-wide services, started once in a background thread and shared by every session.
+
+    The first page does not wait for them: the template registry appears in
+    the returned dict once every template is checked.
+    """
+    services = {}
+
+    def boot():
+        try:
+            from api import start_api_server
+            from job_queue import get_job_queue
+            from prewarm import prewarm, prewarm_paths
+            from template_registry import get_template_registry
+
+            start_metrics_server()
+            # Render workers start first, and prewarm in their own processes meanwhile
+            get_job_queue()
+            services["registry"] = get_template_registry(os.getcwd())
+            start_api_server()
+            prewarm(prewarm_paths(os.getcwd()))
+        except Exception as e:
+            logger.exception("Startup failed")
+            services["error"] = e
+
+    threading.Thread(target=boot, name="boot", daemon=True).start()
+    return services
+
+@st.cache_resource(max_entries=32)
+def warm_template(template_path):
+    """Prewarm a template in the background as soon as it is selected, shared by every session"""
+    from prewarm import prewarm
+
+    threading.Thread(target=prewarm, args=([template_path],), daemon=True).start()
+
+@st.cache_data(max_entries=256)
+def what_if_grid(selected_proposal, prices, currency, max_discount, usd_to_inr):
+    """Priced what-if scenarios for the submitted prices, as table columns"""
+    other_currency = "INR" if currency == "USD" else "USD"
+    grid = scenario_grid(
+        selected_proposal,
+        dict(prices),
+        discounts=[d / 100 for d in range(0, max_discount + 1, 5)],
+        currencies=[currency, other_currency],
+        fx_rates={other_currency: usd_to_inr if other_currency == "INR" else 1 / usd_to_inr}
+    )
+    return {
+        "Discount (%)": grid["discount_rate"] * 100,
+        "Currency": grid["currency"],
+        "Services": grid["services"],
+        "Discount": grid["discount"],
+        "Annual Maintenance": grid["maintenance"],
+        "Total": grid["total"]
+    }
 
 def generate_document():
+    services = start_shared_services()
     st.title("Proposal Generator")
     base_dir = os.getcwd()
+    if "error" in services:
+        st.error(f"Startup failed: {services['error']}")
 
+    # Selection and currency change the form layout, so they stay outside the form
     selected_proposal = st.selectbox("Select Proposal", list(PROPOSAL_CONFIG.keys()))
-    
-    
-    matrix_2x2_templates = [
-    "AI Based Search Engine Website",
-    "Community App",
-    "Job Portal Website",
-    "Shopify Website",
-    "Single Vendor Ecommerce Website",
-    "Web Based AI Fintech Proposal"
-]
-
-
-    is_matrix_2x2 = selected_proposal in matrix_2x2_templates
-
-    
-    
-    
-    
-    config = PROPOSAL_CONFIG[selected_proposal]
-    template_path = os.path.join(base_dir, config["template"])
-
-    # Client Information
-    col1, col2 = st.columns(2)
-    with col1:
-        client_name = st.text_input("Client Name:")
-        client_email = st.text_input("Client Email:")
-    with col2:
-        country = st.text_input("Country:")
-        client_number = st.text_input("Client Number:")
-        if client_number and country:
-            if not validate_phone_number(country, client_number):
-                st.error(f"Phone number for {country} should start with {'+91' if country.lower() == 'india' else '+1'}")
-
-    date_field = st.date_input("Date:", datetime.today())
-
-    # Currency Handling
+    bundle_with = st.multiselect(
+        "Bundle With", [name for name in PROPOSAL_CONFIG if name != selected_proposal],
+        help="Other proposals for the same client, generated together as a zip or a single document"
+    )
     currency = st.selectbox("Select Currency", ["USD", "INR"])
-    currency_symbol = "$" if currency == "USD" else "₹"
-
-    # Special Fields Handling
-    special_data = {}
-    if config.get("special_fields"):
-        st.subheader("Additional Details")
-        for field, wrapper in config["special_fields"]:
-            if wrapper == "<<":
-                placeholder = f"<<{field}>>"
-                if field == "VDate":
-                    vdate = st.date_input("Proposal Validity Until:")
-                    special_data[placeholder] = vdate.strftime("%d-%m-%Y")
-                else:
-                    special_data[placeholder] = st.text_input(f"{field.replace('_', ' ').title()}:")
-
-    # Pricing Section
-    st.subheader("Pricing Details")
-    pricing_data = {}
-    numerical_values = {}  # To store raw numerical values for calculations
-
-    # Determine number of columns based on selected proposal
-    if is_matrix_2x2:
-        cols = st.columns(2)
-    else:
-        num_pricing_fields = len(config["pricing_fields"])
-        cols = st.columns(num_pricing_fields)
 
+    bundle_proposals = [selected_proposal] + bundle_with
+    configs = [PROPOSAL_CONFIG[name] for name in bundle_proposals]
+    is_matrix_2x2 = all(name in MATRIX_2X2_TEMPLATES for name in bundle_proposals)
 
-    # Collect base services input
-    for idx, (label, key) in enumerate(config["pricing_fields"]):
-        with cols[idx % len(cols)]:
-            value = st.number_input(
-                f"{label} ({currency})",
-                min_value=0,
-                value=0,
-                step=100,
-                format="%d",
-                key=f"price_{key}"
-            )
-            numerical_values[key] = value
-            # Only add to pricing_data if the value is greater than 0
-            if value > 0:
-                pricing_data[f"<<{key}>>"] = f"{currency_symbol}{format_number_with_commas(value)}"
+    config = PROPOSAL_CONFIG[selected_proposal]
+    template_path = os.path.join(base_dir, config["template"])
+    warm_template(template_path)
+    registry = services.get("registry")
+    report = registry.reports.get(selected_proposal) if registry is not None else None
+    if report is not None and report.error:
+        st.warning(f"Template problem: {report.error} ({report.template})")
+    elif report is not None and report.missing:
+        st.warning(f"{report.template} has no {', '.join(sorted(report.missing))}; those values will not appear.")
+
+    # Edits inside the form do not rerun the script; everything is submitted at once
+    with st.form("proposal_form"):
+        # Client Information
+        col1, col2 = st.columns(2)
+        with col1:
+            client_name = st.text_input("Client Name:")
+            client_email = st.text_input("Client Email:")
+        with col2:
+            country = st.text_input("Country:")
+            client_number = st.text_input("Client Number:")
+
+        date_field = st.date_input("Date:", datetime.today())
+
+        # Special Fields Handling
+        special_values = {}
+        special_fields = list(dict.fromkeys(field for c in configs for field in c.get("special_fields", [])))
+        if special_fields:
+            st.subheader("Additional Details")
+            for field, wrapper in special_fields:
+                if wrapper == "<<":
+                    if field == "VDate":
+                        special_values[field] = st.date_input("Proposal Validity Until:")
+                    else:
+                        special_values[field] = st.text_input(f"{field.replace('_', ' ').title()}:")
+
+        # Pricing Section
+        numerical_values = {}  # To store raw numerical values for calculations
+
+        # Every bundled proposal's prices, each key once (proposals sharing a key share its price)
+        pricing_fields = list({key: (label, key) for c in configs for label, key in c["pricing_fields"]}.values())
+
+        # A proposal may have no prices at all; st.columns(0) would raise
+        if pricing_fields:
+            st.subheader("Pricing Details")
+
+            # Determine number of columns based on selected proposal
+            if is_matrix_2x2:
+                cols = st.columns(2)
             else:
-                pricing_data[f"<<{key}>>"] = ""  # Empty value for fields with zero values
-
-    # Calculate Total Amount
-    if selected_proposal == "Make, Manychat & CRM Automation":
-        services_sum = sum([
-            numerical_values.get("MC-Price", 0),
-            numerical_values.get("M-Price", 0),
-            numerical_values.get("C-Price", 0)
-        ])
-    elif selected_proposal == "Make & Manychat Automation":
-        services_sum = sum([
-            numerical_values.get("MC-Price", 0),
-            numerical_values.get("M-Price", 0)
-        ])
-    elif selected_proposal == "Ai Calling, Make, Manychat and CRM Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("MM-Price", 0)
-        ])
-    elif selected_proposal == "AI Calling, Make & CRM Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("M-Price", 0),
-            numerical_values.get("C-Price", 0)
-        ])
-    elif selected_proposal == "AI Calling(Basic) & CRM Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("CC-Price", 0)
-        ])
-    elif selected_proposal == "AI Calling, Make & Manychat Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("MC-Price", 0),
-            numerical_values.get("M-Price", 0)
-        ])
-    elif selected_proposal == "Ai Calling + CRM Intergration, Make & Manychat Automation, CRM Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("MM-Price", 0),
-            numerical_values.get("CC-Price", 0)
-        ])
-    elif selected_proposal == "AI Calling(Basic) & CRM Automation & Email Automation":
-        services_sum = sum([
-            numerical_values.get("AI-Price", 0),
-            numerical_values.get("CC-Price", 0),
-            numerical_values.get("E-Price", 0)
-        ])
-    elif selected_proposal == "Manychat & CRM Automation":
-        services_sum = sum([
-            numerical_values.get("MC-Price", 0),
-            numerical_values.get("C-Price", 0)
-        ])
-    elif selected_proposal == "Make & CRM Automation":
-        services_sum = sum([
-            numerical_values.get("M-Price", 0),
-            numerical_values.get("C-Price", 0)
-        ])
-    elif selected_proposal == "Make, CRM Automation & AI Content Creation":
-        services_sum = sum([
-            numerical_values.get("M-Price", 0),
-            numerical_values.get("C-Price", 0),
-            numerical_values.get("ACC-Price", 0)
-        ])
-    elif selected_proposal == "AI Automations Proposal and LPW":
-        services_sum = sum([
-        numerical_values.get("AI-Price", 0),
-        numerical_values.get("Land-Price", 0),
-        numerical_values.get("M&MC-Price", 0)
-    ])
-    elif selected_proposal == "AI Calling with CRM Connection & Make":
-        services_sum = sum([
-        numerical_values.get("AI with CRM-Price", 0),
-        numerical_values.get("M-Price", 0)
-    ])
-    elif selected_proposal == "AI Based Search Engine Website":
-        services_sum = sum([
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("Dev-Price", 0),
-        numerical_values.get("TD-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-    elif selected_proposal == "Community App":
-        services_sum = sum([
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("AIML-Price", 0),
-        numerical_values.get("QA-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-    elif selected_proposal == "Job Portal Website":
-        services_sum = sum([
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("Dev-Price", 0),
-        numerical_values.get("Automation-Price", 0),
-        numerical_values.get("TD-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-    elif selected_proposal == "Shopify Website":
-        services_sum = sum([
-        numerical_values.get("Dev-Price", 0),
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("Testing-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-    elif selected_proposal == "Single Vendor Ecommerce Website":
-        services_sum = sum([
-        numerical_values.get("Dev-Price", 0),
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("WB-Price", 0),
-        numerical_values.get("TD-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-    elif selected_proposal == "Web Based AI Fintech Proposal":
-        services_sum = sum([
-        numerical_values.get("Dev-Price", 0),
-        numerical_values.get("Design-Price", 0),
-        numerical_values.get("AIML-Price", 0),
-        numerical_values.get("AM-Price", 0)
-    ])
-
-    
-
-    # Annual Maintenance (10% of Total Amount)
-    am_price = int(services_sum * 0.10)
-    pricing_data["<<AM-Price>>"] = f"{currency_symbol}{format_number_with_commas(am_price)}"
-
-    # Total Amount
-    total = services_sum + am_price
-    if currency == "INR":
-        pricing_data["<<T-Price>>"] = f"{currency_symbol}{format_number_with_commas(total)} + 18% GST"
-    else:
-        pricing_data["<<T-Price>>"] = f"{currency_symbol}{format_number_with_commas(total)}"
-
-    # Additional Features & Enhancements
-    af_price = 250 if currency == "USD" else 25000
-    pricing_data["<<AF-Price>>"] = f"{currency_symbol}{format_number_with_commas(af_price)}"
-
-    # Team Composition
-    team_data = {}
-    if config["team_type"] == "marketing":
-        team_data = get_marketing_team_details()
-    elif config["team_type"] == "general":
-        team_data = get_general_team_details()
-
-    # Add Additional Tools Section
-    additional_tools_data = {}
-    if not is_matrix_2x2:
-        st.subheader("Add Additional Tools")
-        additional_tool_1 = st.text_input("Tool 1:")
-        additional_tool_2 = st.text_input("Tool 2:")
-        
-        additional_tools_data["<<T1>>"] = additional_tool_1 if additional_tool_1 else ""
-        additional_tools_data["<<T2>>"] = additional_tool_2 if additional_tool_2 else ""
-    else:
-        additional_tools_data["<<T1>>"] = ""
-        additional_tools_data["<<T2>>"] = ""   
+                num_pricing_fields = min(len(pricing_fields), 5)
+                cols = st.columns(num_pricing_fields)
+
+            # Collect base services input
+            for idx, (label, key) in enumerate(pricing_fields):
+                with cols[idx % len(cols)]:
+                    value = st.number_input(
+                        f"{label} ({currency})",
+                        min_value=0,
+                        value=0,
+                        step=100,
+                        format="%d",
+                        key=f"price_{key}"
+                    )
+                    numerical_values[key] = value
+
+        # Team Composition
+        team_counts = {}
+        team_types = {c["team_type"] for c in configs}
+        if "marketing" in team_types:
+            team_counts.update(get_marketing_team_details())
+        if "general" in team_types:
+            team_counts.update(get_general_team_details())
+
+        # Add Additional Tools Section
+        tools = ("", "")
+        if not is_matrix_2x2:
+            st.subheader("Add Additional Tools")
+            additional_tool_1 = st.text_input("Tool 1:")
+            additional_tool_2 = st.text_input("Tool 2:")
+            tools = (additional_tool_1, additional_tool_2)
+
+        output_format = st.radio("Output Format", ["DOCX", "PDF"], horizontal=True)
+        bundle_format = "zip"
+        if bundle_with:
+            bundle_as = st.radio("Bundle As", ["ZIP", "Single DOCX"], horizontal=True,
+                                 help="A single document merges the proposals, as DOCX whatever the output format")
+            bundle_format = "docx" if bundle_as == "Single DOCX" else "zip"
+
+        submit_col, preview_col = st.columns(2)
+        with submit_col:
+            generate = st.form_submit_button("Generate Proposal")
+        with preview_col:
+            st.form_submit_button("Update Preview")
+
+    # What-if pricing across discounts and currencies, priced in one batch
+    if pricing_fields:
+        with st.expander("What-if Pricing"):
+            with st.form("what_if_form"):
+                max_discount = st.slider("Max Discount (%)", min_value=0, max_value=50, value=20, step=5)
+                usd_to_inr = st.number_input("USD to INR Rate", min_value=1.0, value=83.0, step=0.5)
+                st.form_submit_button("Update What-if")
+            st.dataframe(
+                what_if_grid(selected_proposal, tuple(numerical_values.items()), currency, max_discount, usd_to_inr),
+                hide_index=True
+            )
 
     # Combine all placeholders
-    placeholders = {
-        "<<Client Name>>": client_name,
-        "<<Client Email>>": client_email,
-        "<<Client Number>>": client_number,
-        "<<Date>>": date_field.strftime("%d-%m-%Y"),
-        "<<Country>>": country
+    client = {
+        "name": client_name,
+        "email": client_email,
+        "number": client_number,
+        "country": country,
+        "date": date_field
     }
-    placeholders.update(pricing_data)
-    placeholders.update(team_data)
-    placeholders.update(special_data)
-    placeholders.update(additional_tools_data)
+    if bundle_with:
+        # The client and team placeholders are resolved once for the whole bundle
+        bundle = bundle_placeholders(
+            bundle_proposals, client, numerical_values, currency,
+            team_counts=team_counts, special_values=special_values, tools=tools
+        )
+        placeholders = bundle[selected_proposal]
+    else:
+        placeholders = build_placeholders(
+            selected_proposal, client, numerical_values, currency,
+            team_counts=team_counts, special_values=special_values, tools=tools
+        )
+
+    # Filled from a per-template HTML skeleton, so no document is built per edit
+    if st.toggle("Show document preview"):
+        from html_preview import PREVIEW_STORE
+
+        started = time.perf_counter()
+        try:
+            preview = PREVIEW_STORE.render(template_path, placeholders)
+        except FileNotFoundError:
+            st.info("The template file is missing, so there is nothing to preview.")
+        else:
+            st.caption(f"Preview updated in {(time.perf_counter() - started) * 1000:.1f} ms. "
+                       "Headers, footers and images are not shown.")
+            with st.container(height=600):
+                st.html(preview)
 
-    if st.button("Generate Proposal"):
+    if generate:
         if client_number and country and not validate_phone_number(country, client_number):
             st.error(f"Invalid phone number format for {country} should start with {'+91' if country.lower() == 'india' else '+1'}.")
+        elif bundle_with:
+            generate_bundle(base_dir, bundle, output_format, bundle_format, client)
         else:
-            formatted_date = date_field.strftime("%d-%m-%Y")
-            if selected_proposal == "AI Automations Proposal and LPW":
-                doc_filename = f"AI Automations Proposal and LPW - {client_name} {formatted_date}.docx"
-            else:
-                doc_filename = f"AI Automations Proposal - {client_name} {formatted_date}.docx"
-
-
-            with tempfile.TemporaryDirectory() as temp_dir:
-                try:
-                    doc = Document(template_path)
-                except FileNotFoundError:
-                    st.error(f"Template file not found: {template_path}")
-                    return
-
-                doc = replace_and_format(doc, placeholders)
-
-                # Remove empty rows from the pricing table
-                for table in doc.tables:
-                    remove_empty_rows(table)
+            generate_proposal(selected_proposal, template_path, placeholders, output_format,
+                              proposal_filename(selected_proposal, client_name, date_field), client)
+
+    if "job" in st.session_state:
+        st.fragment(run_every=JOB_POLL_SECONDS)(poll_job)()
+    if "bundle" in st.session_state:
+        st.fragment(run_every=JOB_POLL_SECONDS)(poll_bundle)()
+    job_error = st.session_state.pop("job_error", None)
+    if job_error:
+        st.error(job_error)
+
+    # The last generated document survives reruns, so it is never rendered twice
+    generated = st.session_state.get("generated")
+    if generated:
+        # A job just handed over still has its render trace open
+        job = generated.pop("job", None)
+        with job.trace.stage("download_handoff") if job else nullcontext():
+            st.download_button(
+                label=generated.get("label", "Download Proposal"),
+                data=generated["data"],
+                file_name=generated["file_name"],
+                mime=generated["mime"]
+            )
+        if job:
+            job.finish_trace()
+
+    show_history(base_dir)
+
+    if RENDER_CACHE is not None:
+        stats = RENDER_CACHE.snapshot()
+        st.sidebar.caption(f"Render cache: {stats['hits']} hits, {stats['misses']} misses")
+
+def show_history(base_dir, page_size=20, recent_days=90):
+    """Searchable list of past generations; a selected one can be downloaded again"""
+    history = get_history_store()
+    if history is None:
+        return
+    with st.expander("Proposal History"):
+        search_col, proposal_col, dates_col, page_col = st.columns([3, 3, 3, 1])
+        with search_col:
+            text = st.text_input("Client name or email starts with", key="history_text")
+        with proposal_col:
+            proposal = st.selectbox("Proposal type", ["All"] + list(PROPOSAL_CONFIG), key="history_proposal")
+        with dates_col:
+            today = datetime.today().date()
+            # A tuple of one date while the end of the range is being picked
+            dates = st.date_input("Proposal dates", (today - timedelta(days=recent_days), today),
+                                  key="history_dates")
+        with page_col:
+            page = st.number_input("Page", min_value=1, value=1, step=1, key="history_page")
+
+        date_from, date_to = (tuple(dates) + (None, None))[:2]
+        entries, total = history.search(text, None if proposal == "All" else proposal, date_from, date_to,
+                                        page=page - 1, page_size=page_size)
+        st.caption(f"{total} proposals, page {page} of {max(1, -(-total // page_size))}")
+        if not entries:
+            return
+        selection = st.dataframe(
+            {
+                "Generated": [e.created_at for e in entries],
+                "Proposal": [e.proposal for e in entries],
+                "Client": [e.client_name for e in entries],
+                "Email": [e.client_email for e in entries],
+                "Date": [e.proposal_date for e in entries],
+                "Format": [e.output_format.upper() for e in entries],
+                "KB": [e.size // 1024 for e in entries],
+            },
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="history_table",
+        )
+        rows = selection.selection.rows
+        if not rows:
+            return
+        entry = entries[rows[0]]
+        try:
+            data = history.download(entry, base_dir)
+        except FileNotFoundError:
+            st.warning(f"{entry.file_name} was not stored and its template {entry.template} is gone.")
+            return
+        except TemplateChanged:
+            st.warning(f"{entry.file_name} was not stored and its template {entry.template} has changed "
+                       "since, so it cannot be generated again as it was sent.")
+            return
+        from renderer import DOCX_MIME
+
+        st.download_button(
+            label=f"Download {entry.file_name}",
+            data=data,
+            file_name=entry.file_name,
+            mime=PDF_MIME if entry.output_format == "pdf" else DOCX_MIME,
+            key="history_download",
+        )
+
+def generate_proposal(selected_proposal, template_path, placeholders, output_format, doc_filename, client):
+    """Queue the render as a background job, unless identical input is done or in flight"""
+    from job_queue import get_job_queue, JobQueueFull
+    from renderer import DOCX_MIME
+
+    memo_key = (template_path, output_format, tuple(sorted(placeholders.items())))
+    for state in ("generated", "job"):
+        if state in st.session_state and st.session_state[state]["key"] == memo_key:
+            return
+
+    try:
+        job_id = get_job_queue().submit(selected_proposal, template_path, placeholders, output_format, handoff=True)
+    except JobQueueFull as e:
+        st.warning(str(e))
+        return
+    st.session_state["job"] = {
+        "id": job_id,
+        "key": memo_key,
+        "file_name": pdf_filename(doc_filename) if output_format == "PDF" else doc_filename,
+        "mime": PDF_MIME if output_format == "PDF" else DOCX_MIME,
+        "client": client
+    }
 
-                doc_path = os.path.join(temp_dir, doc_filename)
-                doc.save(doc_path)
+def poll_job():
+    """Show the pending job's status; hand the result to the page once it finishes"""
+    from job_queue import get_job_queue, QUEUED, ADMITTING, DONE
+
+    pending = st.session_state["job"]
+    job = get_job_queue().get(pending["id"])
+    if job is not None and not job.done:
+        st.info({QUEUED: "Waiting for a free worker...", ADMITTING: "Waiting for memory to free up..."}
+                .get(job.status, "Generating proposal..."))
+        return
+
+    del st.session_state["job"]
+    # The session keeps the document from here on
+    get_job_queue().release(pending["id"])
+    if job is None:
+        st.session_state["job_error"] = "The proposal job expired, please generate it again."
+    elif job.status == DONE:
+        history = get_history_store()
+        if history is not None:
+            history.record(job.proposal_type, pending["client"], job.placeholders, job.output_format,
+                           pending["file_name"], job.template_path, job.result)
+        st.session_state["generated"] = {
+            "key": pending["key"],
+            "data": job.result,
+            "file_name": pending["file_name"],
+            "mime": pending["mime"],
+            "job": job
+        }
+    else:
+        st.session_state["job_error"] = job.error
+    st.rerun()
+
+def generate_bundle(base_dir, bundle, output_format, bundle_format, client):
+    """Queue one job per proposal of the bundle, so the render workers render them in parallel"""
+    from bundle import ZIP_MIME, bundle_filename, bundle_member_name
+    from job_queue import get_job_queue, JobQueueFull
+    from renderer import DOCX_MIME
+
+    if bundle_format == "docx":
+        output_format = "DOCX"
+    memo_key = (bundle_format, output_format,
+                tuple((name, tuple(sorted(placeholders.items()))) for name, placeholders in bundle.items()))
+    for state in ("generated", "bundle"):
+        if state in st.session_state and st.session_state[state]["key"] == memo_key:
+            return
+
+    job_ids, file_names = [], []
+    try:
+        for name, placeholders in bundle.items():
+            template_path = os.path.join(base_dir, PROPOSAL_CONFIG[name]["template"])
+            job_ids.append(get_job_queue().submit(name, template_path, placeholders, output_format))
+            file_name = bundle_member_name(name, client["name"], client["date"])
+            file_names.append(pdf_filename(file_name) if output_format == "PDF" else file_name)
+    except JobQueueFull as e:
+        st.warning(str(e))
+        return
+    st.session_state["bundle"] = {
+        "ids": job_ids,
+        "key": memo_key,
+        "file_names": file_names,
+        "format": bundle_format,
+        "file_name": bundle_filename(client["name"], client["date"], bundle_format),
+        "mime": DOCX_MIME if bundle_format == "docx" else ZIP_MIME,
+        "client": client
+    }
 
-                with open(doc_path, "rb") as f:
-                    st.download_button(
-                        label="Download Proposal",
-                        data=f,
-                        file_name=doc_filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+def poll_bundle():
+    """Show the pending bundle's progress; assemble it once every proposal is rendered"""
+    from bundle import assemble_bundle
+    from job_queue import get_job_queue, DONE
+
+    pending = st.session_state["bundle"]
+    jobs = [get_job_queue().get(job_id) for job_id in pending["ids"]]
+    finished = sum(job is None or job.done for job in jobs)
+    if finished < len(jobs):
+        st.info(f"Generating proposals... {finished} of {len(jobs)} done")
+        return
+
+    del st.session_state["bundle"]
+    for job_id in pending["ids"]:
+        get_job_queue().release(job_id)
+    if any(job is None for job in jobs):
+        st.session_state["job_error"] = "A proposal job expired, please generate the bundle again."
+    elif any(job.status != DONE for job in jobs):
+        st.session_state["job_error"] = next(f"{job.proposal_type}: {job.error}" for job in jobs if job.status != DONE)
+    else:
+        history = get_history_store()
+        if history is not None:
+            for job, file_name in zip(jobs, pending["file_names"]):
+                history.record(job.proposal_type, pending["client"], job.placeholders, job.output_format,
+                               file_name, job.template_path, job.result)
+        st.session_state["generated"] = {
+            "key": pending["key"],
+            "data": assemble_bundle([(file_name, job.result) for job, file_name in zip(jobs, pending["file_names"])],
+                                    pending["format"]),
+            "file_name": pending["file_name"],
+            "mime": pending["mime"],
+            "label": "Download Bundle"
+        }
+    st.rerun()
 
 if __name__ == "__main__":
     generate_document()
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""Generate many proposals headlessly from a CSV or JSONL file of client rows.
+
+Each row names a proposal type from PROPOSAL_CONFIG plus the client block.
+Prices use the pricing field keys (e.g. M-Price), team counts use the role
+codes (e.g. P1), and dates are ISO formatted (YYYY-MM-DD):
+
+    proposal,client_name,client_email,client_number,country,date,currency,VDate,M-Price,C-Price,P1
+    Make & CRM Automation,Acme,ops@acme.com,+1 555 0100,USA,2026-01-05,USD,2026-02-05,1500,900,1
+
+JSONL rows may also nest prices and team counts under "prices" and "team",
+and may list "variants": overrides of the row (e.g. another currency or
+price tier, plus an optional "label" for the file name) that are all
+rendered from one parsed template:
+
+    {"proposal": "Make & CRM Automation", "client_name": "Acme", "prices": {"M-Price": 1500},
+     "variants": [{"label": "USD"}, {"label": "INR", "currency": "INR", "prices": {"M-Price": 125000}}]}
+
+A JSONL row may instead list several "proposals" for the client, a bundle
+(bundle.py): one file per proposal, or with "bundle": "docx" a single
+merged document. Prices shared by name (e.g. M-Price) apply to each:
+
+    {"proposals": ["Make & CRM Automation", "Shopify Website"], "client_name": "Acme",
+     "prices": {"M-Price": 1500, "Dev-Price": 4000}, "bundle": "docx"}
+
+    python batch.py clients.csv -o proposals.zip --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+from proposal_config import CURRENCY_SYMBOLS, GENERAL_TEAM_ROLES, MARKETING_TEAM_ROLES, PROPOSAL_CONFIG
+from docx_variants import render_variants
+from bundle import BUNDLE_FORMATS, assemble_bundle, bundle_filename, bundle_member_name, render_bundle
+from proposals import build_placeholders, bundle_placeholders, proposal_filename, validate_phone_number
+from renderer import render_document
+
+
+def read_rows(path):
+    """Yield (row number, row, error) from a .csv or .jsonl file.
+
+    JSONL rows are numbered by line. A line that is not a JSON object
+    yields None and its error instead of stopping the whole file.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, None, f"Invalid JSON: {e}"
+                    continue
+                if isinstance(row, dict):
+                    yield line_number, row, None
+                else:
+                    yield line_number, None, "Row must be a JSON object"
+        else:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield row_number, row, None
+
+
+def _parse_date(value):
+    if not value:
+        return date.today()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"Dates must be YYYY-MM-DD strings, got {value!r}")
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _to_int(value, name="value"):
+    """A price or team count as a non-negative int; empty counts as 0"""
+    if value in (None, ""):
+        return 0
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    try:
+        number = int(float(value))
+    except (ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+    if number < 0:
+        raise ValueError(f"{name} must not be negative, got {value!r}")
+    return number
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string, got {value!r}")
+    return value
+
+
+def _mapping(row, key):
+    value = row.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{key} must be an object of field: value, got {value!r}")
+    return value
+
+
+def _resolve_inputs(row, selected_proposals):
+    """The client block and input values a row gives the proposals it names"""
+    for selected_proposal in selected_proposals:
+        if not isinstance(selected_proposal, str) or selected_proposal not in PROPOSAL_CONFIG:
+            raise ValueError(f"Unknown proposal type: {selected_proposal!r}")
+    configs = [PROPOSAL_CONFIG[selected_proposal] for selected_proposal in selected_proposals]
+
+    client = {
+        "name": _text(row, "client_name"),
+        "email": _text(row, "client_email"),
+        "number": _text(row, "client_number"),
+        "country": _text(row, "country"),
+        "date": _parse_date(row.get("date")),
+    }
+    if client["number"] and client["country"] and not validate_phone_number(client["country"], client["number"]):
+        raise ValueError(f"Invalid phone number format for {client['country']}: {client['number']}")
+
+    prices = _mapping(row, "prices")
+    numerical_values = {
+        key: _to_int(prices.get(key, row.get(key)), key)
+        for config in configs for _, key in config["pricing_fields"]
+    }
+
+    team = _mapping(row, "team")
+    team_counts = {}
+    for config in configs:
+        roles = MARKETING_TEAM_ROLES if config["team_type"] == "marketing" else GENERAL_TEAM_ROLES
+        team_counts.update({code: _to_int(team.get(code, row.get(code)), code) for code in roles.values()})
+
+    currency = _text(row, "currency") or "USD"
+    if currency not in CURRENCY_SYMBOLS:
+        raise ValueError(f"Unknown currency: {currency!r}")
+
+    special_values = {}
+    for config in configs:
+        for field, _ in config.get("special_fields", []):
+            value = _text(row, field)
+            special_values[field] = _parse_date(value) if field == "VDate" and value else value
+
+    return client, {
+        "numerical_values": numerical_values,
+        "currency": currency,
+        "team_counts": team_counts,
+        "special_values": special_values,
+        "tools": (_text(row, "tool_1"), _text(row, "tool_2")),
+    }
+
+
+def resolve_row(row):
+    """Turn a raw input row into (proposal, placeholders, filename)"""
+    selected_proposal = row.get("proposal", "")
+    client, inputs = _resolve_inputs(row, [selected_proposal])
+    placeholders = build_placeholders(selected_proposal, client, **inputs)
+    return selected_proposal, placeholders, proposal_filename(selected_proposal, client["name"], client["date"])
+
+
+def resolve_bundle(row):
+    """Expand a row's "proposals" into [(selected_proposal, placeholders, filename)] and the bundle file name"""
+    if not isinstance(row["proposals"], list) or not all(isinstance(name, str) for name in row["proposals"]):
+        raise ValueError(f"proposals must be a list of proposal types, got {row['proposals']!r}")
+    selected_proposals = list(dict.fromkeys(row["proposals"]))
+    bundle_format = row.get("bundle") or "zip"
+    if bundle_format not in BUNDLE_FORMATS:
+        raise ValueError(f"Unknown bundle format: {bundle_format!r}")
+    client, inputs = _resolve_inputs(row, selected_proposals)
+    bundle = bundle_placeholders(selected_proposals, client, **inputs)
+    items = [
+        (selected_proposal, placeholders, bundle_member_name(selected_proposal, client["name"], client["date"]))
+        for selected_proposal, placeholders in bundle.items()
+    ]
+    return items, bundle_filename(client["name"], client["date"], bundle_format)
+
+
+def resolve_variants(row):
+    """Expand a row's "variants" into [(selected_proposal, placeholders, filename)]"""
+    base = {key: value for key, value in row.items() if key != "variants"}
+    resolved = []
+    for n, variant in enumerate(row["variants"], start=1):
+        merged = {**base, **variant}
+        for nested in ("prices", "team"):
+            merged[nested] = {**(base.get(nested) or {}), **(variant.get(nested) or {})}
+        selected_proposal, placeholders, filename = resolve_row(merged)
+        if resolved and selected_proposal != resolved[0][0]:
+            raise ValueError("All variants of a row must use the same proposal type")
+        stem, ext = os.path.splitext(filename)
+        label = variant.get("label") or f"Variant {n}"
+        resolved.append((selected_proposal, placeholders, f"{stem} - {label}{ext}"))
+    return resolved
+
+
+def render_row(job):
+    """Process pool entry point: returns (row number, [(filename, bytes)], error)"""
+    row_number, row, templates_dir = job
+    try:
+        if row.get("proposals"):
+            items, filename = resolve_bundle(row)
+            files = render_bundle(items, templates_dir)
+            if (row.get("bundle") or "zip") == "docx":
+                files = [(filename, assemble_bundle(files, "docx"))]
+            return row_number, files, None
+        if row.get("variants"):
+            variants = resolve_variants(row)
+            template_path = os.path.join(templates_dir, PROPOSAL_CONFIG[variants[0][0]]["template"])
+            files = list(render_variants(template_path, [(filename, placeholders) for _, placeholders, filename in variants]))
+            return row_number, files, None
+        selected_proposal, placeholders, filename = resolve_row(row)
+        template_path = os.path.join(templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"])
+        return row_number, [(filename, render_document(template_path, placeholders))], None
+    except Exception as e:
+        return row_number, [], f"{type(e).__name__}: {e}"
+
+
+def _unique_name(name, used):
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem} ({n}){ext}"
+    used.add(candidate)
+    return candidate
+
+
+def run_batch(input_path, output_path, templates_dir=".", workers=None, progress=True):
+    """Render every row into one zip; returns (rendered rows, files, errors, seconds).
+
+    A row that fails, does not parse or takes its worker process down is
+    reported in errors.csv; every other row is still rendered. When a
+    worker dies, the rows in flight with it are rerun one at a time on a
+    fresh pool, so only the row that killed it fails.
+    """
+    rows = read_rows(input_path)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    rendered, files_written, errors, used_names = 0, 0, [], set()
+    # Rows that were in flight when a worker died, each rerun alone
+    suspects = deque()
+    started = time.perf_counter()
+
+    def record(row_number, files, error):
+        nonlocal rendered, files_written
+        if error:
+            errors.append((row_number, error))
+        else:
+            # A row with variants or a bundle writes several files
+            rendered += 1
+        for filename, data in files:
+            # .docx members are already compressed, store them as is
+            archive.writestr(_unique_name(filename, used_names), data)
+            files_written += 1
+        if progress:
+            status = f"error: {error}" if error else ", ".join(filename for filename, _ in files)
+            print(f"[{rendered + len(errors)}] row {row_number}: {status}", file=sys.stderr)
+
+    def collect(future, job, alone):
+        """Record a finished row; returns False when its worker died"""
+        try:
+            record(*future.result())
+        except BrokenProcessPool:
+            if alone:
+                record(job[0], [], "The worker process died rendering this row")
+            else:
+                suspects.append(job)
+            return False
+        except Exception as e:
+            record(job[0], [], f"{type(e).__name__}: {e}")
+        return True
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_STORED) as archive:
+            in_flight = {}
+            exhausted = False
+            while in_flight or suspects or not exhausted:
+                if suspects:
+                    if not in_flight:
+                        job = suspects.popleft()
+                        in_flight[pool.submit(render_row, job)] = job, True
+                else:
+                    # Keep a bounded window of submitted rows so memory stays flat
+                    while not exhausted and len(in_flight) < max_in_flight:
+                        item = next(rows, None)
+                        if item is None:
+                            exhausted = True
+                        elif item[2]:
+                            record(item[0], [], item[2])
+                        else:
+                            job = (item[0], item[1], templates_dir)
+                            in_flight[pool.submit(render_row, job)] = job, False
+                if not in_flight:
+                    continue
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                healthy = all([collect(future, *in_flight.pop(future)) for future in done])
+                if not healthy:
+                    # Every other row in flight fails with the pool; collect them and start a new one
+                    wait(in_flight)
+                    for future in list(in_flight):
+                        collect(future, *in_flight.pop(future))
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+
+            if errors:
+                report = io.StringIO()
+                writer = csv.writer(report)
+                writer.writerow(["row", "error"])
+                writer.writerows(sorted(errors))
+                archive.writestr("errors.csv", report.getvalue())
+    finally:
+        pool.shutdown()
+
+    return rendered, files_written, sorted(errors), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate proposals in bulk from a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL file with one client row per proposal")
+    parser.add_argument("-o", "--output", default="proposals.zip", help="zip file to write")
+    parser.add_argument("--templates-dir", default=os.getcwd(), help="folder holding the .docx templates")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args()
+
+    rendered, files, errors, seconds = run_batch(
+        args.input, args.output, args.templates_dir, args.workers, progress=not args.quiet
+    )
+    total = rendered + len(errors)
+    print(f"Rendered {rendered}/{total} rows into {files} documents in {args.output} in {seconds:.2f}s "
+          f"({files / seconds if seconds else 0:.1f} docs/sec)")
+    for row_number, error in errors:
+        print(f"  row {row_number}: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
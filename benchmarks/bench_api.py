@@ -0,0 +1,120 @@
+"""Load-test the HTTP render API: p50/p99 latency and requests/sec per concurrency level.
+
+Without --url a server is started in this process on a synthetic template,
+with API_CONCURRENCY and API_MAX_PENDING taken from the environment.
+Every request uses a distinct client name so it misses the render cache;
+--same-body sends identical requests to measure cache hits instead.
+
+Run from the repository root:
+    python benchmarks/bench_api.py --concurrency 1 4 16 --requests 200
+    python benchmarks/bench_api.py --url http://127.0.0.1:8000
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import build_template
+from proposal_config import PROPOSAL_CONFIG
+
+PROPOSAL = "Make, Manychat & CRM Automation"
+
+
+def request_body(n, same_body):
+    return json.dumps({
+        "proposal": PROPOSAL,
+        "client_name": "Acme" if same_body else f"Client {n}",
+        "client_email": "ops@acme.example",
+        "client_number": "+1 555 0100",
+        "country": "USA",
+        "date": "2026-01-05",
+        "prices": {key: 1000 * (i + 1) for i, (_, key) in enumerate(PROPOSAL_CONFIG[PROPOSAL]["pricing_fields"])},
+    }).encode()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(templates_dir):
+    import uvicorn
+
+    from api import create_app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(templates_dir), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def run_level(url, concurrency, total, same_body, offset):
+    """Send total requests from concurrency clients; returns (latencies, statuses, seconds)"""
+    parts = urlsplit(url)
+    local = threading.local()
+
+    def send(n):
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+        started = time.perf_counter()
+        local.conn.request("POST", "/render", body=request_body(offset + n, same_body),
+                           headers={"Content-Type": "application/json"})
+        response = local.conn.getresponse()
+        response.read()
+        return time.perf_counter() - started, response.status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(total)))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in results], [status for _, status in results], elapsed
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="API base URL; starts a local server when omitted")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--paragraphs", type=int, default=1000, help="size of the synthetic template")
+    parser.add_argument("--same-body", action="store_true", help="repeat one request body (render cache hits)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        url = args.url
+        if url is None:
+            with open(os.path.join(temp_dir, PROPOSAL_CONFIG[PROPOSAL]["template"]), "wb") as f:
+                f.write(build_template(paragraphs=args.paragraphs))
+            _, url = start_local_server(temp_dir)
+
+        # One warm-up request parses the template
+        run_level(url, 1, 1, args.same_body, offset=-1)
+        print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+        offset = 0
+        for concurrency in args.concurrency:
+            latencies, statuses, elapsed = run_level(url, concurrency, args.requests, args.same_body, offset)
+            offset += args.requests
+            counts = " ".join(f"{status}x{statuses.count(status)}" for status in sorted(set(statuses)))
+            print(f"{concurrency:>7} {len(latencies) / elapsed:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>8.1f} {_percentile(latencies, 0.99) * 1000:>8.1f}  {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Time a proposal bundle against its slowest single proposal.
+
+Renders --proposals proposal types for one client, each from its own
+synthetic template, in a fresh process with the render cache off and
+every template warm, with the fragment or the streaming engine. Every
+repeat uses a new client name. Reported, as the median of --repeat runs:
+
+    slowest single   the slowest proposal rendered on its own
+    sequential       the proposals rendered one after another
+    threads          render_bundle(), one thread per proposal (API, batch)
+    job queue        one job per proposal on --workers render worker
+                     processes, from submitting them together until the
+                     last one finished (the app)
+    zip / merge      assembling the rendered proposals into a zip or a
+                     single document (docx_merge.py)
+
+Run from the repository root:
+    python benchmarks/bench_bundle.py
+    python benchmarks/bench_bundle.py --case xlarge --engine stream --proposals 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_render import CASES
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def child(proposals, repeat):
+    from bundle import assemble_bundle, render_bundle
+    from job_queue import get_job_queue
+    from proposal_config import PROPOSAL_CONFIG
+    from renderer import render_document
+
+    selected = list(PROPOSAL_CONFIG)[:proposals]
+    paths = {name: os.path.abspath(PROPOSAL_CONFIG[name]["template"]) for name in selected}
+    queue = get_job_queue()
+    for name in selected:
+        render_document(paths[name], SAMPLE_PLACEHOLDERS)
+        queue.wait(queue.submit(name, paths[name], SAMPLE_PLACEHOLDERS))
+
+    def items(client):
+        placeholders = dict(SAMPLE_PLACEHOLDERS, **{"<<Client Name>>": client})
+        return [(name, placeholders, f"{name}.docx") for name in selected]
+
+    def job_queue_bundle(client):
+        """Seconds from submitting the bundle's jobs until the last one finished"""
+        started = time.monotonic()
+        job_ids = [queue.submit(name, paths[name], placeholders) for name, placeholders, _ in items(client)]
+        # wait() polls; the jobs' own finish times are exact
+        return max(queue.wait(job_id).finished for job_id in job_ids) - started
+
+    timings = {key: [] for key in ("slowest", "sequential", "threads", "jobs", "zip", "merge")}
+    for n in range(repeat):
+        singles = [_timed(render_document, paths[name], placeholders)[0]
+                   for name, placeholders, _ in items(f"Single {n}")]
+        timings["slowest"].append(max(singles))
+        timings["sequential"].append(sum(singles))
+        seconds, files = _timed(render_bundle, items(f"Threads {n}"))
+        timings["threads"].append(seconds)
+        timings["jobs"].append(job_queue_bundle(f"Jobs {n}"))
+        timings["zip"].append(_timed(assemble_bundle, files, "zip")[0])
+        timings["merge"].append(_timed(assemble_bundle, files, "docx")[0])
+    queue.close()
+    return {key: statistics.median(values) for key, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", choices=list(CASES), default="large")
+    parser.add_argument("--engine", choices=("fragments", "stream"), default="fragments")
+    parser.add_argument("--proposals", type=int, default=3, help="proposal types in the bundle")
+    parser.add_argument("--workers", type=int, default=None, help="JOB_WORKERS (default one per proposal)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return print(json.dumps(child(args.proposals, args.repeat)))
+
+    from proposal_config import PROPOSAL_CONFIG
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        shutil.copy(os.path.join(ROOT, "proposals.json"), work_dir)
+        for n, config in enumerate(list(PROPOSAL_CONFIG.values())[:args.proposals]):
+            # A template of its own per proposal, so nothing is shared between them
+            case = dict(CASES[args.case], paragraphs=CASES[args.case]["paragraphs"] + n)
+            with open(os.path.join(work_dir, config["template"]), "wb") as f:
+                f.write(build_template(**case))
+        env = dict(os.environ, TEMPLATE_WATCH_SECONDS="0", PROPOSAL_HISTORY_DB="", RENDER_CACHE_MB="0",
+                   PREWARM_TEMPLATES="0", JOB_WORKERS=str(args.workers or args.proposals), PYTHONPATH=ROOT)
+        if args.engine == "stream":
+            # Every template at least this large is streamed
+            env["STREAM_TEMPLATE_MB"] = "0.000001"
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--proposals", str(args.proposals),
+             "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True, cwd=work_dir, env=env,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+
+    print(f"{args.proposals} {args.case} proposals, {args.engine} engine, {args.workers or args.proposals} render workers")
+    for key, label in (("slowest", "slowest single"), ("sequential", "sequential"), ("threads", "threads"),
+                       ("jobs", "job queue"), ("zip", "zip"), ("merge", "merge")):
+        print(f"{label:<16} {result[key] * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
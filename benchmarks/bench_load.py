@@ -0,0 +1,166 @@
+"""Simulate concurrent sessions rendering proposals: latency percentiles and peak RSS.
+
+Each session is a thread that renders --renders proposals with distinct
+client names (so every render misses the render cache), pausing up to
+--think seconds between them, like a rep editing and regenerating. Every
+(engine, sessions, budget) run happens in a fresh process, since peak RSS
+only ever grows, after one warm-up render that loads the template.
+
+Budgets: "off" runs without admission control. "auto" sizes the budget
+from the template's per-render estimate (admission.py) times --admit;
+a number is a budget in MB. Reported per run: render latency p50/p90/p99
+including any wait for memory, renders per second, renders rejected, the
+longest admission wait and the peak RSS growth over the warm process.
+With --trace-memory every render is traced with tracemalloc and the mean
+traced peak per render is reported too.
+
+Run from the repository root:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --engine docx --sessions 4 16 32 --budget off auto 64
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_render import CASES
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+
+ENGINES = ("fragments", "docx", "stream")
+
+
+def _peak_kb():
+    # Render traces restart the kernel's peak per stage; this one counts the peaks before each restart
+    from instrumentation import process_peak_rss_kb
+
+    return process_peak_rss_kb()
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def child(template_path, engine, sessions, renders, think):
+    """Run the sessions in this process and print one JSON result line"""
+    from admission import RENDER_BUDGET, RenderRejected
+    from instrumentation import RenderTrace
+    from renderer import render_document
+
+    options = {"render_cache": None, "fragments": None} if engine == "docx" else {"render_cache": None}
+    render_document(template_path, SAMPLE_PLACEHOLDERS, **options)
+    baseline = _peak_kb()
+
+    latencies, waits, traced, rejected = [], [], [], []
+    lock = threading.Lock()
+
+    def session(number):
+        rng = random.Random(number)
+        for i in range(renders):
+            time.sleep(rng.uniform(0, think))
+            placeholders = dict(SAMPLE_PLACEHOLDERS, **{"<<Client Name>>": f"Session {number} render {i}"})
+            trace = RenderTrace("load")
+            started = time.perf_counter()
+            try:
+                render_document(template_path, placeholders, trace=trace, **options)
+            except RenderRejected:
+                with lock:
+                    rejected.append(number)
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                waits.append(trace.stages.get("admission", {}).get("wall_ms", 0.0))
+                if trace.trace_memory:
+                    traced.append(trace.peak_alloc_bytes)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        "p50": _percentile(latencies, 0.5) if latencies else None,
+        "p90": _percentile(latencies, 0.9) if latencies else None,
+        "p99": _percentile(latencies, 0.99) if latencies else None,
+        "per_second": len(latencies) / seconds,
+        "rejected": len(rejected),
+        "max_wait_ms": max(waits, default=0.0),
+        "peak_mb": (_peak_kb() - baseline) / 1024,
+        "traced_mb": statistics.mean(traced) / 2 ** 20 if traced else None,
+        "budget_mb": RENDER_BUDGET.limit / 2 ** 20 if RENDER_BUDGET is not None else None,
+    }))
+
+
+def estimate_mb(template_path, engine):
+    from admission import MemoryBudget
+
+    return MemoryBudget(1).estimate(template_path, engine) / 2 ** 20
+
+
+def run(template_path, engine, sessions, renders, think, budget_mb, max_wait, trace_memory):
+    env = dict(os.environ, RENDER_MEMORY_MB=str(budget_mb), RENDER_ADMISSION_WAIT=str(max_wait),
+               PROPOSAL_TRACE_MEMORY="1" if trace_memory else "0")
+    if engine == "stream":
+        # Every template at least this large is streamed
+        env["STREAM_TEMPLATE_MB"] = "0.000001"
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", template_path, engine,
+         str(sessions), str(renders), str(think)],
+        check=True, capture_output=True, text=True, env=env,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", choices=list(CASES), default="xlarge")
+    parser.add_argument("--engine", choices=ENGINES, default="fragments")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--renders", type=int, default=5, help="renders per session")
+    parser.add_argument("--think", type=float, default=0.2, help="longest pause between a session's renders, seconds")
+    parser.add_argument("--budget", nargs="+", default=["off", "auto"], help='"off", "auto" or MB')
+    parser.add_argument("--admit", type=int, default=4, help='renders the "auto" budget holds at once')
+    parser.add_argument("--max-wait", type=float, default=30, help="RENDER_ADMISSION_WAIT for the runs")
+    parser.add_argument("--trace-memory", action="store_true", help="trace every render with tracemalloc")
+    parser.add_argument("--child", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        template_path, engine, sessions, renders, think = args.child
+        return child(template_path, engine, int(sessions), int(renders), float(think))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, f"{args.case}.docx")
+        with open(template_path, "wb") as f:
+            f.write(build_template(**CASES[args.case]))
+        estimate = estimate_mb(template_path, args.engine)
+        print(f"{args.case} template, {args.engine} engine: estimated {estimate:.1f} MB per render")
+        print(f"{'sessions':>8} {'budget MB':>9} {'p50 ms':>7} {'p90 ms':>7} {'p99 ms':>7} {'renders/s':>9} "
+              f"{'rejected':>8} {'max wait ms':>11} {'peak RSS MB':>11}" + (f" {'traced MB':>9}" if args.trace_memory else ""))
+        for sessions in args.sessions:
+            for budget in args.budget:
+                budget_mb = 0 if budget == "off" else estimate * args.admit if budget == "auto" else float(budget)
+                result = run(template_path, args.engine, sessions, args.renders, args.think, budget_mb,
+                             args.max_wait, args.trace_memory)
+                cells = [f"{result[p] * 1000:>7.0f}" if result[p] is not None else f"{'-':>7}" for p in ("p50", "p90", "p99")]
+                budget_text = f"{budget_mb:.0f}" if budget_mb else "off"
+                line = (f"{sessions:>8} {budget_text:>9} {' '.join(cells)} {result['per_second']:>9.1f} "
+                        f"{result['rejected']:>8} {result['max_wait_ms']:>11.0f} {result['peak_mb']:>11.1f}")
+                if args.trace_memory:
+                    line += f" {result['traced_mb']:>9.1f}" if result["traced_mb"] is not None else f" {'-':>9}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
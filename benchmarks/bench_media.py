@@ -0,0 +1,133 @@
+"""Measure what media optimization saves on a template with large screenshots.
+
+The synthetic template embeds full-resolution screenshots and photos shown
+a few inches wide, plus a logo stored twice, once for the header and once
+for the body, as documents edited in Word often do. Reports media and
+document sizes before and after, the one-off plan cost, and what applying
+the plan adds to a render.
+
+Run from the repository root:
+    python benchmarks/bench_media.py
+    python benchmarks/bench_media.py --screenshots 8 --dpi 96 --quality 75
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Inches
+from PIL import Image, ImageDraw
+
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+from docx_writer import write_package
+from media_optimizer import MediaOptimizer
+from media_optimizer import report
+from renderer import render_document
+from template_cache import TemplateCache
+
+
+def _screenshot(rng, size=(2560, 1600)):
+    """A UI-like image: a shaded background, text-like bars and an embedded photo"""
+    image = Image.linear_gradient("L").resize(size).point(lambda v: 200 + v // 5).convert("RGB")
+    image.paste(Image.effect_noise((size[0] // 3, size[1] // 3), 60).convert("RGB"), (size[0] // 2, size[1] // 2))
+    draw = ImageDraw.Draw(image)
+    colors = [(33, 37, 41), (13, 110, 253), (220, 53, 69), (25, 135, 84), (108, 117, 125)]
+    for _ in range(400):
+        x, y = rng.randrange(size[0] - 300), rng.randrange(size[1] - 20)
+        draw.rectangle((x, y, x + rng.randrange(40, 300), y + rng.randrange(6, 18)), fill=rng.choice(colors))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _logo():
+    image = Image.new("RGB", (600, 200), (255, 255, 255))
+    ImageDraw.Draw(image).rectangle((20, 40, 580, 160), fill=(13, 110, 253))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _photo(rng, size=(3000, 2000)):
+    image = Image.radial_gradient("L").resize(size).convert("RGB")
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    buffer = io.BytesIO()
+    Image.blend(image, noise, 0.3).save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def build_media_template(screenshots, photos):
+    rng = random.Random(7)
+    doc = Document(io.BytesIO(build_template(paragraphs=300)))
+    logo = _logo()
+    doc.sections[0].header.paragraphs[0].add_run().add_picture(io.BytesIO(logo), width=Inches(1.5))
+    doc.add_picture(io.BytesIO(logo), width=Inches(1.5))
+    for _ in range(screenshots):
+        doc.add_picture(io.BytesIO(_screenshot(rng)), width=Inches(6))
+    for _ in range(photos):
+        doc.add_picture(io.BytesIO(_photo(rng)), width=Inches(4))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return _duplicate_header_logo(buffer.getvalue())
+
+
+def _duplicate_header_logo(data):
+    """Store the header's logo as a separate copy, as Word does for pasted images"""
+    with zipfile.ZipFile(io.BytesIO(data)) as source:
+        rels_name = "word/_rels/header1.xml.rels"
+        rels = source.read(rels_name)
+        target = rels.split(b'Target="media/')[1].split(b'"')[0].decode()
+        replacements = {rels_name: rels.replace(f"media/{target}".encode(), b"media/header-logo.png")}
+        out = io.BytesIO()
+        write_package(source, out, replacements)
+        logo = source.read(f"word/media/{target}")
+    with zipfile.ZipFile(out, "a") as target_zip:
+        target_zip.writestr("word/media/header-logo.png", logo)
+    return out.getvalue()
+
+
+def _best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--screenshots", type=int, default=6)
+    parser.add_argument("--photos", type=int, default=2)
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "media.docx")
+        with open(template_path, "wb") as f:
+            f.write(build_media_template(args.screenshots, args.photos))
+
+        optimizer = MediaOptimizer(dpi=args.dpi, jpeg_quality=args.quality)
+        report(template_path, optimizer)
+
+        cache = TemplateCache()
+        plan = optimizer.plan(template_path, cache.digest(template_path))
+        render_seconds, plain = _best_of(args.repeat, lambda: render_document(
+            template_path, SAMPLE_PLACEHOLDERS, cache, render_cache=None, optimize_media=False
+        ))
+        apply_seconds, optimized = _best_of(args.repeat, lambda: plan.apply(plain))
+        print(f"rendered document {len(plain) / 1024:.1f} KB -> {len(optimized) / 1024:.1f} KB; "
+              f"render {render_seconds * 1000:.1f} ms + apply {apply_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
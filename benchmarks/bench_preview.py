@@ -0,0 +1,67 @@
+"""Time the HTML preview against rendering a document per edit.
+
+For each synthetic template: the one-off skeleton build, the median preview
+update over a series of edits (each changes the client name and blanks a
+different pricing row), and a warm render_document for the same values.
+
+Run from the repository root:
+    python benchmarks/bench_preview.py
+    python benchmarks/bench_preview.py --cases large xlarge --edits 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_render import CASES
+from benchmarks.synthetic import PRICING_ROWS, SAMPLE_PLACEHOLDERS, build_template
+from html_preview import PreviewStore
+from renderer import render_document
+from template_cache import TemplateCache
+
+
+def edits(n):
+    for i in range(n):
+        placeholders = dict(SAMPLE_PLACEHOLDERS, **{"<<Client Name>>": f"Client {i}"})
+        placeholders[PRICING_ROWS[i % len(PRICING_ROWS)][1]] = ""
+        yield placeholders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'case':<7} {'skeleton ms':>11} {'preview ms':>10} {'render ms':>9} {'HTML KB':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for case in args.cases:
+            template_path = os.path.join(temp_dir, f"{case}.docx")
+            with open(template_path, "wb") as f:
+                f.write(build_template(**CASES[case]))
+            cache = TemplateCache()
+            cache.warm(template_path)
+            store = PreviewStore(cache)
+
+            started = time.perf_counter()
+            store.get(template_path)
+            skeleton = time.perf_counter() - started
+
+            previews, renders = [], []
+            for placeholders in edits(args.edits):
+                started = time.perf_counter()
+                html = store.render(template_path, placeholders)
+                previews.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                render_document(template_path, placeholders, cache, render_cache=None)
+                renders.append(time.perf_counter() - started)
+            print(f"{case:<7} {skeleton * 1000:>11.1f} {statistics.median(previews) * 1000:>10.2f} "
+                  f"{statistics.median(renders) * 1000:>9.1f} {len(html) // 1024:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Time each stage of the render pipeline on synthetic templates of growing size.
+
+Run from the repository root:
+    python benchmarks/bench_render.py                  # compare against the baseline
+    python benchmarks/bench_render.py --check          # same, and fail without one
+    python benchmarks/bench_render.py --save-baseline  # record a new baseline
+
+Stages of the uncached path: load (Document()), substitution (the
+replace_and_format walk without its row pruning), remove_empty_rows on
+the rows that walk left, and save (doc.save). Stages of the cached path:
+cache_copy (TemplateCache.get), replace_indexed and save_passthrough
+(save_docx). Stages of the fragment path: fragment_compile
+(compile_template, once per template) and fragment_render
+(CompiledTemplate.render).
+
+Stages report their fastest repeat, timed with the garbage collector
+off. The run exits with status 1 when any stage is slower than its
+baseline by more than the tolerance. The committed baseline.json was
+recorded on a single-core VM; record one of your own (--save-baseline)
+before comparing on faster hardware.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.text.paragraph import Paragraph
+
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+from docx_render import (
+    _set_center, iter_story_parts, may_contain_placeholder, remove_empty_rows, replace_and_format,
+    replace_in_paragraph, walk_story,
+)
+from docx_writer import changed_parts, save_docx
+from fragments import compile_template
+from substitution import get_matcher
+from template_cache import TemplateCache
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+CASES = {
+    "small": dict(paragraphs=100, placeholder_every=20),
+    "medium": dict(paragraphs=1000, table_depth=1, images=1),
+    "large": dict(paragraphs=3000, table_depth=2, images=3),
+    "dense": dict(paragraphs=3000, placeholder_every=1, table_depth=2),
+    "deep": dict(paragraphs=300, tables=5, table_depth=8),
+    "xlarge": dict(paragraphs=10000, placeholder_every=10, table_depth=4, images=6),
+}
+
+
+def _timed(timings, stage, func, *args):
+    # As timeit does: a collection triggered by earlier stages must not land in this one
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        result = func(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return result
+
+
+def _substitute(doc, placeholders):
+    """replace_and_format's walk with no on_table, so every row is left for remove_empty_rows"""
+    matcher = get_matcher(placeholders)
+    for part in iter_story_parts(doc):
+        def on_paragraph(p, part=part):
+            if may_contain_placeholder(p):
+                replace_in_paragraph(Paragraph(p, part), matcher)
+
+        walk_story(part.element, on_paragraph, _set_center, lambda tbl: None)
+
+
+def _remove_all_empty_rows(doc):
+    for table in doc.tables:
+        remove_empty_rows(table)
+
+
+def run_case(template_path, repeat):
+    """Return the median seconds of every stage over repeat renders"""
+    with open(template_path, "rb") as f:
+        source = f.read()
+    cache = TemplateCache()
+    cache.get(template_path)
+    timings = {}
+    for _ in range(repeat):
+        doc = _timed(timings, "load", Document, io.BytesIO(source))
+        _timed(timings, "substitution", _substitute, doc, SAMPLE_PLACEHOLDERS)
+        _timed(timings, "remove_empty_rows", _remove_all_empty_rows, doc)
+        _timed(timings, "save", doc.save, io.BytesIO())
+
+        template = _timed(timings, "cache_copy", cache.get, template_path)
+        doc = _timed(timings, "replace_indexed", replace_and_format, template.doc, SAMPLE_PLACEHOLDERS, template.index)
+        _timed(timings, "save_passthrough", save_docx, doc, template.source, io.BytesIO(), changed_parts(template.index))
+
+        compiled = _timed(timings, "fragment_compile", compile_template, cache.get(template_path))
+        _timed(timings, "fragment_render", compiled.render, SAMPLE_PLACEHOLDERS)
+    return {stage: min(values) for stage, values in timings.items()}
+
+
+def find_regressions(results, baseline, tolerance, min_delta):
+    """(case, stage, baseline, seconds) of every stage slower than its baseline allows"""
+    regressions = []
+    for case, stages in results.items():
+        for stage, seconds in stages.items():
+            reference = baseline.get(case, {}).get(stage)
+            if reference is None:
+                continue
+            if seconds > reference * (1 + tolerance) and seconds - reference > min_delta:
+                regressions.append((case, stage, reference, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when there is no baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for case in args.cases:
+            template_path = os.path.join(temp_dir, f"{case}.docx")
+            with open(template_path, "wb") as f:
+                f.write(build_template(**CASES[case]))
+            size_kb = os.path.getsize(template_path) // 1024
+            results[case] = run_case(template_path, args.repeat)
+            stages = "  ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in results[case].items())
+            print(f"{case:<7} {size_kb:>6} KB  {stages}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 1 if args.check else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.tolerance, args.min_delta)
+    for case, stage, reference, seconds in regressions:
+        print(f"REGRESSION {case}/{stage}: {reference * 1000:.1f}ms -> {seconds * 1000:.1f}ms")
+    if not regressions:
+        print("No regressions against baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
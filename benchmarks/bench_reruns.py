@@ -0,0 +1,112 @@
+"""Measure the Streamlit rerun cost of filling in and generating one proposal.
+
+Drives app.py headlessly with streamlit's AppTest through a scripted
+session: pick a proposal, fill the client, pricing, team and tool fields,
+then generate. Edits to widgets inside a form do not rerun the script in
+a browser, so they are not rerun here either.
+
+Run from the repository root, optionally against an older app.py:
+    python benchmarks/bench_reruns.py
+    git show <commit>:app.py > /tmp/old_app.py && python benchmarks/bench_reruns.py --app /tmp/old_app.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import build_template
+from proposal_config import PROPOSAL_CONFIG
+
+PROPOSAL = "Make, Manychat & CRM Automation"
+
+TEXT_EDITS = {
+    "Client Name:": "Acme Corp",
+    "Client Email:": "ops@acme.example",
+    "Country:": "USA",
+    "Client Number:": "+1 555 0100",
+    "Tool 1:": "Zapier",
+    "Tool 2:": "HubSpot",
+}
+
+
+def _edit(at, widget, value, run_times):
+    """Apply one edit, rerunning only when a browser would"""
+    widget.set_value(value)
+    if getattr(widget, "form_id", ""):
+        return
+    started = time.perf_counter()
+    at.run()
+    run_times.append(time.perf_counter() - started)
+
+
+def run_session(app_path, timeout):
+    run_times = []
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    started = time.perf_counter()
+    at.run()
+    run_times.append(time.perf_counter() - started)
+
+    _edit(at, at.selectbox[0], PROPOSAL, run_times)
+    for label, value in TEXT_EDITS.items():
+        widget = next((w for w in at.text_input if w.label == label), None)
+        if widget is not None:
+            _edit(at, widget, value, run_times)
+    for idx, widget in enumerate(at.number_input):
+        # Prices step by 100, team counts by 1
+        _edit(at, widget, 1000 * (idx + 1) if widget.step == 100 else 1, run_times)
+
+    button = next(b for b in at.button if b.label == "Generate Proposal")
+    started = time.perf_counter()
+    button.click().run()
+    # Background renders are polled the way the page's status fragment does
+    while not at.exception and not at.error and not any(
+        b.label == "Download Proposal" for b in at.get("download_button")
+    ):
+        time.sleep(0.01)
+        at.run()
+    generate_time = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if at.error:
+        raise RuntimeError(at.error[0].value)
+    return run_times, generate_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--paragraphs", type=int, default=3000, help="size of the synthetic template")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    app_path = os.path.abspath(args.app)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, PROPOSAL_CONFIG[PROPOSAL]["template"]), "wb") as f:
+            f.write(build_template(paragraphs=args.paragraphs))
+        # The app resolves templates against the working directory
+        os.chdir(temp_dir)
+        sys.path.insert(0, os.path.dirname(app_path))
+
+        reruns, edit_costs, generates = [], [], []
+        for _ in range(args.sessions):
+            run_times, generate_time = run_session(app_path, args.timeout)
+            reruns.append(len(run_times))
+            edit_costs.append(sum(run_times))
+            generates.append(generate_time)
+
+    print(f"app: {app_path}")
+    print(f"  script runs while filling the form: {statistics.median(reruns):.0f}")
+    print(f"  time spent in those runs:           {statistics.median(edit_costs) * 1000:.1f} ms")
+    print(f"  generate click (run + render):      {statistics.median(generates) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Measure cold start: app import time, first page and time to the first proposal.
+
+Every measurement runs in a fresh process, in a temporary directory holding
+the manifest and a synthetic template for each proposal:
+
+    imports          importing the modules app.py imports at the top, on
+                     top of streamlit (which `streamlit run` has already
+                     loaded before the script starts)
+    first paint      from the start of the app's first script run (AppTest)
+                     to its title, the first element a visitor sees
+    first page       the whole first script run
+    first proposal   after --delay seconds, one render through the render
+                     job queue (the UI path) and one in-process render (the
+                     API path), each with new values
+    warm proposal    the same again with other values, for comparison
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --case xlarge --delay 10
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_render import CASES
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+
+APP = os.path.join(ROOT, "app.py")
+# Runs app.py, noting in the environment when its title is first drawn
+PAINT_WRAPPER = f"""
+import os, runpy, time
+import streamlit as st
+
+_title = st.title
+
+
+def title(*args, **kwargs):
+    os.environ.setdefault("STARTUP_FIRST_PAINT", repr(time.perf_counter()))
+    return _title(*args, **kwargs)
+
+
+st.title = title
+runpy.run_path({APP!r}, run_name="__main__")
+"""
+
+
+def app_imports():
+    """Top-level modules app.py imports, in order"""
+    with open(APP) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names.append(node.module)
+    return names
+
+
+def child_imports():
+    import streamlit  # noqa: F401
+
+    started = time.perf_counter()
+    for name in app_imports():
+        importlib.import_module(name)
+    return {"imports": time.perf_counter() - started}
+
+
+def _placeholders(name):
+    return dict(SAMPLE_PLACEHOLDERS, **{"<<Client Name>>": name})
+
+
+def child_proposals(delay):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(PAINT_WRAPPER, default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    result = {
+        "first_paint": float(os.environ["STARTUP_FIRST_PAINT"]) - started,
+        "first_page": time.perf_counter() - started,
+    }
+    time.sleep(delay)
+
+    from job_queue import get_job_queue
+    from proposal_config import PROPOSAL_CONFIG
+    from renderer import render_document
+
+    proposal = next(iter(PROPOSAL_CONFIG))
+    template_path = os.path.abspath(PROPOSAL_CONFIG[proposal]["template"])
+    for label, name in (("first", "Cold Client"), ("warm", "Warm Client")):
+        started = time.perf_counter()
+        job = get_job_queue().wait(get_job_queue().submit(proposal, template_path, _placeholders(name)))
+        result[f"{label}_job"] = time.perf_counter() - started
+        if job.error:
+            raise RuntimeError(job.error)
+        started = time.perf_counter()
+        render_document(template_path, _placeholders(name + " API"), render_cache=None)
+        result[f"{label}_render"] = time.perf_counter() - started
+    return result
+
+
+def run(mode, work_dir, env, delay):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--delay", str(delay)],
+        check=True, capture_output=True, text=True, cwd=work_dir, env=env,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", choices=list(CASES), default="large")
+    parser.add_argument("--delay", type=float, default=5, help="seconds between the first page and the first proposal")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=("imports", "proposals"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child == "imports":
+        return print(json.dumps(child_imports()))
+    if args.child == "proposals":
+        return print(json.dumps(child_proposals(args.delay)))
+
+    from proposal_config import PROPOSAL_CONFIG
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        shutil.copy(os.path.join(ROOT, "proposals.json"), work_dir)
+        template = build_template(**CASES[args.case])
+        for config in PROPOSAL_CONFIG.values():
+            with open(os.path.join(work_dir, config["template"]), "wb") as f:
+                f.write(template)
+        env = dict(os.environ, TEMPLATE_WATCH_SECONDS="0", PROPOSAL_HISTORY_DB="", RENDER_CACHE_MB="0",
+                   PYTHONPATH=ROOT)
+
+        imports = min(run("imports", work_dir, env, 0)["imports"] for _ in range(args.repeat))
+        print(f"app imports over streamlit: {imports * 1000:.0f} ms")
+        result = run("proposals", work_dir, env, args.delay)
+        print(f"first paint: {result['first_paint'] * 1000:.0f} ms, first page: {result['first_page'] * 1000:.0f} ms")
+        print(f"{'':<16} {'job queue ms':>12} {'in-process ms':>13}")
+        for label in ("first", "warm"):
+            print(f"{label + ' proposal':<16} {result[f'{label}_job'] * 1000:>12.0f} "
+                  f"{result[f'{label}_render'] * 1000:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
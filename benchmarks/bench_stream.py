@@ -0,0 +1,97 @@
+"""Compare peak memory and time of the render engines as templates grow.
+
+Each (engine, size) pair renders once in a fresh process, since peak RSS
+only ever grows. Engines:
+
+    docx        TemplateCache parse + replace_indexed + save_docx
+    fragments   compile the template's fragments, then render from them
+    stream      docx_stream.render_stream, never holding the whole tree
+
+Reported per engine: peak RSS growth over the process's footprint after
+imports, and the peak of Python allocations (tracemalloc), which also
+shows the stream engine's small working set.
+
+Run from the repository root:
+    python benchmarks/bench_stream.py
+    python benchmarks/bench_stream.py --paragraphs 5000 20000 80000
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+
+ENGINES = ("docx", "fragments", "stream")
+
+
+def _peak_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(engine, template_path):
+    """Render once in this process and print JSON with seconds and peak KB"""
+    from docx_stream import render_stream
+    from fragments import FragmentStore
+    from renderer import render_document
+    from template_cache import TemplateCache
+
+    baseline = _peak_kb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    if engine == "stream":
+        render_stream(template_path, SAMPLE_PLACEHOLDERS, io.BytesIO())
+    else:
+        cache = TemplateCache()
+        store = FragmentStore(cache, store_dir=tempfile.mkdtemp()) if engine == "fragments" else None
+        render_document(template_path, SAMPLE_PLACEHOLDERS, cache, render_cache=None, fragments=store)
+    seconds = time.perf_counter() - started
+    traced = tracemalloc.get_traced_memory()[1]
+    print(json.dumps({"seconds": seconds, "peak_kb": _peak_kb() - baseline, "traced_kb": traced / 1024}))
+
+
+def measure(engine, template_path):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", engine, template_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[2000, 10000, 40000])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--child", nargs=2, metavar=("ENGINE", "TEMPLATE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    print(f"{'paragraphs':>10} {'xml MB':>7} " + "  ".join(f"{engine + ' RSS':>14} {'py MB':>6} {'ms':>6}" for engine in args.engines))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for paragraphs in args.paragraphs:
+            template_path = os.path.join(temp_dir, f"t{paragraphs}.docx")
+            data = build_template(paragraphs=paragraphs, table_depth=2)
+            with open(template_path, "wb") as f:
+                f.write(data)
+            with zipfile.ZipFile(template_path) as z:
+                xml_mb = z.getinfo("word/document.xml").file_size / 2 ** 20
+            cells = []
+            for engine in args.engines:
+                result = measure(engine, template_path)
+                cells.append(f"{result['peak_kb'] / 1024:>14.1f} {result['traced_kb'] / 1024:>6.1f} "
+                             f"{result['seconds'] * 1000:>6.0f}")
+            print(f"{paragraphs:>10} {xml_mb:>7.1f} " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
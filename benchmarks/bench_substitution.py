@@ -0,0 +1,56 @@
+"""Compare per-key str.replace against the single-pass placeholder matcher.
+
+Run from the repository root:
+    python benchmarks/bench_substitution.py --paragraphs 3000
+"""
+import argparse
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+from substitution import PlaceholderMatcher
+
+
+def legacy_substitute(texts, placeholders):
+    out = []
+    for text in texts:
+        for ph, value in placeholders.items():
+            text = text.replace(ph, str(value))
+        out.append(text)
+    return out
+
+
+def matcher_substitute(texts, placeholders):
+    matcher = PlaceholderMatcher(placeholders)
+    return [matcher.sub(text) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    doc = Document(io.BytesIO(build_template(paragraphs=args.paragraphs)))
+    texts = [p.text for p in doc.paragraphs]
+    assert legacy_substitute(texts, SAMPLE_PLACEHOLDERS) == matcher_substitute(texts, SAMPLE_PLACEHOLDERS)
+
+    results = {}
+    for name, func in (("str.replace per key", legacy_substitute), ("single-pass matcher", matcher_substitute)):
+        results[name] = min(timeit.repeat(lambda: func(texts, SAMPLE_PLACEHOLDERS), number=1, repeat=args.repeat))
+
+    print(f"{len(texts)} paragraphs (~{len(texts) // 30} pages), {len(SAMPLE_PLACEHOLDERS)} placeholders")
+    for name, seconds in results.items():
+        print(f"  {name:<22} {seconds * 1000:8.2f} ms")
+    legacy, fast = results.values()
+    print(f"  speedup                {legacy / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
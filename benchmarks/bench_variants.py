@@ -0,0 +1,82 @@
+"""Compare rendering N placeholder variants one by one with one fan-out from a single parse.
+
+separate: every variant parses the template, runs replace_and_format and
+saves, as each click did before. fanout: compile the template's fragments
+once, then render every variant from them (the compile is included).
+
+Run from the repository root:
+    python benchmarks/bench_variants.py
+    python benchmarks/bench_variants.py --case xlarge --variants 1 4 16 64
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.bench_render import CASES
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+from docx_render import replace_and_format
+from fragments import compile_template
+from template_cache import TemplateCache
+
+
+def variant_placeholders(n):
+    """n placeholder sets that differ in client name and price tier"""
+    return [
+        (f"variant-{i}", {**SAMPLE_PLACEHOLDERS, "<<Client Name>>": f"Client {i}", "<<M-Price>>": f"${1000 * (i + 1):,}"})
+        for i in range(n)
+    ]
+
+
+def separate(template_path, variants):
+    with open(template_path, "rb") as f:
+        source = f.read()
+    for _, placeholders in variants:
+        doc = Document(io.BytesIO(source))
+        replace_and_format(doc, placeholders)
+        doc.save(io.BytesIO())
+
+
+def fanout(template_path, variants):
+    compiled = compile_template(TemplateCache().get(template_path))
+    for _, placeholders in variants:
+        compiled.render(placeholders)
+
+
+def _best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", choices=list(CASES), default="large")
+    parser.add_argument("--variants", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, f"{args.case}.docx")
+        with open(template_path, "wb") as f:
+            f.write(build_template(**CASES[args.case]))
+
+        print(f"{'variants':>8} {'separate ms':>12} {'fanout ms':>10} {'per variant':>12} {'speedup':>8}")
+        for n in args.variants:
+            variants = variant_placeholders(n)
+            slow = _best_of(args.repeat, separate, template_path, variants)
+            fast = _best_of(args.repeat, fanout, template_path, variants)
+            print(f"{n:>8} {slow * 1000:>12.1f} {fast * 1000:>10.1f} {fast * 1000 / n:>12.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
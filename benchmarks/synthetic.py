@@ -0,0 +1,91 @@
+"""Synthetic proposal templates for the benchmarks"""
+import io
+import os
+
+from docx import Document
+
+FILLER = "Our team will design, build and maintain the automation workflows for your business. "
+
+SAMPLE_PLACEHOLDERS = {
+    "<<Client Name>>": "Acme Corp",
+    "<<Client Email>>": "ops@acme.example",
+    "<<Client Number>>": "+1 555 0100",
+    "<<Date>>": "01-01-2026",
+    "<<Country>>": "USA",
+    "<<VDate>>": "31-01-2026",
+    "<<M-Price>>": "$1,500",
+    "<<C-Price>>": "",
+    "<<MC-Price>>": "$900",
+    "<<AM-Price>>": "$240",
+    "<<T-Price>>": "$2,640",
+    "<<AF-Price>>": "$250",
+    "<<T1>>": "",
+    "<<T2>>": "",
+    "<<P1>>": "1",
+    "<<F1>>": "2",
+    "<<B1>>": "1",
+    "<<A1>>": "0",
+    "<<U1>>": "1",
+    "<<S1>>": "0",
+    "<<BD1>>": "2",
+    "<<AD1>>": "0",
+}
+
+PRICING_ROWS = [
+    ("ManyChat Automation", "<<MC-Price>>"),
+    ("Make Automation", "<<M-Price>>"),
+    ("CRM Automations", "<<C-Price>>"),
+    ("Annual Maintenance", "<<AM-Price>>"),
+    ("Total Amount", "<<T-Price>>"),
+]
+
+
+def _add_nested_tables(cell, depth):
+    """Nest depth levels of team tables inside cell, each holding placeholders"""
+    for level in range(depth):
+        table = cell.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = f"Level {level + 1} project manager"
+        table.cell(0, 1).text = "<<P1>>"
+        table.cell(1, 0).text = "Frontend developers"
+        table.cell(1, 1).text = "<<F1>>"
+        cell = table.cell(1, 0)
+
+
+def _noise_png(width, height):
+    """Incompressible PNG, standing in for the screenshots real templates embed"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(buffer, "PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def build_template(paragraphs=3000, placeholder_every=50, tables=1, table_depth=0,
+                   images=0, image_size=(800, 600)):
+    """Return .docx bytes with roughly paragraphs / 30 pages of text and pricing tables.
+
+    placeholder_every controls placeholder density (0 disables them),
+    table_depth nests team tables inside each pricing table, and images
+    embeds that many random-pixel PNGs of image_size.
+    """
+    doc = Document()
+    doc.add_paragraph("Proposal for <<Client Name>> (<<Client Email>>) dated <<Date>>")
+    doc.sections[0].header.paragraphs[0].text = "<<Client Name>> | Valid until <<VDate>>"
+    for i in range(paragraphs):
+        para = doc.add_paragraph(FILLER * 3)
+        if placeholder_every and i % placeholder_every == 0:
+            run = para.add_run(" Prepared for <<Client")
+            run.bold = True
+            para.add_run(" Name>> in <<Country>>, valid until <<VDate>>.")
+    for _ in range(tables):
+        table = doc.add_table(rows=len(PRICING_ROWS), cols=2)
+        for row, (label, placeholder) in zip(table.rows, PRICING_ROWS):
+            row.cells[0].text = label
+            row.cells[1].text = placeholder
+        _add_nested_tables(table.cell(0, 0), table_depth)
+    for _ in range(images):
+        doc.add_picture(_noise_png(*image_size))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,71 @@
+"""Proposal bundles: several proposal types for one client, delivered together.
+
+A bundle resolves its placeholders once (bundle_placeholders in
+proposals.py), renders its proposals in parallel and delivers them either
+as a zip holding one file per proposal or merged into a single document
+(docx_merge.py). The app submits each proposal of a bundle as its own job
+to the render workers (job_queue.py), so with at least as many workers as
+proposals a bundle takes about as long as its slowest proposal plus the
+merge. render_bundle() renders on a thread pool in the calling process
+instead, for the API and batch runs.
+"""
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from proposal_config import PROPOSAL_CONFIG
+
+BUNDLE_FORMATS = ("zip", "docx")
+ZIP_MIME = "application/zip"
+
+
+def bundle_member_name(selected_proposal, client_name, date):
+    """File name of one proposal within a bundle, unique per proposal type"""
+    return f"{selected_proposal} - {client_name} {date.strftime('%d-%m-%Y')}.docx"
+
+
+def bundle_filename(client_name, date, bundle_format="zip"):
+    """File name offered for the whole bundle"""
+    return f"Proposal Bundle - {client_name} {date.strftime('%d-%m-%Y')}.{bundle_format}"
+
+
+def assemble_bundle(files, bundle_format="zip"):
+    """Zip [(filename, bytes)] or merge them into one .docx, in order; returns the bytes"""
+    if bundle_format not in BUNDLE_FORMATS:
+        raise ValueError(f"Unknown bundle format: {bundle_format!r}")
+    if bundle_format == "docx":
+        from docx_merge import merge_documents
+
+        return merge_documents([data for _, data in files])
+    buffer = io.BytesIO()
+    # .docx and .pdf members are already compressed, store them as is
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for filename, data in files:
+            archive.writestr(filename, data)
+    return buffer.getvalue()
+
+
+def _render_docx(selected_proposal, template_path, placeholders):
+    from renderer import render_document
+
+    return render_document(template_path, placeholders)
+
+
+def render_bundle(items, templates_dir=".", render=None, workers=None):
+    """Render [(proposal, placeholders, filename)] on a thread pool; returns [(filename, bytes)] in order.
+
+    render(selected_proposal, template_path, placeholders) renders one
+    proposal, a .docx through render_document by default.
+    """
+    render = render or _render_docx
+
+    def render_item(item):
+        selected_proposal, placeholders, filename = item
+        template_path = os.path.join(templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"])
+        return filename, render(selected_proposal, template_path, placeholders)
+
+    if len(items) == 1:
+        return [render_item(items[0])]
+    with ThreadPoolExecutor(max_workers=workers or len(items), thread_name_prefix="bundle") as pool:
+        return list(pool.map(render_item, items))
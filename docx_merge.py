@@ -0,0 +1,385 @@
+"""Merge rendered proposals into one document.
+
+merge_documents() appends every proposal after the first as a new section
+starting on a new page, with its own page setup, headers and footers. What
+the proposals share is merged once for the whole document, not once per
+section:
+
+    styles      the first proposal's styles win; styles only a later
+                proposal defines are copied over, once each
+    numbering   a later proposal's list definitions are copied under fresh
+                ids, and fresh list ids so Word does not carry on the first
+                proposal's lists, and its paragraphs and styles are pointed
+                at the copies; its lists numbered through a style the first
+                proposal defined are restarted
+    parts       images go through the package, so an image several
+                proposals embed (a logo) is stored once; hyperlinks,
+                headers, footers and any other related part are copied with
+                their own relationships
+
+Bookmarks are renumbered so they stay unique, and drawing ids so they
+stay unique across the body, headers, footers and every other part. Footnotes,
+endnotes and comments of the later proposals are not carried over; their
+references are dropped.
+"""
+import copy
+import io
+import re
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from docx import Document
+from docx.image.exceptions import UnrecognizedImageError
+from docx.image.image import Image
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part, XmlPart
+from docx.oxml.ns import qn
+from docx.parts.image import ImagePart
+from lxml import etree
+
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+# Every attribute in the relationships namespace (r:id, r:embed, r:link...)
+_R_ATTRIBUTES = etree.XPath(f".//@*[namespace-uri() = '{_R_NS}']")
+_NOTE_TAGS = (qn("w:footnoteReference"), qn("w:endnoteReference"), qn("w:commentReference"),
+              qn("w:commentRangeStart"), qn("w:commentRangeEnd"))
+# Relationships a copied part keeps only in the first proposal
+_NOT_CARRIED = {RT.FOOTNOTES, RT.ENDNOTES, RT.COMMENTS}
+_VAL = qn("w:val")
+_ID = qn("w:id")
+_NAME = qn("w:name")
+
+
+def _max_int(elements, attribute):
+    return max((int(element.get(attribute)) for element in elements if element.get(attribute, "").isdigit()),
+               default=0)
+
+
+def _insert_before(parent, element, tags):
+    """Insert element before parent's first child with one of tags, else append it"""
+    for child in parent.iterchildren(*tags):
+        child.addprevious(element)
+        return
+    parent.append(element)
+
+
+class _PartCopier:
+    """Copies the parts one source document relates to into the merged package"""
+
+    def __init__(self, package, partnames, images):
+        self.package = package
+        # Part names already taken and image parts by sha1 in the merged
+        # package, both shared by every copier
+        self.partnames = partnames
+        self.images = images
+        self.copies = {}
+
+    def _partname(self, partname):
+        template = re.sub(r"\d*(\.\w+)$", r"%d\1", str(partname))
+        n = 1
+        while template % n in self.partnames:
+            n += 1
+        self.partnames.add(template % n)
+        return PackURI(template % n)
+
+    def part(self, part):
+        """The merged package's copy of a source part"""
+        if isinstance(part, ImagePart):
+            # The package keeps identical images once
+            image_part = self.images.get(part.sha1)
+            if image_part is not None:
+                return image_part
+            try:
+                image = Image.from_blob(part.blob)
+            except UnrecognizedImageError:
+                pass
+            else:
+                image_part = ImagePart.from_image(image, self._partname(f"/word/media/image.{image.ext}"))
+                self.package.image_parts.append(image_part)
+                self.images[part.sha1] = image_part
+                return image_part
+        copied = self.copies.get(part.partname)
+        if copied is None:
+            partname = self._partname(part.partname)
+            if isinstance(part, XmlPart):
+                copied = type(part)(partname, part.content_type, copy.deepcopy(part.element), self.package)
+            else:
+                copied = Part(partname, part.content_type, part.blob, self.package)
+            self.copies[part.partname] = copied
+            # A copy keeps the relationship ids its XML refers to
+            for rel in part.rels.values():
+                if rel.reltype in _NOT_CARRIED:
+                    continue
+                target = rel.target_ref if rel.is_external else self.part(rel.target_part)
+                copied.rels.add_relationship(rel.reltype, target, rel.rId, rel.is_external)
+        return copied
+
+    def relink(self, element, source, target):
+        """Point the relationship ids in element from source part's relationships to target's"""
+        for value in _R_ATTRIBUTES(element):
+            rel = source.rels.get(str(value))
+            if rel is None:
+                continue
+            if rel.is_external:
+                rId = target.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                rId = target.relate_to(self.part(rel.target_part), rel.reltype)
+            value.getparent().set(value.attrname, rId)
+
+
+class DocumentMerger:
+    """Appends documents to a base document, merging styles and numbering once"""
+
+    def __init__(self, document):
+        self.document = document
+        self.part = document.part
+        self.body = document.element.body
+        self.styles = document.styles.element
+        self.style_elements = {style.get(qn("w:styleId")): style for style in self.styles.iterchildren(qn("w:style"))}
+        self.partnames = {str(part.partname) for part in self.part.package.iter_parts()}
+        # Hashed once here rather than per image added, as python-docx's get_or_add_image_part does
+        self.images = {part.sha1: part for part in self.part.package.image_parts}
+        self._use_numbering(self._numbering_part(self.part))
+        starts = list(self.body.iter(qn("w:bookmarkStart")))
+        self.bookmark_names = {start.get(_NAME) for start in starts}
+        self.next_bookmark = _max_int(starts, _ID) + 1
+
+    @staticmethod
+    def _numbering_part(part):
+        try:
+            return part.part_related_by(RT.NUMBERING)
+        except KeyError:
+            return None
+
+    def _use_numbering(self, numbering_part):
+        self.numbering_part = numbering_part
+        self.numbering = numbering_part.element if numbering_part is not None else None
+        if self.numbering is None:
+            return
+        self.next_picture_bullet = _max_int(self.numbering.iterchildren(qn("w:numPicBullet")), qn("w:numPicBulletId")) + 1
+        self.next_abstract = _max_int(self.numbering.iterchildren(qn("w:abstractNum")), qn("w:abstractNumId")) + 1
+        self.next_num = _max_int(self.numbering.iterchildren(qn("w:num")), qn("w:numId")) + 1
+        self.nsids = {nsid.get(_VAL) for nsid in self.numbering.iter(qn("w:nsid"))}
+        self.next_nsid = 1
+
+    def _nsid(self):
+        while f"{self.next_nsid:08X}" in self.nsids:
+            self.next_nsid += 1
+        self.nsids.add(f"{self.next_nsid:08X}")
+        return f"{self.next_nsid:08X}"
+
+    def _merge_numbering(self, source, copier):
+        """Copy source's list definitions under fresh ids; returns {source numId: merged numId}"""
+        numbering_part = self._numbering_part(source.part)
+        if numbering_part is None:
+            return {}
+        if self.numbering is None:
+            # Nothing to clash with: the source's numbering is taken as is
+            self.part.relate_to(copier.part(numbering_part), RT.NUMBERING)
+            self._use_numbering(self._numbering_part(self.part))
+            return {}
+        copier.relink(numbering_part.element, numbering_part, self.numbering_part)
+
+        bullets = {}
+        for bullet in list(numbering_part.element.iterchildren(qn("w:numPicBullet"))):
+            bullets[bullet.get(qn("w:numPicBulletId"))] = str(self.next_picture_bullet)
+            bullet.set(qn("w:numPicBulletId"), str(self.next_picture_bullet))
+            self.next_picture_bullet += 1
+            _insert_before(self.numbering, bullet, (qn("w:abstractNum"), qn("w:num"), qn("w:numIdMacAtCleanup")))
+        abstracts = {}
+        for abstract in list(numbering_part.element.iterchildren(qn("w:abstractNum"))):
+            abstracts[abstract.get(qn("w:abstractNumId"))] = str(self.next_abstract)
+            abstract.set(qn("w:abstractNumId"), str(self.next_abstract))
+            self.next_abstract += 1
+            for nsid in abstract.iterchildren(qn("w:nsid")):
+                nsid.set(_VAL, self._nsid())
+            for picture in abstract.iter(qn("w:lvlPicBulletId")):
+                picture.set(_VAL, bullets.get(picture.get(_VAL), picture.get(_VAL)))
+            _insert_before(self.numbering, abstract, (qn("w:num"), qn("w:numIdMacAtCleanup")))
+        num_ids = {}
+        for num in list(numbering_part.element.iterchildren(qn("w:num"))):
+            num_ids[num.get(qn("w:numId"))] = str(self.next_num)
+            num.set(qn("w:numId"), str(self.next_num))
+            self.next_num += 1
+            for abstract_id in num.iterchildren(qn("w:abstractNumId")):
+                abstract_id.set(_VAL, abstracts.get(abstract_id.get(_VAL), abstract_id.get(_VAL)))
+            _insert_before(self.numbering, num, (qn("w:numIdMacAtCleanup"),))
+        return num_ids
+
+    def _merge_styles(self, source):
+        """Move over the styles the merged document lacks; returns them"""
+        added = []
+        for style in list(source.styles.element.iterchildren(qn("w:style"))):
+            style_id = style.get(qn("w:styleId"))
+            if style_id not in self.style_elements:
+                self.style_elements[style_id] = style
+                self.styles.append(style)
+                added.append(style)
+        return added
+
+    def _style_numbering(self, style_id):
+        """(numId, ilvl) a paragraph style numbers its paragraphs with, following basedOn"""
+        num_id = level = None
+        seen = set()
+        while style_id in self.style_elements and style_id not in seen:
+            seen.add(style_id)
+            style = self.style_elements[style_id]
+            numbering = style.find(f"{qn('w:pPr')}/{qn('w:numPr')}")
+            if numbering is not None:
+                if num_id is None and numbering.find(qn("w:numId")) is not None:
+                    num_id = numbering.find(qn("w:numId")).get(_VAL)
+                if level is None and numbering.find(qn("w:ilvl")) is not None:
+                    level = numbering.find(qn("w:ilvl")).get(_VAL)
+            based_on = style.find(qn("w:basedOn"))
+            style_id = based_on.get(_VAL) if based_on is not None else None
+        return num_id, level or "0"
+
+    def _restart_num(self, num_id):
+        """A new list instance of num_id's definition, counting from its start again"""
+        abstract_id = None
+        for num in self.numbering.iterchildren(qn("w:num")):
+            if num.get(qn("w:numId")) == num_id:
+                abstract_id = num.find(qn("w:abstractNumId")).get(_VAL)
+        restart = self.numbering.makeelement(qn("w:num"), {qn("w:numId"): str(self.next_num)})
+        self.next_num += 1
+        restart.append(restart.makeelement(qn("w:abstractNumId"), {_VAL: abstract_id}))
+        for abstract in self.numbering.iterchildren(qn("w:abstractNum")):
+            if abstract.get(qn("w:abstractNumId")) != abstract_id:
+                continue
+            for level in abstract.iterchildren(qn("w:lvl")):
+                start = level.find(qn("w:start"))
+                override = restart.makeelement(qn("w:lvlOverride"), {qn("w:ilvl"): level.get(qn("w:ilvl"))})
+                override.append(override.makeelement(qn("w:startOverride"), {
+                    _VAL: start.get(_VAL) if start is not None else "0"}))
+                restart.append(override)
+        _insert_before(self.numbering, restart, (qn("w:numIdMacAtCleanup"),))
+        return restart.get(qn("w:numId"))
+
+    def _restart_style_lists(self, body, own_num_ids):
+        """Restart lists a later proposal numbers through a style the first one defined.
+
+        Such paragraphs would otherwise carry on counting from the first
+        proposal's list; they get a direct reference to a restarted copy.
+        """
+        if self.numbering is None:
+            return
+        numbered, default = {}, None
+        for style_id, style in self.style_elements.items():
+            if style.get(qn("w:type")) != "paragraph":
+                continue
+            if style.get(qn("w:default")) in ("1", "true"):
+                default = style_id
+            num_id, level = self._style_numbering(style_id)
+            if num_id not in (None, "0") and num_id not in own_num_ids:
+                numbered[style_id] = num_id, level
+        if not numbered:
+            return
+        restarts = {}
+        for paragraph in body.iter(qn("w:p")):
+            properties = paragraph.find(qn("w:pPr"))
+            if properties is not None and properties.find(qn("w:numPr")) is not None:
+                continue
+            style = properties.find(qn("w:pStyle")) if properties is not None else None
+            style_id = style.get(_VAL) if style is not None else default
+            if style_id not in numbered:
+                continue
+            num_id, level = numbered[style_id]
+            if num_id not in restarts:
+                restarts[num_id] = self._restart_num(num_id)
+            numbering = paragraph.get_or_add_pPr().get_or_add_numPr()
+            numbering.get_or_add_ilvl().val = int(level)
+            numbering.get_or_add_numId().val = int(restarts[num_id])
+
+    def _renumber_bookmarks(self, body):
+        ids, names = {}, {}
+        for start in body.iter(qn("w:bookmarkStart")):
+            ids[start.get(_ID)] = str(self.next_bookmark)
+            start.set(_ID, str(self.next_bookmark))
+            self.next_bookmark += 1
+            name = start.get(_NAME)
+            if name in self.bookmark_names:
+                n = 2
+                while f"{name}_{n}" in self.bookmark_names:
+                    n += 1
+                names[name] = f"{name}_{n}"
+                start.set(_NAME, names[name])
+            self.bookmark_names.add(start.get(_NAME))
+        for end in body.iter(qn("w:bookmarkEnd")):
+            end.set(_ID, ids.get(end.get(_ID), end.get(_ID)))
+        if names:
+            for link in body.iter(qn("w:hyperlink")):
+                anchor = link.get(qn("w:anchor"))
+                if anchor in names:
+                    link.set(qn("w:anchor"), names[anchor])
+
+    def append(self, source):
+        """Append source (a python-docx Document) as a new section; source is consumed"""
+        copier = _PartCopier(self.part.package, self.partnames, self.images)
+        num_ids = self._merge_numbering(source, copier)
+        body = source.element.body
+        for element in [body, *self._merge_styles(source)]:
+            for num_id in element.iter(qn("w:numId")):
+                num_id.set(_VAL, num_ids.get(num_id.get(_VAL), num_id.get(_VAL)))
+        self._restart_style_lists(body, set(num_ids.values()))
+        for note in list(body.iter(*_NOTE_TAGS)):
+            note.getparent().remove(note)
+        self._renumber_bookmarks(body)
+        copier.relink(body, source.part, self.part)
+
+        # The merged document's last section now ends here, on a paragraph of its own
+        paragraph = self.body.makeelement(qn("w:p"), {})
+        properties = paragraph.makeelement(qn("w:pPr"), {})
+        paragraph.append(properties)
+        section = self.body.find(qn("w:sectPr"))
+        if section is not None:
+            properties.append(section)
+        self.body.append(paragraph)
+        for child in list(body.iterchildren()):
+            self.body.append(child)
+
+    def finish(self):
+        """Renumber drawing ids across every part of the merged package; returns the .docx bytes"""
+        # Word wants them unique document-wide, and copied headers and footers repeat their source's ids
+        parts = [self.part] + [part for part in self.part.package.iter_parts()
+                               if isinstance(part, XmlPart) and part is not self.part]
+        drawings = (properties for part in parts for properties in part.element.iter(qn("wp:docPr")))
+        for n, properties in enumerate(drawings, start=1):
+            properties.set("id", str(n))
+        return save_package(self.part.package)
+
+
+def save_package(package):
+    """Serialize a python-docx package, storing images rather than deflating them again.
+
+    Images are already compressed, so deflating them buys nothing and was
+    most of the time python-docx's own save took on a merged bundle.
+    """
+    parts = list(package.iter_parts())
+    types = [f'<Types xmlns="{_TYPES_NS}">',
+             '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>',
+             '<Default Extension="xml" ContentType="application/xml"/>']
+    types += [f"<Override PartName={quoteattr(str(part.partname))} ContentType={quoteattr(part.content_type)}/>"
+              for part in parts]
+    types.append("</Types>")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + "".join(types))
+        z.writestr("_rels/.rels", package.rels.xml)
+        for part in parts:
+            part.before_marshal()
+            compress_type = zipfile.ZIP_STORED if part.content_type.startswith("image/") else zipfile.ZIP_DEFLATED
+            z.writestr(part.partname.membername, part.blob, compress_type=compress_type)
+            if len(part.rels):
+                z.writestr(part.partname.rels_uri.membername, part.rels.xml)
+    return buffer.getvalue()
+
+
+def merge_documents(documents):
+    """Merge .docx files (bytes), in order, into one .docx; returns its bytes"""
+    if len(documents) == 1:
+        return documents[0]
+    merger = DocumentMerger(Document(io.BytesIO(documents[0])))
+    for data in documents[1:]:
+        merger.append(Document(io.BytesIO(data)))
+    return merger.finish()
@@ -0,0 +1,253 @@
+from contextlib import nullcontext
+
+from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from substitution import PLACEHOLDER_MARKER, PLACEHOLDER_TOKEN, get_matcher
+
+W_BODY = qn("w:body")
+W_P = qn("w:p")
+W_TBL = qn("w:tbl")
+W_TC = qn("w:tc")
+W_TXBX_CONTENT = qn("w:txbxContent")
+# Wrappers whose children are still block content (content controls, custom XML)
+W_BLOCK_WRAPPERS = {qn("w:sdt"), qn("w:sdtContent"), qn("w:customXml")}
+
+STORY_CONTENT_TYPES = (CT.WML_DOCUMENT_MAIN, CT.WML_HEADER, CT.WML_FOOTER)
+
+_PRUNE = object()
+# Evaluated in C, unlike itertext() which goes through python-docx's element classes
+_string_value = etree.XPath("string(.)")
+
+
+def apply_formatting(new_run, original_run):
+    """Copy formatting from original run to new run"""
+    if original_run.font.name:
+        new_run.font.name = original_run.font.name
+        new_run._element.rPr.rFonts.set(qn('w:eastAsia'), original_run.font.name)
+    if original_run.font.size:
+        new_run.font.size = original_run.font.size
+    if original_run.font.color.rgb:
+        new_run.font.color.rgb = original_run.font.color.rgb
+    new_run.bold = original_run.bold
+    new_run.italic = original_run.italic
+
+
+def replace_in_paragraph(para, placeholders):
+    """Handle paragraph replacements preserving formatting"""
+    matcher = get_matcher(placeholders)
+    text = para.text
+    full_text = matcher.sub(text)
+
+    if full_text is not text:
+        rebuild_paragraph(para, full_text)
+
+
+def rebuild_paragraph(para, text):
+    """Replace the paragraph's runs with one run of text, formatted like the first run with text"""
+    original_runs = para.runs.copy()
+    para.clear()
+    new_run = para.add_run(text)
+    if original_runs:
+        original_run = next((r for r in original_runs if r.text), None)
+        if original_run:
+            apply_formatting(new_run, original_run)
+
+
+def may_contain_placeholder(p):
+    """Cheap pre-check on raw text nodes before building the paragraph text"""
+    return PLACEHOLDER_MARKER in _string_value(p)
+
+
+def element_path(root, element):
+    """Return the child-index path that leads from root down to element"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def resolve_path(root, path):
+    """Follow a child-index path recorded by element_path"""
+    element = root
+    for idx in path:
+        element = element[idx]
+    return element
+
+
+def iter_story_parts(doc):
+    """Yield the main document part followed by every header and footer part"""
+    yield doc.part
+    for part in doc.part.package.iter_parts():
+        if part.content_type in STORY_CONTENT_TYPES[1:]:
+            yield part
+
+
+def template_placeholders(doc):
+    """Every <<...>> token written in the document body, headers and footers"""
+    found = set()
+    for part in iter_story_parts(doc):
+        for p in part.element.iter(W_P):
+            text = _string_value(p)
+            if PLACEHOLDER_MARKER in text:
+                found.update(PLACEHOLDER_TOKEN.findall(text))
+    return frozenset(found)
+
+
+def _grid_cells(tr):
+    """Return one tc per layout-grid column, matching python-docx's row.cells"""
+    cells = []
+    for tc in tr.tc_lst:
+        top = tc
+        while top.vMerge == "continue":
+            top = top._tc_above
+        cells.extend([top] * tc.grid_span)
+    return cells
+
+
+def _cell_text(tc):
+    return "\n".join(p.text for p in tc.p_lst)
+
+
+def empty_rows(tbl):
+    """Rows whose second cell is empty, the rows remove_empty_rows drops"""
+    rows = []
+    for tr in tbl.tr_lst:
+        cells = _grid_cells(tr)
+        if len(cells) > 1 and _cell_text(cells[1]).strip() == "":
+            rows.append(tr)
+    return rows
+
+
+def remove_empty_rows(table):
+    """Remove rows from the table where the second cell is empty or has no value."""
+    for tr in reversed(empty_rows(table._tbl)):
+        table._tbl.remove(tr)
+
+
+def walk_story(root, on_paragraph, on_cell, on_table, blocks=None):
+    """Visit every paragraph of a story in one iterative pass.
+
+    Paragraphs are reported at any depth: nested tables, content controls
+    and text boxes included. Cells and tables are reported only for tables
+    sitting directly in the body, the ones the pricing layout lives in;
+    vertically merged continuation cells are skipped like row.cells does,
+    and on_table runs after all of that table's cells have been visited.
+    blocks, when given, limits the walk to those children of the body.
+    """
+    body = root.find(W_BODY)
+    container = root if body is None else body
+    stack = [(container, False)]
+    while stack:
+        element, top_level = stack.pop()
+        if element is _PRUNE:
+            on_table(top_level)
+            continue
+        if top_level and element.vMerge != "continue":
+            on_cell(element)
+        for child in (blocks if element is container and blocks is not None else element):
+            tag = child.tag
+            if tag == W_P:
+                on_paragraph(child)
+                for txbx in child.iter(W_TXBX_CONTENT):
+                    stack.append((txbx, False))
+            elif tag == W_TBL:
+                child_top = element.tag == W_BODY
+                if child_top:
+                    # Popped only once every cell pushed after it is done
+                    stack.append((_PRUNE, child))
+                for tr in reversed(child.tr_lst):
+                    for tc in reversed(tr.tc_lst):
+                        stack.append((tc, child_top))
+            elif tag in W_BLOCK_WRAPPERS:
+                stack.append((child, False))
+
+
+def _set_center(tc):
+    tc.get_or_add_tcPr().vAlign_val = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+
+def _prune_table(tbl):
+    for tr in reversed(empty_rows(tbl)):
+        tbl.remove(tr)
+
+
+def replace_and_format(doc, placeholders, index=None):
+    """Substitute placeholders, center body table cells and drop empty pricing rows.
+
+    Without an index every story (body, headers, footers) is walked once;
+    with an index from build_placeholder_index only the recorded locations
+    are touched.
+    """
+    matcher = get_matcher(placeholders)
+    if index is not None:
+        return replace_indexed(doc, index, matcher)
+
+    for part in iter_story_parts(doc):
+        def on_paragraph(p, part=part):
+            if may_contain_placeholder(p):
+                replace_in_paragraph(Paragraph(p, part), matcher)
+
+        walk_story(part.element, on_paragraph, _set_center, _prune_table)
+    return doc
+
+
+def build_placeholder_index(doc):
+    """Record, per story part, where a render has to do any work"""
+    index = {}
+    for part in iter_story_parts(doc):
+        root = part.element
+        entry = {"paragraphs": [], "cells": [], "tables": []}
+
+        def on_paragraph(p, root=root, entry=entry):
+            if may_contain_placeholder(p) and PLACEHOLDER_MARKER in p.text:
+                entry["paragraphs"].append(element_path(root, p))
+
+        walk_story(
+            root,
+            on_paragraph,
+            lambda tc, root=root, entry=entry: entry["cells"].append(element_path(root, tc)),
+            lambda tbl, root=root, entry=entry: entry["tables"].append(element_path(root, tbl)),
+        )
+        index[str(part.partname)] = entry
+    return index
+
+
+def replace_indexed(doc, index, placeholders, stage=None):
+    """Apply replace_and_format using a precomputed index.
+
+    stage, when given, is a context manager factory (see instrumentation)
+    wrapped around the substitution and row pruning steps.
+    """
+    matcher = get_matcher(placeholders)
+    stage = stage or (lambda name: nullcontext())
+    resolved = []
+    for part in iter_story_parts(doc):
+        entry = index.get(str(part.partname))
+        if entry is None:
+            continue
+        root = part.element
+        # Resolve every path before editing, since edits can shift child indexes
+        resolved.append((
+            part,
+            [resolve_path(root, path) for path in entry["paragraphs"]],
+            [resolve_path(root, path) for path in entry["cells"]],
+            [resolve_path(root, path) for path in entry["tables"]],
+        ))
+
+    with stage("substitution"):
+        for part, paragraphs, cells, _ in resolved:
+            for p in paragraphs:
+                replace_in_paragraph(Paragraph(p, part), matcher)
+            for tc in cells:
+                _set_center(tc)
+    with stage("row_pruning"):
+        for _, _, _, tables in resolved:
+            for tbl in tables:
+                _prune_table(tbl)
+    return doc
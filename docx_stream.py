@@ -0,0 +1,157 @@
+"""Streaming render engine for very large templates.
+
+The main document part is parsed incrementally and written straight into
+the output archive: each top-level body block (paragraph, table, content
+control) is substituted, centered and pruned exactly as replace_and_format
+does once the parser has finished it, serialized, and then dropped from
+the tree. Only the block being processed is ever held in memory, so peak
+memory follows the largest single block instead of the whole document.
+Headers and footers are small and are processed whole; every other member
+is copied from the template archive without recompressing.
+
+The story parts match what replace_and_format + remove_empty_rows produce,
+byte for byte. The engine does not use TemplateCache or fragments, since
+the point is to never hold a parsed copy of the template.
+"""
+import copy
+import re
+import zipfile
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.parser import element_class_lookup, parse_xml
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from docx_render import W_BODY, _prune_table, _set_center, may_contain_placeholder, replace_in_paragraph, walk_story
+from docx_writer import write_package
+from substitution import get_matcher
+
+CHUNK_SIZE = 64 * 1024
+
+_CONTENT_TYPES = "[Content_Types].xml"
+_OVERRIDE = "{http://schemas.openxmlformats.org/package/2006/content-types}Override"
+_HEAD_MARKER = b"<?stream-body ?>"
+
+
+def story_members(source):
+    """(main document member, header and footer members) named in the content types"""
+    types = etree.fromstring(source.read(_CONTENT_TYPES))
+    main, others = None, []
+    for override in types.iter(_OVERRIDE):
+        name = override.get("PartName").lstrip("/")
+        content_type = override.get("ContentType")
+        if content_type == CT.WML_DOCUMENT_MAIN:
+            main = name
+        elif content_type in (CT.WML_HEADER, CT.WML_FOOTER):
+            others.append(name)
+    return main, others
+
+
+def _escape(text):
+    if not text:
+        return b""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\r", "&#13;").encode("utf-8")
+
+
+def _namespace_pattern(root):
+    """Declarations lxml repeats on a serialized child that already sit on the root"""
+    if not root.nsmap:
+        return None
+    return re.compile(b"|".join(
+        re.escape(f' xmlns:{prefix}="{uri}"'.encode()) if prefix else re.escape(f' xmlns="{uri}"'.encode())
+        for prefix, uri in root.nsmap.items()
+    ))
+
+
+def _serialize_block(element, ns_pattern):
+    xml = etree.tostring(element, encoding="UTF-8", with_tail=False)
+    if ns_pattern is None:
+        return xml
+    end = xml.index(b">") + 1
+    return ns_pattern.sub(b"", xml[:end]) + xml[end:]
+
+
+def _document_head(root, body):
+    """The XML declaration and start tags up to the body's content, and the closing tags"""
+    skeleton = copy.deepcopy(root)
+    skeleton_body = skeleton.find(W_BODY)
+    for child in list(skeleton_body):
+        skeleton_body.remove(child)
+    skeleton_body.text = None
+    skeleton_body.append(etree.ProcessingInstruction("stream-body"))
+    head, tail = etree.tostring(skeleton, encoding="UTF-8", standalone=True).split(_HEAD_MARKER)
+    return head + _escape(body.text), tail
+
+
+def _visitors(matcher):
+    def on_paragraph(p):
+        if may_contain_placeholder(p):
+            # Substitution never needs the owning part
+            replace_in_paragraph(Paragraph(p, None), matcher)
+    return on_paragraph, _set_center, _prune_table
+
+
+def stream_story(stream, write, matcher):
+    """Render the part read from stream block by block, passing output bytes to write"""
+    on_paragraph, on_cell, on_table = _visitors(matcher)
+    parser = etree.XMLPullParser(events=("end",), remove_blank_text=True, resolve_entities=False, huge_tree=True)
+    parser.set_element_class_lookup(element_class_lookup)
+    state = {"body": None, "previous": None}
+
+    def on_events():
+        for _, element in parser.read_events():
+            body = element.getparent()
+            if body is None or body.tag != W_BODY:
+                continue
+            root = body.getparent()
+            if state["body"] is None:
+                state["body"] = body
+                state["ns_pattern"] = _namespace_pattern(root)
+                head, state["closing"] = _document_head(root, body)
+                write(head)
+            previous = state["previous"]
+            if previous is not None:
+                # A block's tail is only complete once the next block has been parsed
+                write(_escape(previous.tail))
+                body.remove(previous)
+            # Later blocks may already be half parsed, so only this one is walked
+            walk_story(root, on_paragraph, on_cell, on_table, blocks=(element,))
+            write(_serialize_block(element, state["ns_pattern"]))
+            state["previous"] = element
+
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        parser.feed(chunk)
+        on_events()
+    root = parser.close()
+    on_events()
+
+    if state["body"] is None:
+        # No body blocks (or no body at all): the part is small, render it whole
+        walk_story(root, on_paragraph, on_cell, on_table)
+        write(etree.tostring(root, encoding="UTF-8", standalone=True))
+        return
+    write(_escape(state["previous"].tail))
+    write(state["closing"])
+
+
+def render_part(blob, matcher):
+    """Render a whole (header or footer) part in memory"""
+    root = parse_xml(blob)
+    walk_story(root, *_visitors(matcher))
+    return etree.tostring(root, encoding="UTF-8", standalone=True)
+
+
+def render_stream(template_path, placeholders, out):
+    """Write the rendered .docx for template_path to out, a path or binary file object"""
+    matcher = get_matcher(placeholders)
+    with zipfile.ZipFile(template_path) as source:
+        main, others = story_members(source)
+        replacements = {name: render_part(source.read(name), matcher) for name in others}
+
+        def write_main(target):
+            with source.open(main) as stream:
+                stream_story(stream, target.write, matcher)
+
+        if main is not None:
+            replacements[main] = write_main
+        return write_package(source, out, replacements)
@@ -0,0 +1,38 @@
+"""Render many placeholder variants of one proposal from a single compiled template.
+
+compile_variants() fetches the template's precompiled fragments (see
+fragments.py), so the XML is parsed and split once for every variant; each
+variant then only substitutes the placeholder paragraphs and splices them
+between static segments that were deflated once. Templates the fragment
+format cannot express fall back to one python-docx render per variant.
+
+The uncompressed parts match what renderer.render_document produces for
+the same placeholders, byte for byte.
+"""
+from fragments import FRAGMENT_STORE, FragmentStore
+from renderer import render_document
+from template_cache import TEMPLATE_CACHE
+
+
+class _Fallback:
+    """Python-docx renders for templates without fragments"""
+
+    def __init__(self, template_path, cache):
+        self.template_path = template_path
+        self.cache = cache
+
+    def render(self, placeholders):
+        return render_document(self.template_path, placeholders, self.cache, render_cache=None, fragments=None)
+
+
+def compile_variants(template_path, cache=TEMPLATE_CACHE):
+    """Compile (or reuse) a template once; the result's render() takes placeholders"""
+    store = FRAGMENT_STORE if cache is TEMPLATE_CACHE else FragmentStore(cache, store_dir=FRAGMENT_STORE.store_dir)
+    return store.get(template_path) or _Fallback(template_path, cache)
+
+
+def render_variants(template_path, variants, cache=TEMPLATE_CACHE):
+    """Yield (name, .docx bytes) for every (name, placeholders) variant"""
+    plan = compile_variants(template_path, cache)
+    for name, placeholders in variants:
+        yield name, plan.render(placeholders)
@@ -0,0 +1,103 @@
+import copy
+import io
+import struct
+import zipfile
+from collections import namedtuple
+
+from docx_render import iter_story_parts
+
+# zipfile.sizeFileHeader / structFileHeader, spelled out to avoid private names
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+# A member compressed ahead of time: raw deflate data plus the CRC-32 and
+# size of the uncompressed bytes
+Deflated = namedtuple("Deflated", ["data", "crc", "size"])
+
+
+def changed_parts(index):
+    """Partnames an indexed render may touch; every other part is left as parsed"""
+    return {
+        partname for partname, entry in index.items()
+        if entry["paragraphs"] or entry["cells"] or entry["tables"]
+    }
+
+
+def _raw_member(source, info):
+    """Read a member's compressed bytes exactly as stored in the archive"""
+    source.fp.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(source.fp.read(_LOCAL_HEADER.size))
+    name_len, extra_len = header[10], header[11]
+    source.fp.seek(name_len + extra_len, io.SEEK_CUR)
+    return source.fp.read(info.compress_size)
+
+
+def _copy_member(target, info, raw):
+    """Append an already compressed member to target without recompressing it"""
+    info = copy.copy(info)
+    # Sizes go into the local header, so no trailing data descriptor is written
+    info.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+    target.fp.seek(target.start_dir)
+    info.header_offset = target.start_dir
+    target.fp.write(info.FileHeader())
+    target.fp.write(raw)
+    target.start_dir = target.fp.tell()
+    target.filelist.append(info)
+    target.NameToInfo[info.filename] = info
+    target._didModify = True
+
+
+def save_docx(doc, template_source, out, changed=None):
+    """Save doc by copying untouched parts byte-for-byte from the template archive.
+
+    template_source is the template path or its bytes. Only the parts named
+    in changed (all story parts when omitted) are serialized and compressed
+    again. Falls back to doc.save when the package no longer lines up with
+    the template, e.g. after parts were added.
+    """
+    if isinstance(template_source, (bytes, bytearray, memoryview)):
+        template_source = io.BytesIO(template_source)
+    if changed is None:
+        changed = {str(part.partname) for part in iter_story_parts(doc)}
+
+    blobs = {}
+    for part in doc.part.package.iter_parts():
+        partname = str(part.partname)
+        if partname in changed:
+            blobs[partname.lstrip("/")] = part.blob
+
+    with zipfile.ZipFile(template_source) as source:
+        if not set(blobs) <= set(source.namelist()):
+            doc.save(out)
+            return out
+        return write_package(source, out, blobs)
+
+
+def write_package(source, out, replacements, drop=()):
+    """Copy the source zip to out, swapping in new bytes for the named members.
+
+    Values in replacements are plain bytes, compressed here, Deflated
+    members written as they are, or callables that stream the member by
+    writing to the file object they are given. Members named in drop are
+    left out; every other member is copied raw.
+    """
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            if info.filename in drop:
+                continue
+            member = replacements.get(info.filename)
+            if member is None:
+                _copy_member(target, info, _raw_member(source, info))
+            elif isinstance(member, Deflated):
+                info = copy.copy(info)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.CRC, info.file_size, info.compress_size = member.crc, member.size, len(member.data)
+                _copy_member(target, info, member.data)
+            elif callable(member):
+                info = copy.copy(info)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with target.open(info, "w") as stream:
+                    member(stream)
+            else:
+                target.writestr(info.filename, member)
+    return out
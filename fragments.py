@@ -0,0 +1,473 @@
+"""Precompiled "fragment splice" templates: render by joining bytes.
+
+Compiling a template runs the python-docx work once: story parts are
+serialized into static byte segments around two kinds of slots.
+
+    paragraph slots   every paragraph holding a placeholder, stored as its
+                      original bytes plus the bytes of the single run that
+                      replace_in_paragraph would rebuild it into, with the
+                      formatting apply_formatting copies, split around the
+                      run's text
+    row groups        pricing-table rows whose second cell holds a slot, kept
+                      or dropped per render the way remove_empty_rows does
+
+Work that does not depend on the values (cell centering, pruning rows that
+are empty whatever the values) is done at compile time. A render only runs
+the placeholder matcher over the slot texts, writes the new runs as escaped
+text, and splices the result between static segments that were deflated
+once. The uncompressed parts are identical to the python-docx path.
+
+Compiled templates are stored in FRAGMENT_DIR (default
+$XDG_CACHE_HOME/proposal-generator/fragments, i.e. ~/.cache), one
+"<template>-<path hash>.fragments" file per template, and are rebuilt when
+the template's sha256 changes. They are pickles, so each file starts with
+the template's sha256 and an HMAC of the pickle, keyed by a random key
+kept in that directory (fragments.key, readable by its owner only). Both
+are checked before anything is unpickled; a file that fails either check
+is compiled again.
+Templates the format cannot express (a placeholder paragraph inside another
+one, e.g. in a text box) compile to None and render through python-docx.
+
+    python fragments.py *.docx      # compile ahead of time
+"""
+import copy
+import hashlib
+import hmac
+import io
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from docx_render import (
+    _cell_text, _grid_cells, _set_center, iter_story_parts, rebuild_paragraph, resolve_path
+)
+from docx_writer import Deflated, changed_parts, write_package
+from substitution import get_matcher
+from template_cache import TEMPLATE_CACHE
+
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = ".fragments"
+_ARTIFACT_MAGIC = b"proposal-fragments 1\n"
+_DIGEST_SIZE = 64
+_MAC_SIZE = hashlib.sha256().digest_size
+_KEY_NAME = "fragments.key"
+# Static segments at least this long are deflated once at compile time
+PRECOMPRESS_MIN = 1024
+
+_SENTINEL = "FRAGMENTSLOT"
+_SENTINEL_T = f"<w:t>{_SENTINEL}</w:t>".encode()
+_MARKER = re.compile(rb"<\?fragment ([smerq]) (\d+)\?>")
+_RUN_BREAKS = re.compile(r"(\t|\r|\n)")
+_XML_INCOMPATIBLE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff￾￿]")
+
+# text is the paragraph text before substitution, original its bytes, and
+# prefix/suffix the rebuilt paragraph around the new run's text elements
+Slot = namedtuple("Slot", ["text", "original", "prefix", "suffix"])
+# A pricing row kept only while the second cell's text, built from static
+# strings and slot numbers joined by newlines, is not blank
+Row = namedtuple("Row", ["number", "items"])
+Static = namedtuple("Static", ["data", "deflated", "crc"])
+
+
+class FragmentUnsupported(ValueError):
+    """Raised when a template cannot be expressed as fragments"""
+
+
+def _deflate(data):
+    """Raw deflate ending on a byte boundary, so streams can be concatenated"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def run_content(text):
+    """The w:t/w:tab/w:br elements python-docx writes for a run's text, serialized"""
+    if _XML_INCOMPATIBLE.search(text):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+    out = []
+    for piece in _RUN_BREAKS.split(text):
+        if piece == "\t":
+            out.append("<w:tab/>")
+        elif piece == "\n" or piece == "\r":
+            out.append("<w:br/>")
+        elif piece:
+            escaped = piece.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            if len(piece.strip()) < len(piece):
+                out.append(f'<w:t xml:space="preserve">{escaped}</w:t>')
+            else:
+                out.append(f"<w:t>{escaped}</w:t>")
+    return "".join(out).encode("utf-8")
+
+
+def _marker(kind, number):
+    return etree.ProcessingInstruction("fragment", f"{kind} {number}")
+
+
+def _row_condition(tr, slot_of):
+    """None when a row is never pruned, () when it always is, else its text sources"""
+    cells = _grid_cells(tr)
+    if len(cells) <= 1:
+        return None
+    paragraphs = cells[1].p_lst
+    if not any(p in slot_of for p in paragraphs):
+        return () if _cell_text(cells[1]).strip() == "" else None
+    return tuple(slot_of.get(p, p.text) for p in paragraphs)
+
+
+def _parse(xml, slots_texts, slots):
+    """Turn a part serialized with markers into nested static/slot/row items"""
+    items = []
+    stack = []
+    pieces = _MARKER.split(xml)
+    pending = {}
+
+    def add_static(data):
+        if not data:
+            return
+        if items and isinstance(items[-1], bytes):
+            items[-1] += data
+        else:
+            items.append(data)
+
+    add_static(pieces[0])
+    for i in range(1, len(pieces), 3):
+        kind, number, data = pieces[i].decode(), int(pieces[i + 1]), pieces[i + 2]
+        if kind == "s":
+            pending[number] = [data]
+        elif kind == "m":
+            pending[number].append(data)
+        elif kind == "e":
+            original, rebuilt = pending.pop(number)
+            if rebuilt.count(_SENTINEL_T) != 1:
+                raise FragmentUnsupported("Could not locate the rebuilt run of a placeholder paragraph")
+            prefix, suffix = rebuilt.split(_SENTINEL_T)
+            slots[number] = Slot(slots_texts[number], original, prefix, suffix)
+            items.append(number)
+            add_static(data)
+        elif kind == "r":
+            stack.append((number, items))
+            items = []
+            add_static(data)
+        else:
+            row_number, parent = stack.pop()
+            parent.append(Row(row_number, items))
+            items = parent
+            add_static(data)
+    return items
+
+
+def _finish(items):
+    """Deflate long static segments once"""
+    finished = []
+    for item in items:
+        if isinstance(item, bytes) and len(item) >= PRECOMPRESS_MIN:
+            finished.append(Static(item, _deflate(item), zlib.crc32(item)))
+        elif isinstance(item, Row):
+            finished.append(Row(item.number, _finish(item.items)))
+        else:
+            finished.append(item)
+    return finished
+
+
+class CompiledTemplate:
+    """A template as byte fragments; render() needs no python-docx"""
+
+    def __init__(self, digest, parts, slots, rows, source=None):
+        self.digest = digest
+        self.parts = parts
+        self.slots = slots
+        self.rows = rows
+        self.source = source
+
+    def __getstate__(self):
+        # The template bytes are read from the template itself, not stored twice
+        return {"version": FORMAT_VERSION, "digest": self.digest,
+                "parts": self.parts, "slots": self.slots, "rows": self.rows}
+
+    def __setstate__(self, state):
+        if state.get("version") != FORMAT_VERSION:
+            raise FragmentUnsupported("Compiled template uses another format version")
+        self.__init__(state["digest"], state["parts"], state["slots"], state["rows"])
+
+    def _emit(self, items, texts, keep, compressor, out):
+        # out collects deflated chunks; pending plain bytes are compressed in batches
+        for item in items:
+            if isinstance(item, bytes):
+                out.pending.append(item)
+            elif isinstance(item, int):
+                text, slot = texts[item], self.slots[item]
+                if text is slot.text:
+                    out.pending.append(slot.original)
+                else:
+                    out.pending.append(slot.prefix + run_content(text) + slot.suffix)
+            elif isinstance(item, Static):
+                out.flush(compressor)
+                out.chunks.append(item.deflated)
+                out.crc = zlib.crc32(item.data, out.crc)
+                out.size += len(item.data)
+            elif keep[item.number]:
+                self._emit(item.items, texts, keep, compressor, out)
+
+    def render(self, placeholders, stage=None):
+        """The .docx bytes for one set of placeholders"""
+        stage = stage or (lambda name: nullcontext())
+        matcher = get_matcher(placeholders)
+        with stage("substitution"):
+            texts = [matcher.sub(slot.text) for slot in self.slots]
+        with stage("row_pruning"):
+            keep = [
+                "\n".join(texts[source] if isinstance(source, int) else source for source in sources).strip() != ""
+                for sources in self.rows
+            ]
+        with stage("serialization"):
+            members = {}
+            for partname, items in self.parts:
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+                out = _DeflateOutput()
+                self._emit(items, texts, keep, compressor, out)
+                out.flush(compressor)
+                out.chunks.append(compressor.flush(zlib.Z_FINISH))
+                members[partname] = Deflated(b"".join(out.chunks), out.crc, out.size)
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(io.BytesIO(self.source)) as source:
+                write_package(source, buffer, members)
+        return buffer.getvalue()
+
+
+class _DeflateOutput:
+    def __init__(self):
+        self.chunks = []
+        self.pending = []
+        self.crc = 0
+        self.size = 0
+
+    def flush(self, compressor):
+        if not self.pending:
+            return
+        data = b"".join(self.pending)
+        self.pending.clear()
+        self.chunks.append(compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH))
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+
+
+def compile_template(template):
+    """Compile a CachedTemplate whose doc is a private copy (it is edited)"""
+    doc, index = template.doc, template.index
+    changed = changed_parts(index)
+    slot_texts, rows, parts = [], [], []
+    slot_of = {}
+    resolved = []
+    for part in iter_story_parts(doc):
+        partname = str(part.partname)
+        if partname not in changed:
+            continue
+        root = part.element
+        entry = index[partname]
+        paragraphs = [resolve_path(root, path) for path in entry["paragraphs"]]
+        for p in paragraphs:
+            slot_of[p] = len(slot_texts)
+            slot_texts.append(p.text)
+        resolved.append((part, paragraphs, [resolve_path(root, path) for path in entry["cells"]],
+                         [resolve_path(root, path) for path in entry["tables"]]))
+
+    for part, paragraphs, cells, tables in resolved:
+        for p in paragraphs:
+            if any(ancestor in slot_of for ancestor in p.iterancestors()):
+                raise FragmentUnsupported("A placeholder paragraph sits inside another one")
+        for tc in cells:
+            _set_center(tc)
+
+        # Decide every row on the untouched table, like empty_rows does
+        pruned = []
+        for tbl in tables:
+            for tr in tbl.tr_lst:
+                sources = _row_condition(tr, slot_of)
+                if sources == ():
+                    pruned.append((tbl, tr))
+                elif sources is not None:
+                    tr.addprevious(_marker("r", len(rows)))
+                    tr.addnext(_marker("q", len(rows)))
+                    rows.append(sources)
+
+        for p in paragraphs:
+            number = slot_of[p]
+            rebuilt = copy.deepcopy(p)
+            rebuilt.tail = None
+            rebuild_paragraph(Paragraph(rebuilt, part), _SENTINEL)
+            end = _marker("e", number)
+            end.tail, p.tail = p.tail, None
+            p.addprevious(_marker("s", number))
+            p.addnext(end)
+            p.addnext(rebuilt)
+            p.addnext(_marker("m", number))
+
+        for tbl, tr in pruned:
+            tbl.remove(tr)
+
+    slots = [None] * len(slot_texts)
+    for part, *_ in resolved:
+        xml = etree.tostring(part.element, encoding="UTF-8", standalone=True)
+        parts.append((str(part.partname).lstrip("/"), _finish(_parse(xml, slot_texts, slots))))
+    # Slots inside statically pruned rows never reach the output but still feed row texts
+    slots = [slot or Slot(text, b"", b"", b"") for slot, text in zip(slots, slot_texts)]
+    return CompiledTemplate(template.digest, parts, slots, rows, template.source)
+
+
+def default_store_dir():
+    """Where compiled templates are kept unless FRAGMENT_DIR says otherwise"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "proposal-generator", "fragments")
+
+
+class FragmentStore:
+    """Compiled templates in memory, persisted in a cache directory"""
+
+    def __init__(self, cache=TEMPLATE_CACHE, maxsize=32, store_dir=None):
+        self.cache = cache
+        self.maxsize = maxsize
+        self.store_dir = store_dir or default_store_dir()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key = None
+
+    def artifact_path(self, template_path):
+        # Templates of the same name in different folders get files of their own
+        path_hash = hashlib.sha1(os.path.abspath(template_path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.store_dir, f"{os.path.basename(template_path)}-{path_hash}{ARTIFACT_SUFFIX}")
+
+    def _signing_key(self):
+        """The store's HMAC key, created on first use; a per-process one when the directory is unwritable"""
+        if self._key is not None:
+            return self._key
+        key_path = os.path.join(self.store_dir, _KEY_NAME)
+        try:
+            os.makedirs(self.store_dir, mode=0o700, exist_ok=True)
+            try:
+                fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                with open(key_path, "rb") as f:
+                    key = f.read()
+            else:
+                key = os.urandom(32)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(key)
+        except OSError:
+            key = b""
+        # An unreadable or half-written key file must not become a guessable key
+        self._key = key if len(key) == 32 else os.urandom(32)
+        return self._key
+
+    def _mac(self, digest, payload):
+        return hmac.new(self._signing_key(), digest.encode("ascii") + payload, hashlib.sha256).digest()
+
+    def _read(self, artifact_path, digest):
+        try:
+            with open(artifact_path, "rb") as f:
+                header = f.read(len(_ARTIFACT_MAGIC) + _DIGEST_SIZE + _MAC_SIZE)
+                if header[:len(_ARTIFACT_MAGIC)] != _ARTIFACT_MAGIC or \
+                        header[len(_ARTIFACT_MAGIC):-_MAC_SIZE] != digest.encode("ascii"):
+                    return None
+                payload = f.read()
+        except OSError:
+            return None
+        # Nothing is unpickled unless this store wrote it for this very template
+        if not hmac.compare_digest(header[-_MAC_SIZE:], self._mac(digest, payload)):
+            return None
+        try:
+            compiled = pickle.loads(payload)
+        except (EOFError, pickle.UnpicklingError, FragmentUnsupported, AttributeError, TypeError):
+            return None
+        return compiled if isinstance(compiled, CompiledTemplate) and compiled.digest == digest else None
+
+    def _write(self, artifact_path, compiled):
+        payload = pickle.dumps(compiled, protocol=pickle.HIGHEST_PROTOCOL)
+        header = _ARTIFACT_MAGIC + compiled.digest.encode("ascii") + self._mac(compiled.digest, payload)
+        temp_path = None
+        try:
+            os.makedirs(self.store_dir, mode=0o700, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(payload)
+            os.replace(temp_path, artifact_path)
+        except OSError:
+            # An unwritable cache directory still leaves the in-memory copy
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def is_compiled(self, template_path):
+        """Whether the template's current version has been compiled, in memory or in the store.
+
+        Only the artifact's header is read, so nothing is compiled or
+        unpickled. False for templates that cannot be compiled.
+        """
+        digest = self.cache.digest(template_path)
+        with self._lock:
+            entry = self._entries.get((os.path.abspath(template_path), digest), False)
+        if entry is not False:
+            return entry is not None
+        try:
+            with open(self.artifact_path(template_path), "rb") as f:
+                header = f.read(len(_ARTIFACT_MAGIC) + _DIGEST_SIZE)
+        except OSError:
+            return False
+        return header == _ARTIFACT_MAGIC + digest.encode("ascii")
+
+    def get(self, template_path):
+        """The CompiledTemplate for a template, or None when it cannot be compiled"""
+        digest = self.cache.digest(template_path)
+        key = (os.path.abspath(template_path), digest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        artifact_path = self.artifact_path(template_path)
+        compiled = self._read(artifact_path, digest)
+        if compiled is not None:
+            with open(template_path, "rb") as f:
+                compiled.source = f.read()
+        else:
+            try:
+                compiled = compile_template(self.cache.get(template_path))
+            except FragmentUnsupported:
+                compiled = None
+            else:
+                self._write(artifact_path, compiled)
+
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale]
+            self._entries[key] = compiled
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+FRAGMENT_STORE = FragmentStore(store_dir=os.environ.get("FRAGMENT_DIR") or None)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        compiled = FRAGMENT_STORE.get(path)
+        status = "python-docx fallback" if compiled is None else (
+            f"{len(compiled.slots)} slots, {len(compiled.rows)} rows -> {FRAGMENT_STORE.artifact_path(path)}"
+        )
+        print(f"{path}: {status}")
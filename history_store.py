@@ -0,0 +1,295 @@
+"""SQLite history of generated proposals, searchable and re-downloadable.
+
+Every generation records the proposal type, client, resolved placeholders,
+the template's sha256 and the output's sha256. A past proposal is rendered
+again from the stored placeholders, which is served by the render cache
+when the render is still there. That is refused once the template has
+changed, since the document would no longer be the one that was sent.
+With HISTORY_KEEP_OUTPUTS=1 the output bytes are stored too, once per
+hash, and a past proposal is downloaded from them.
+
+The oldest generations beyond HISTORY_MAX_ROWS and the least recently
+generated outputs beyond HISTORY_MAX_OUTPUT_MB are deleted as new ones are
+written, so the file stays bounded.
+
+record() only puts the entry on a queue. A writer thread hashes the
+output and inserts queued entries in batches, one transaction each, so
+generating never waits on the database. The render modules are imported
+only when they are needed, so listing the history stays cheap at startup.
+
+Environment settings:
+    PROPOSAL_HISTORY_DB      database path (default history.db under
+                             $XDG_DATA_HOME/proposal-generator, i.e.
+                             ~/.local/share; empty disables the history)
+    HISTORY_KEEP_OUTPUTS     1 to store document bytes as well as hashes
+                             (default 0)
+    HISTORY_MAX_ROWS         generations kept (default 50000, 0 unbounded)
+    HISTORY_MAX_OUTPUT_MB    stored document bytes kept (default 256,
+                             0 unbounded)
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime
+
+logger = logging.getLogger("proposal.history")
+
+HistoryEntry = namedtuple("HistoryEntry", [
+    "id", "created_at", "proposal", "client_name", "client_email", "proposal_date", "output_format",
+    "file_name", "template", "template_hash", "output_hash", "size",
+])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    proposal TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    client_email TEXT NOT NULL,
+    proposal_date TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    template TEXT NOT NULL,
+    template_hash TEXT NOT NULL,
+    output_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    placeholders TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    email_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_name ON generations (name_key, id);
+CREATE INDEX IF NOT EXISTS generations_email ON generations (email_key, id);
+CREATE INDEX IF NOT EXISTS generations_date ON generations (proposal_date, id);
+CREATE INDEX IF NOT EXISTS generations_proposal ON generations (proposal, id);
+CREATE INDEX IF NOT EXISTS generations_output ON generations (output_hash, id);
+CREATE TABLE IF NOT EXISTS outputs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = ", ".join(HistoryEntry._fields)
+_STOP = object()
+
+
+class TemplateChanged(RuntimeError):
+    """A past proposal's bytes were not stored and its template has changed since"""
+
+
+def default_path():
+    """The database path used when PROPOSAL_HISTORY_DB is not set"""
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "proposal-generator", "history.db")
+
+
+def _prefix_range(text):
+    """Bounds that select keys starting with text through an index"""
+    return text, text + "\U0010ffff"
+
+
+class HistoryStore:
+    """Generation history in one SQLite file, written by a background thread"""
+
+    def __init__(self, path, keep_outputs=False, batch_size=64, max_rows=None, max_output_bytes=None):
+        self.path = path
+        self.keep_outputs = keep_outputs
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_output_bytes = max_output_bytes
+        self._queue = queue.Queue()
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _read(self, sql, params=()):
+        """Every row of one query, on a connection closed right after it"""
+        # Streamlit runs sessions on threads that come and go, so readers keep
+        # no connection open; the file is already in WAL mode
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def record(self, proposal, client, placeholders, output_format, file_name, template_path, data):
+        """Queue one generation; returns at once"""
+        from template_cache import TEMPLATE_CACHE
+
+        proposal_date = client.get("date")
+        self._queue.put((
+            datetime.now().isoformat(timespec="seconds"), proposal,
+            client.get("name") or "", client.get("email") or "",
+            proposal_date.isoformat() if hasattr(proposal_date, "isoformat") else str(proposal_date or ""),
+            output_format.lower(), file_name, os.path.basename(template_path),
+            TEMPLATE_CACHE.digest(template_path), placeholders, data,
+        ))
+
+    def _insert(self, conn, batch):
+        rows, outputs = [], []
+        for created_at, proposal, name, email, proposal_date, output_format, file_name, template, \
+                template_hash, placeholders, data in batch:
+            output_hash = hashlib.sha256(data).hexdigest()
+            rows.append((
+                created_at, proposal, name, email, proposal_date, output_format, file_name, template,
+                template_hash, output_hash, len(data), json.dumps(placeholders, ensure_ascii=False, default=str),
+                name.strip().lower(), email.strip().lower(),
+            ))
+            if self.keep_outputs:
+                outputs.append((output_hash, data))
+        with conn:
+            conn.executemany(
+                "INSERT INTO generations (created_at, proposal, client_name, client_email, proposal_date, "
+                "output_format, file_name, template, template_hash, output_hash, size, placeholders, "
+                "name_key, email_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany("INSERT OR IGNORE INTO outputs (hash, data) VALUES (?, ?)", outputs)
+            self._prune(conn)
+
+    def _prune(self, conn):
+        """Delete generations beyond max_rows, then outputs beyond max_output_bytes, oldest first"""
+        if self.max_rows:
+            conn.execute(
+                "DELETE FROM generations WHERE id <= (SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_rows,),
+            )
+        if not self.keep_outputs:
+            return
+        # Most recently generated first; NULL (no generation left) sorts last
+        rows = conn.execute(
+            "SELECT hash, length(data), (SELECT MAX(id) FROM generations WHERE output_hash = outputs.hash) AS last_id "
+            "FROM outputs ORDER BY last_id DESC"
+        ).fetchall()
+        kept, stale = 0, []
+        for output_hash, size, last_id in rows:
+            if last_id is not None:
+                kept += size
+            if last_id is None or (self.max_output_bytes and kept > self.max_output_bytes):
+                stale.append((output_hash,))
+        conn.executemany("DELETE FROM outputs WHERE hash = ?", stale)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [entry for entry in batch if entry is not _STOP]
+            try:
+                if entries:
+                    self._insert(conn, entries)
+            except sqlite3.Error:
+                logger.exception("Could not record %d proposal generations", len(entries))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(entries) < len(batch):
+                conn.close()
+                return
+
+    def flush(self):
+        """Wait until every queued generation is written"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def search(self, text="", proposal=None, date_from=None, date_to=None, page=0, page_size=20):
+        """(entries, total) for one page of matches, newest first.
+
+        text matches the start of the client name or email, case-insensitively;
+        dates bound the proposal date, inclusive.
+        """
+        clauses, params = [], []
+        text = text.strip().lower()
+        if text:
+            low, high = _prefix_range(text)
+            clauses.append("((name_key >= ? AND name_key < ?) OR (email_key >= ? AND email_key < ?))")
+            params += [low, high, low, high]
+        if proposal:
+            clauses.append("proposal = ?")
+            params.append(proposal)
+        if date_from:
+            clauses.append("proposal_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            clauses.append("proposal_date <= ?")
+            params.append(date_to.isoformat())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM generations{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM generations{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [page_size, page * page_size],
+            ).fetchall()
+        return [HistoryEntry(*row) for row in rows], total
+
+    def proposal_counts(self):
+        """{proposal: generations recorded}, from the proposal index"""
+        return dict(self._read("SELECT proposal, COUNT(*) FROM generations GROUP BY proposal"))
+
+    def placeholders(self, entry_id):
+        rows = self._read("SELECT placeholders FROM generations WHERE id = ?", (entry_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def output(self, output_hash):
+        """Stored document bytes for an output hash, or None"""
+        rows = self._read("SELECT data FROM outputs WHERE hash = ?", (output_hash,))
+        return rows[0][0] if rows else None
+
+    def download(self, entry, templates_dir="."):
+        """The entry's document: stored bytes, else rendered again (render cache first).
+
+        Raises TemplateChanged rather than render from a template other than
+        the one the entry was generated from.
+        """
+        data = self.output(entry.output_hash)
+        if data is not None:
+            return data
+        from renderer import render_document, render_pdf
+        from template_cache import TEMPLATE_CACHE
+
+        template_path = os.path.join(templates_dir, entry.template)
+        if TEMPLATE_CACHE.digest(template_path) != entry.template_hash:
+            raise TemplateChanged(f"{entry.template} has changed since {entry.file_name} was generated")
+        render = render_pdf if entry.output_format == "pdf" else render_document
+        return render(template_path, self.placeholders(entry.id))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Process-wide history store, or None when PROPOSAL_HISTORY_DB is empty"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = os.environ.get("PROPOSAL_HISTORY_DB", default_path())
+            if not path:
+                return None
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            _store = HistoryStore(
+                path,
+                keep_outputs=os.environ.get("HISTORY_KEEP_OUTPUTS", "0") == "1",
+                max_rows=int(os.environ.get("HISTORY_MAX_ROWS", 50000)),
+                max_output_bytes=int(float(os.environ.get("HISTORY_MAX_OUTPUT_MB", 256)) * 1024 * 1024),
+            )
+            logger.info("Recording proposal history in %s", path)
+        return _store
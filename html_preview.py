@@ -0,0 +1,226 @@
+"""HTML preview of a proposal, filled from a skeleton extracted once per template.
+
+The skeleton is built from the parsed template the first time it is
+previewed: body paragraphs and tables become static HTML around the same
+slots fragments.py uses. Paragraphs holding a placeholder are filled per
+preview and formatted like the single run replace_in_paragraph would build.
+Pricing rows are shown only while their second cell is not blank, as
+remove_empty_rows decides. A preview only substitutes the slot texts and
+joins strings, so it takes a few milliseconds even for long templates.
+
+Headers, footers, text boxes and images are not previewed; images show as
+a marker.
+"""
+import html
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from docx.oxml.ns import qn
+from docx.text.run import Run
+
+from docx_render import W_BLOCK_WRAPPERS, W_BODY, W_P, W_TBL
+from fragments import Row, _row_condition
+from substitution import PLACEHOLDER_MARKER, get_matcher
+from template_cache import TEMPLATE_CACHE
+
+_W_R = qn("w:r")
+_W_HYPERLINK = qn("w:hyperlink")
+_W_DRAWING = qn("w:drawing")
+_W_PICT = qn("w:pict")
+_W_JC = qn("w:jc")
+_W_VAL = qn("w:val")
+_W_NUM_PR = qn("w:numPr")
+_HEADING = re.compile(r"Heading(\d)$")
+_ALIGN = {"center": "center", "right": "right", "end": "right", "both": "justify"}
+
+# Like fragments.Slot, plus the whole paragraph as shown when its text is empty
+Slot = namedtuple("Slot", ["text", "original", "prefix", "suffix", "empty"])
+
+PREVIEW_CSS = (
+    "<style>.proposal-preview{font-family:Calibri,Arial,sans-serif;font-size:14px}"
+    ".proposal-preview table{border-collapse:collapse;margin:8px 0}"
+    ".proposal-preview td{border:1px solid #ccc;padding:2px 6px;vertical-align:middle}"
+    ".proposal-preview .image{color:#888}</style>"
+)
+
+
+def _text_html(text):
+    return html.escape(text, quote=False).replace("\t", "&emsp;").replace("\r", "<br>").replace("\n", "<br>")
+
+
+def _formatted(run, content):
+    """content wrapped in the run's bold, italic and color"""
+    if run is None:
+        return content
+    color = run.font.color.rgb
+    if color is not None:
+        content = f'<span style="color:#{color}">{content}</span>'
+    if run.italic:
+        content = f"<i>{content}</i>"
+    if run.bold:
+        content = f"<b>{content}</b>"
+    return content
+
+
+def _paragraph_tags(p):
+    pPr = p.pPr
+    style = pPr.pStyle.val if pPr is not None and pPr.pStyle is not None else ""
+    heading = _HEADING.match(style)
+    tag = "h1" if style == "Title" else f"h{heading.group(1)}" if heading else "p"
+    jc = pPr.find(_W_JC) if pPr is not None else None
+    align = _ALIGN.get(jc.get(_W_VAL)) if jc is not None else None
+    opening = f'<{tag} style="text-align:{align}">' if align else f"<{tag}>"
+    if pPr is not None and pPr.find(_W_NUM_PR) is not None:
+        opening += "&bull; "
+    return opening, f"</{tag}>"
+
+
+def _runs_html(p):
+    out = []
+    for child in p:
+        runs = [child] if child.tag == _W_R else child.iterchildren(_W_R) if child.tag == _W_HYPERLINK else ()
+        for r in runs:
+            if r.find(_W_DRAWING) is not None or r.find(_W_PICT) is not None:
+                out.append('<span class="image">[image]</span>')
+            text = r.text
+            if text:
+                out.append(_formatted(Run(r, None), _text_html(text)))
+    return "".join(out) or "<br>"
+
+
+class _Builder:
+    def __init__(self, body):
+        self.body = body
+        self.items = []
+        self.stack = []
+        self.slots = []
+        self.rows = []
+        # Numbered before anything is emitted, since row conditions refer to them
+        self.slot_of = {}
+        for p in body.iter(W_P):
+            text = p.text
+            if PLACEHOLDER_MARKER in text:
+                self.slot_of[p] = len(self.slots)
+                self.slots.append(text)
+
+    def static(self, text):
+        if self.items and isinstance(self.items[-1], str):
+            self.items[-1] += text
+        else:
+            self.items.append(text)
+
+    def blocks(self, container):
+        for child in container:
+            if child.tag == W_P:
+                self.paragraph(child)
+            elif child.tag == W_TBL:
+                self.table(child, container is self.body)
+            elif child.tag in W_BLOCK_WRAPPERS:
+                self.blocks(child)
+
+    def paragraph(self, p):
+        opening, closing = _paragraph_tags(p)
+        original = opening + _runs_html(p) + closing
+        number = self.slot_of.get(p)
+        if number is None:
+            self.static(original)
+            return
+        # The rebuilt run takes its formatting from the first run with text
+        first = next((Run(r, None) for r in p.r_lst if r.text), None)
+        prefix, suffix = _formatted(first, "\0").split("\0")
+        self.slots[number] = Slot(self.slots[number], original, opening + prefix, suffix + closing,
+                                  opening + "<br>" + closing)
+        self.items.append(number)
+
+    def table(self, tbl, top_level):
+        self.static("<table>")
+        for tr in tbl.tr_lst:
+            sources = _row_condition(tr, self.slot_of) if top_level else None
+            if sources == ():
+                continue
+            if sources:
+                self.stack.append(self.items)
+                self.items = []
+            self.static("<tr>")
+            for tc in tr.tc_lst:
+                span = tc.grid_span
+                self.static(f'<td colspan="{span}">' if span > 1 else "<td>")
+                if tc.vMerge != "continue":
+                    self.blocks(tc)
+                self.static("</td>")
+            self.static("</tr>")
+            if sources:
+                row, self.items = self.items, self.stack.pop()
+                self.items.append(Row(len(self.rows), row))
+                self.rows.append(sources)
+        self.static("</table>")
+
+
+class HtmlPreview:
+    """A template's body as HTML around placeholder slots"""
+
+    def __init__(self, doc):
+        builder = _Builder(doc.element.find(W_BODY))
+        builder.blocks(builder.body)
+        self.items = builder.items
+        # Slots outside the previewed blocks (text boxes) still feed row conditions
+        self.slots = [slot if isinstance(slot, Slot) else Slot(slot, "", "", "", "") for slot in builder.slots]
+        self.rows = builder.rows
+
+    def _emit(self, items, texts, keep, out):
+        for item in items:
+            if isinstance(item, str):
+                out.append(item)
+            elif isinstance(item, int):
+                text, slot = texts[item], self.slots[item]
+                if text is slot.text:
+                    out.append(slot.original)
+                else:
+                    out.append(slot.prefix + _text_html(text) + slot.suffix if text else slot.empty)
+            elif keep[item.number]:
+                self._emit(item.items, texts, keep, out)
+
+    def render(self, placeholders):
+        """The preview HTML for one set of placeholders"""
+        matcher = get_matcher(placeholders)
+        texts = [matcher.sub(slot.text) for slot in self.slots]
+        keep = [
+            "\n".join(texts[source] if isinstance(source, int) else source for source in sources).strip() != ""
+            for sources in self.rows
+        ]
+        out = [PREVIEW_CSS, '<div class="proposal-preview">']
+        self._emit(self.items, texts, keep, out)
+        out.append("</div>")
+        return "".join(out)
+
+
+class PreviewStore:
+    """HtmlPreview skeletons per template content, shared by every session"""
+
+    def __init__(self, cache=TEMPLATE_CACHE, maxsize=16):
+        self.cache = cache
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_path):
+        key = (os.path.abspath(template_path), self.cache.digest(template_path))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        # The shared parsed template is only read, never edited
+        preview = HtmlPreview(self.cache.warm(template_path).doc)
+        with self._lock:
+            self._entries[key] = preview
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return preview
+
+    def render(self, template_path, placeholders):
+        return self.get(template_path).render(placeholders)
+
+
+PREVIEW_STORE = PreviewStore()
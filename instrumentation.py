@@ -0,0 +1,295 @@
+"""Per-stage timing and resource accounting for proposal renders.
+
+Every render gets a RenderTrace; each stage records wall time, CPU time of
+the rendering thread and the process's resident memory at its end
+(rss_kb), its change over the stage (rss_delta_kb) and its peak during the
+stage (peak_rss_kb), where /proc is available. The peak is the kernel's
+high-water mark (VmHWM), restarted from the current RSS as each stage
+begins through /proc/self/clear_refs; where that file cannot be written
+stages have no peak_rss_kb. A stage entered twice in one render, e.g.
+template_load when the fragment engine falls back to python-docx, adds
+up. Stages measured in another process, such as a render worker, are
+merged in tagged with that process. When it finishes the trace is written
+as one JSON log line on the "proposal.metrics" logger, with peak_rss_kb,
+the highest peak of this process's stages, and process_peak_rss_kb, the
+process's high-water mark since it started, and added to the in-process
+histograms.
+
+Environment switches:
+    PROPOSAL_METRICS_PORT   serve Prometheus text metrics on this local port
+    PROPOSAL_TRACE_MEMORY   set to 1 to record per-stage and per-render peak
+                            Python allocations with tracemalloc (slower)
+"""
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("proposal.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+def _rss_kb():
+    """Current resident set size in KiB, or None without /proc"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_KB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _hwm_kb():
+    """The process's resident high-water mark (VmHWM) in KiB, or None without /proc"""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+# Peaks of the stages open in this process, keyed by a token per stage. Resetting
+# VmHWM is process-wide, so each reset first folds the mark into every open stage
+_open_peaks = {}
+_peak_lock = threading.Lock()
+_peak_reset = True
+_lifetime_peak_kb = 0
+
+
+def _open_peak():
+    """Restart VmHWM for a new stage and return its token, or None where it cannot be reset"""
+    global _peak_reset, _lifetime_peak_kb
+    if not _peak_reset:
+        return None
+    with _peak_lock:
+        hwm = _hwm_kb()
+        if hwm is not None:
+            try:
+                with open("/proc/self/clear_refs", "w") as f:
+                    # 5 resets the peak RSS only, see proc(5)
+                    f.write("5")
+            except OSError:
+                hwm = None
+        if hwm is None:
+            _peak_reset = False
+            return None
+        for token in _open_peaks:
+            _open_peaks[token] = max(_open_peaks[token], hwm)
+        _lifetime_peak_kb = max(_lifetime_peak_kb, hwm)
+        token = object()
+        _open_peaks[token] = 0
+    return token
+
+
+def _close_peak(token):
+    """Peak RSS in KiB of the stage since _open_peak returned token"""
+    with _peak_lock:
+        return max(_open_peaks.pop(token), _hwm_kb() or 0)
+
+
+def process_peak_rss_kb():
+    """The process's resident high-water mark since it started, in KiB, across the per-stage resets"""
+    # ru_maxrss is KiB on Linux and restarts with VmHWM, so the marks folded before each reset count too
+    return max(_lifetime_peak_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+class Histogram:
+    """Cumulative histogram keyed by label tuples, Prometheus style"""
+
+    def __init__(self, name, help_text, label_names, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total, count = self._series.get(labels, ((0,) * len(self.buckets), 0.0, 0))
+            counts = tuple(c + (value <= bound) for c, bound in zip(counts, self.buckets))
+            self._series[labels] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, (counts, total, count) in sorted(series.items()):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {c}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "proposal_stage_seconds", "Wall time of each proposal render stage",
+    ("proposal_type", "stage")
+)
+RENDER_SECONDS = Histogram(
+    "proposal_render_seconds", "Wall time of a whole proposal render",
+    ("proposal_type",)
+)
+HISTOGRAMS = [STAGE_SECONDS, RENDER_SECONDS]
+# Extra callables returning exposition text, e.g. cache counters owned by other modules
+COLLECTORS = []
+
+
+def register_collector(func):
+    COLLECTORS.append(func)
+    return func
+
+
+class RenderTrace:
+    """Stage measurements for one proposal render"""
+
+    def __init__(self, proposal_type, trace_memory=None):
+        self.proposal_type = proposal_type
+        self.stages = {}
+        # Set by the renderer when the output came from the render cache
+        self.cache_hit = False
+        self.trace_memory = (
+            os.environ.get("PROPOSAL_TRACE_MEMORY") == "1" if trace_memory is None else trace_memory
+        )
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._base_alloc = self._peak_alloc = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+
+    @property
+    def peak_alloc_bytes(self):
+        """Peak Python allocations above the start of the render, or None when not traced"""
+        return self._peak_alloc - self._base_alloc if self.trace_memory else None
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the enclosed block as one named stage"""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base_alloc = tracemalloc.get_traced_memory()[0]
+        rss = _rss_kb()
+        peak = _open_peak()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            record = {
+                "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+                "cpu_ms": round((time.thread_time() - cpu) * 1000, 3),
+            }
+            if rss is not None:
+                record["rss_kb"] = _rss_kb()
+                record["rss_delta_kb"] = record["rss_kb"] - rss
+            if peak is not None:
+                record["peak_rss_kb"] = _close_peak(peak)
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self._peak_alloc = max(self._peak_alloc, peak)
+                record["peak_alloc_kb"] = round((peak - base_alloc) / 1024, 1)
+            self._record(name, record)
+
+    def _record(self, name, record):
+        previous = self.stages.get(name)
+        if previous is not None:
+            # Entered again in the same render: times and deltas add up, the rest is the latest
+            for key in ("wall_ms", "cpu_ms", "rss_delta_kb"):
+                if key in previous and key in record:
+                    record[key] = round(previous[key] + record[key], 3)
+            for key in ("peak_rss_kb", "peak_alloc_kb"):
+                if key in previous and key in record:
+                    record[key] = max(previous[key], record[key])
+        self.stages[name] = record
+
+    def merge(self, stages, process):
+        """Add stages measured in another process, each tagged with process"""
+        for name, record in stages.items():
+            self._record(name, dict(record, process=process))
+
+    def finish(self, **extra):
+        """Log the trace as one JSON line and feed the histograms"""
+        total = time.perf_counter() - self._started
+        for name, record in self.stages.items():
+            STAGE_SECONDS.observe((self.proposal_type, name), record["wall_ms"] / 1000)
+        RENDER_SECONDS.observe((self.proposal_type,), total)
+        payload = {
+            "event": "proposal_render",
+            "proposal_type": self.proposal_type,
+            "total_ms": round(total * 1000, 3),
+            "stages": self.stages,
+            "process_peak_rss_kb": process_peak_rss_kb(),
+        }
+        peaks = [record["peak_rss_kb"] for record in self.stages.values()
+                 if "peak_rss_kb" in record and "process" not in record]
+        if peaks:
+            payload["peak_rss_kb"] = max(peaks)
+        if self.trace_memory:
+            payload["peak_alloc_kb"] = round(self.peak_alloc_bytes / 1024, 1)
+        payload.update(extra)
+        logger.info(json.dumps(payload))
+        return payload
+
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format"""
+    sections = [h.render() for h in HISTOGRAMS] + [collect() for collect in COLLECTORS]
+    return "\n".join(section for section in sections if section) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Serve /metrics once per process; a no-op without a configured port"""
+    global _server
+    port = port or os.environ.get("PROPOSAL_METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -0,0 +1,377 @@
+"""Background render jobs with IDs, a bounded queue and per-job timeouts.
+
+Generation no longer runs in the Streamlit script thread: the UI submits a
+job, keeps its ID in session state and polls for the result, so a slow
+render survives reruns and never blocks the session. A fixed number of
+render workers bounds concurrency (and memory); each one owns a child
+process that renders the .docx, so a job that runs past its timeout is
+killed together with its process instead of piling up. Workers prewarm
+the most-used templates (prewarm.py) as they start. A job also waits
+for its share of the render memory budget (admission.py) before it is
+handed to a worker, shown as its own "admitting" status. PDF conversion
+then goes through the shared LibreOffice pool within the same deadline.
+
+Finished jobs hold their output until the caller releases them, or until
+they are the oldest beyond JOB_HISTORY jobs or JOB_HISTORY_MB of output.
+A job submitted with handoff=True leaves its render trace open, so the
+caller can time handing the document on (the download_handoff stage)
+before the trace is logged.
+
+Configuration comes from the environment:
+    JOB_WORKERS      concurrent renders (default 2)
+    JOB_QUEUE_SIZE   jobs allowed to wait for a worker (default 8)
+    JOB_TIMEOUT      seconds per job, render plus PDF conversion (default 120)
+    JOB_HISTORY      finished jobs kept for polling, with their output (default 64)
+    JOB_HISTORY_MB   output those finished jobs may hold in total (default 64)
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from admission import RENDER_BUDGET
+from instrumentation import RenderTrace, register_collector
+from pdf_pool import PdfConversionError, PdfTimeout, get_pdf_pool
+from prewarm import prewarm, prewarm_paths
+from render_cache import RENDER_CACHE
+from renderer import lookup_render, render_document, render_engine
+from template_cache import TEMPLATE_CACHE
+
+QUEUED, ADMITTING, RUNNING = "queued", "admitting", "running"
+DONE, FAILED, TIMED_OUT = "done", "failed", "timed_out"
+ACTIVE = (QUEUED, ADMITTING, RUNNING)
+FINISHED = (DONE, FAILED, TIMED_OUT)
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+
+class JobTimeout(RuntimeError):
+    """Raised when a job runs past its deadline"""
+
+
+class Job:
+    """One submitted render and, once finished, its outcome"""
+
+    def __init__(self, proposal_type, template_path, placeholders, output_format, timeout, handoff=False):
+        self.id = uuid.uuid4().hex
+        self.proposal_type = proposal_type
+        self.template_path = template_path
+        self.placeholders = placeholders
+        self.output_format = output_format
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.cache_hit = False
+        self.handoff = handoff
+        self.trace = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def finish_trace(self):
+        """Log the render trace of a finished job, once; returns the payload or None"""
+        if self.status != DONE or self.trace is None:
+            return None
+        trace, self.trace = self.trace, None
+        return trace.finish(
+            output_format=self.output_format,
+            output_bytes=len(self.result),
+            cache_hit=self.cache_hit,
+            queue_wait_ms=round((self.started - self.submitted) * 1000, 3),
+        )
+
+
+def _render_loop(conn, templates=()):
+    """Child process: prewarm templates, then render one (template_path, placeholders) request at a time"""
+    prewarm(templates, preview=False)
+    while True:
+        try:
+            template_path, placeholders = conn.recv()
+        except EOFError:
+            return
+        trace = RenderTrace(None)
+        try:
+            # The parent owns the render cache; the child keeps its parsed templates warm
+            # The parent also owns the memory budget and admits each job before sending it
+            data = render_document(template_path, placeholders, trace=trace, render_cache=None, budget=None)
+            conn.send((True, data, trace.stages))
+        except FileNotFoundError:
+            conn.send((False, f"Template file not found: {template_path}", trace.stages))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}", trace.stages))
+
+
+class RenderWorker:
+    """A child process that renders .docx files, restarted when it hangs or dies"""
+
+    def __init__(self, context, templates=()):
+        self.context = context
+        self.templates = templates
+        self.proc = None
+        self.conn = None
+        self.starts = 0
+
+    @property
+    def restarts(self):
+        return max(self.starts - 1, 0)
+
+    def start(self):
+        self.starts += 1
+        self.conn, child_conn = self.context.Pipe()
+        self.proc = self.context.Process(target=_render_loop, args=(child_conn, self.templates), daemon=True)
+        self.proc.start()
+        child_conn.close()
+
+    def alive(self):
+        return self.proc is not None and self.proc.is_alive()
+
+    def stop(self):
+        if self.proc is None:
+            return
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+        self.proc = None
+        self.conn = None
+
+    def close(self):
+        """Let the child exit on end of input, killing it if it does not"""
+        if not self.alive():
+            return
+        self.conn.close()
+        self.proc.join(timeout=5)
+        self.stop()
+
+    def render(self, template_path, placeholders, timeout):
+        """Return (docx_bytes, stages), killing the child when timeout passes"""
+        if not self.alive():
+            self.stop()
+            self.start()
+        try:
+            self.conn.send((template_path, placeholders))
+            ready = self.conn.poll(timeout)
+            if ready:
+                ok, payload, stages = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.stop()
+            raise RuntimeError(f"Render worker crashed: {e}") from e
+        if not ready:
+            self.stop()
+            raise JobTimeout("Render timed out")
+        if not ok:
+            raise RuntimeError(payload)
+        return payload, stages
+
+
+class JobQueue:
+    """Fixed pool of render workers fed from a bounded job queue"""
+
+    def __init__(self, workers=2, max_queue=8, timeout=120, history=64, history_bytes=64 * 1024 * 1024,
+                 render_cache=RENDER_CACHE, prewarm=()):
+        self.timeout = timeout
+        self.history = history
+        self.history_bytes = history_bytes
+        self.render_cache = render_cache
+        self._pending = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # spawn, not fork: the parent runs Streamlit's threads
+        context = multiprocessing.get_context("spawn")
+        self._workers = [RenderWorker(context, tuple(prewarm)) for _ in range(workers)]
+        self._threads = []
+        for worker in self._workers:
+            thread = threading.Thread(target=self._serve, args=(worker,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, proposal_type, template_path, placeholders, output_format="DOCX", timeout=None, handoff=False):
+        """Queue a render and return its job ID.
+
+        With handoff=True the job's render trace is logged only when the
+        caller calls job.finish_trace(), after timing its own stages on
+        job.trace.
+        """
+        job = Job(proposal_type, template_path, dict(placeholders), output_format, timeout or self.timeout, handoff)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        try:
+            self._pending.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise JobQueueFull("Too many proposals are being generated, try again shortly") from None
+        return job.id
+
+    def get(self, job_id):
+        """The Job for job_id, or None once it has aged out of the history"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def release(self, job_id):
+        """Forget a finished job once its output has been handed on; returns the Job or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.done:
+                return None
+            return self._jobs.pop(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes (or timeout passes) and return it"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.done or (deadline is not None and time.monotonic() >= deadline):
+                return job
+            time.sleep(0.05)
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond history or history_bytes; active ones are never dropped
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(self._jobs) - self.history
+        held = sum(len(job.result or b"") for job in finished)
+        for job in finished:
+            if excess <= 0 and held <= self.history_bytes:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+            held -= len(job.result or b"")
+
+    def _serve(self, worker):
+        try:
+            worker.start()
+        except OSError:
+            # Retried when the first job arrives
+            worker.stop()
+        while True:
+            job = self._pending.get()
+            if job is None:
+                worker.close()
+                return
+            self._run(worker, job)
+
+    def _run(self, worker, job):
+        job.started = time.monotonic()
+        job.status = RUNNING
+        deadline = job.started + job.timeout
+        trace = job.trace = RenderTrace(job.proposal_type)
+        try:
+            job.result = self._render(worker, job, trace, deadline)
+            job.status = DONE
+        except JobTimeout as e:
+            job.error = f"{e} (job timeout {job.timeout:g}s)"
+            job.status = TIMED_OUT
+        except Exception as e:
+            # Some errors (e.g. a bare TimeoutError) carry no message
+            job.error = str(e) or type(e).__name__
+            job.status = FAILED
+        job.finished = time.monotonic()
+        if not job.handoff:
+            job.finish_trace()
+        with self._lock:
+            self._trim()
+
+    def _render(self, worker, job, trace, deadline):
+        output_format = job.output_format.lower()
+        # Keyed as render_document keys it, so the worker's MEDIA_OPTIMIZE is part of the key
+        key, data = lookup_render(job.template_path, job.placeholders, output_format, TEMPLATE_CACHE,
+                                  self.render_cache, trace)
+        if data is not None:
+            job.cache_hit = True
+            return data
+
+        with ExitStack() as admitted:
+            if RENDER_BUDGET is not None:
+                job.status = ADMITTING
+                with trace.stage("admission"):
+                    admitted.enter_context(RENDER_BUDGET.admit(
+                        job.template_path, render_engine(job.template_path),
+                        min(RENDER_BUDGET.max_wait, deadline - time.monotonic()),
+                    ))
+                job.status = RUNNING
+            data, stages = worker.render(job.template_path, job.placeholders, deadline - time.monotonic())
+        trace.merge(stages, "worker")
+        if output_format == "pdf":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise JobTimeout("No time left for PDF conversion")
+            with trace.stage("pdf_conversion"):
+                try:
+                    data = get_pdf_pool().convert(data, timeout=remaining)
+                except PdfTimeout as e:
+                    raise JobTimeout(str(e)) from e
+                except PdfConversionError as e:
+                    raise RuntimeError(f"PDF conversion failed: {e}") from e
+        if key is not None:
+            self.render_cache.put(key, data)
+        return data
+
+    def snapshot(self):
+        """Job counts by status plus the number of jobs waiting for a worker"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in ACTIVE + FINISHED}
+        for job in jobs:
+            counts[job.status] += 1
+        counts["waiting"] = self._pending.qsize()
+        counts["worker_restarts"] = sum(worker.restarts for worker in self._workers)
+        counts["held_bytes"] = sum(len(job.result or b"") for job in jobs if job.done)
+        return counts
+
+    def close(self):
+        for _ in self._threads:
+            self._pending.put(None)
+        for thread in self._threads:
+            thread.join(timeout=15)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide job queue, created on first use from the environment settings"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(
+                workers=int(os.environ.get("JOB_WORKERS", 2)),
+                max_queue=int(os.environ.get("JOB_QUEUE_SIZE", 8)),
+                timeout=float(os.environ.get("JOB_TIMEOUT", 120)),
+                history=int(os.environ.get("JOB_HISTORY", 64)),
+                history_bytes=int(float(os.environ.get("JOB_HISTORY_MB", 64)) * 1024 * 1024),
+                prewarm=prewarm_paths(),
+            )
+        return _queue
+
+
+@register_collector
+def _job_metrics():
+    if _queue is None:
+        return ""
+    stats = _queue.snapshot()
+    lines = [
+        "# HELP proposal_jobs Render jobs currently held, by status",
+        "# TYPE proposal_jobs gauge",
+    ]
+    lines += [f'proposal_jobs{{status="{status}"}} {stats[status]}' for status in ACTIVE + FINISHED]
+    lines += [
+        "# HELP proposal_job_held_bytes Output bytes held by finished jobs not yet released",
+        "# TYPE proposal_job_held_bytes gauge",
+        f"proposal_job_held_bytes {stats['held_bytes']}",
+        "# HELP proposal_job_worker_restarts_total Render worker processes restarted after a timeout or crash",
+        "# TYPE proposal_job_worker_restarts_total counter",
+        f"proposal_job_worker_restarts_total {stats['worker_restarts']}",
+    ]
+    return "\n".join(lines)
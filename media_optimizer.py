@@ -0,0 +1,335 @@
+"""Shrink the images proposals embed, once per template.
+
+A template's media plan is built the first time it is rendered with
+optimization on:
+
+    downsample   images larger than their largest displayed size (from the
+                 drawing extents) at MEDIA_DPI are resized to fit it
+    recompress   JPEGs are re-encoded at MEDIA_JPEG_QUALITY; PNGs are saved
+                 optimized, as a palette image when they use at most 256
+                 colors (lossless, typical of screenshots)
+    deduplicate  identical media stored under several names (e.g. a logo in
+                 the header and the body) are kept once and the other
+                 relationships are pointed at it
+
+An image is only replaced when the result is smaller. Re-encoded images
+keep their EXIF data and ICC color profile. Images whose EXIF orientation
+rotates or mirrors them, and CMYK JPEGs, are kept as they are. Optimized
+images are cached by the sha256 of their content, so templates sharing
+screenshots pay for each once. Plans are kept for the most recently used
+templates. Applying a plan to a render only copies members, without
+decompressing anything.
+
+Environment settings:
+    MEDIA_OPTIMIZE        1 to optimize rendered documents (default 0)
+    MEDIA_DPI             target resolution at the displayed size (default 150)
+    MEDIA_JPEG_QUALITY    JPEG quality, 1-95 (default 85)
+
+    python media_optimizer.py template.docx     # before/after report
+"""
+import hashlib
+import io
+import logging
+import os
+import posixpath
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict, namedtuple
+
+from lxml import etree
+
+from docx_writer import Deflated, write_package
+
+logger = logging.getLogger("proposal.media")
+
+MEDIA_OPTIMIZE = os.environ.get("MEDIA_OPTIMIZE", "0") == "1"
+
+EMU_PER_INCH = 914400
+_MEDIA_PREFIX = "word/media/"
+_CONTENT_TYPES = "[Content_Types].xml"
+_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+_R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+_WP_EXTENT = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}extent"
+_EMBED = f"{{{_R_NS}}}embed"
+_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG"}
+_EXIF_ORIENTATION = 0x0112
+
+# before/after are stored sizes in bytes, pixels the (width, height) kept
+MediaChange = namedtuple("MediaChange", ["name", "before", "after", "pixels", "duplicate_of"])
+
+
+class MediaPlan:
+    """Member replacements and removals that optimize one template's renders"""
+
+    def __init__(self, replacements, drop, expected, changes, seconds):
+        self.replacements = replacements
+        self.drop = drop
+        # CRCs of the members the plan rewrites, as the template stores them
+        self.expected = expected
+        self.changes = changes
+        self.seconds = seconds
+
+    @property
+    def before(self):
+        return sum(change.before for change in self.changes)
+
+    @property
+    def after(self):
+        return sum(change.after for change in self.changes)
+
+    def apply(self, data):
+        """Optimized .docx bytes, or data unchanged when it does not match the template"""
+        if not self.replacements and not self.drop:
+            return data
+        with zipfile.ZipFile(io.BytesIO(data)) as source:
+            stored = {info.filename: info.CRC for info in source.infolist()}
+            if any(stored.get(name) != crc for name, crc in self.expected.items()):
+                return data
+            out = io.BytesIO()
+            write_package(source, out, self.replacements, drop=self.drop)
+        return out.getvalue()
+
+
+def _deflated(data):
+    """Compress a member once, so applying a plan only copies bytes"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return Deflated(compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data))
+
+
+def _rels_name(partname):
+    directory, name = posixpath.split(partname)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def _resolve(partname, target):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(partname), target)).lstrip("/")
+
+
+def _displayed_sizes(source, names):
+    """Largest displayed (cx, cy) in EMU per media member; None when any use has no extent"""
+    sizes = {}
+    for partname in names:
+        if not partname.endswith(".xml") or partname.startswith(_MEDIA_PREFIX) or "/_rels/" in partname:
+            continue
+        rels_name = _rels_name(partname)
+        if rels_name not in names:
+            continue
+        rels = etree.fromstring(source.read(rels_name))
+        targets = {
+            rel.get("Id"): _resolve(partname, rel.get("Target"))
+            for rel in rels if rel.get("TargetMode") != "External"
+        }
+        media_ids = {rid for rid, target in targets.items() if target.startswith(_MEDIA_PREFIX)}
+        if not media_ids:
+            continue
+        root = etree.fromstring(source.read(partname))
+        used = set()
+        for blip in root.iter(_A_BLIP):
+            rid = blip.get(_EMBED)
+            if rid not in media_ids:
+                continue
+            used.add(rid)
+            extent = next((e for e in (a.find(_WP_EXTENT) for a in blip.iterancestors()) if e is not None), None)
+            name = targets[rid]
+            if extent is None or name in sizes and sizes[name] is None:
+                sizes[name] = None
+                continue
+            cx, cy = int(extent.get("cx")), int(extent.get("cy"))
+            previous = sizes.get(name, (0, 0))
+            sizes[name] = (max(previous[0], cx), max(previous[1], cy))
+        # Media referenced some other way (VML, charts) keep their full size
+        for rid in media_ids - used:
+            sizes[targets[rid]] = None
+    return sizes
+
+
+class MediaOptimizer:
+    """Builds media plans per template digest, with optimized images cached by content hash"""
+
+    def __init__(self, dpi=150, jpeg_quality=85, max_images=256, max_plans=32):
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.max_images = max_images
+        self.max_plans = max_plans
+        self._images = OrderedDict()
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _optimize_image(self, content, image_format, extent):
+        """Smaller bytes for one image, or None when nothing beats the original"""
+        key = (hashlib.sha256(content).hexdigest(), image_format, extent, self.dpi, self.jpeg_quality)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return self._images[key]
+
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as image:
+            image.load()
+            exif = image.getexif()
+            icc_profile = image.info.get("icc_profile")
+        # Word shows rotated or mirrored images by their orientation tag, so their
+        # pixels do not line up with the displayed extent; CMYK JPEGs would change
+        # color converted to RGB. Both are left as they are
+        if exif.get(_EXIF_ORIENTATION, 1) != 1 or (image_format == "JPEG" and image.mode == "CMYK"):
+            return self._remember(key, None)
+        pixels = image.size
+        if extent is not None:
+            limit = tuple(max(1, round(emu / EMU_PER_INCH * self.dpi)) for emu in extent)
+            if pixels[0] > limit[0] or pixels[1] > limit[1]:
+                image.thumbnail(limit, Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        metadata = {"icc_profile": icc_profile} if icc_profile else {}
+        if image_format == "JPEG":
+            if exif:
+                metadata["exif"] = exif.tobytes()
+            image = image if image.mode in ("RGB", "L") else image.convert("RGB")
+            image.save(buffer, "JPEG", quality=self.jpeg_quality, optimize=True, **metadata)
+        else:
+            colors = image.getcolors(256) if image.mode == "RGB" else None
+            if colors:
+                # A palette of exactly the colors used, so nothing is lost
+                palette = Image.new("P", (1, 1))
+                palette.putpalette([channel for _, color in colors for channel in color])
+                image = image.quantize(palette=palette, dither=Image.Dither.NONE)
+            image.save(buffer, "PNG", optimize=True, **metadata)
+        return self._remember(key, (buffer.getvalue(), image.size) if buffer.tell() < len(content) else None)
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._images[key] = result
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+        return result
+
+    def _build(self, template_source):
+        started = time.perf_counter()
+        replacements, drop, expected, changes = {}, set(), {}, []
+        with zipfile.ZipFile(io.BytesIO(template_source)) as source:
+            infos = {info.filename: info for info in source.infolist()}
+            media = sorted(name for name in infos if name.startswith(_MEDIA_PREFIX))
+            sizes = _displayed_sizes(source, infos)
+
+            canonical, by_hash = {}, {}
+            for name in media:
+                digest = hashlib.sha256(source.read(name)).hexdigest()
+                canonical[name] = by_hash.setdefault(digest, name)
+
+            for name in media:
+                original = canonical[name]
+                before = infos[name].compress_size
+                if original != name:
+                    drop.add(name)
+                    changes.append(MediaChange(name, before, 0, None, original))
+                    continue
+                copies = [other for other, first in canonical.items() if first == name]
+                extents = [sizes.get(other) for other in copies if other in sizes]
+                extent = None if not extents or None in extents else (
+                    max(e[0] for e in extents), max(e[1] for e in extents)
+                )
+                image_format = _FORMATS.get(posixpath.splitext(name)[1].lower())
+                optimized = None
+                if image_format is not None:
+                    try:
+                        optimized = self._optimize_image(source.read(name), image_format, extent)
+                    except Exception as e:
+                        logger.warning("Keeping %s as is: %s: %s", name, type(e).__name__, e)
+                if optimized is None:
+                    changes.append(MediaChange(name, before, before, None, None))
+                    continue
+                data, pixels = optimized
+                replacements[name] = _deflated(data)
+                changes.append(MediaChange(name, before, len(replacements[name].data), pixels, None))
+
+            if drop:
+                self._repoint(source, infos, canonical, drop, replacements, expected)
+        return MediaPlan(replacements, frozenset(drop), expected, changes, time.perf_counter() - started)
+
+    @staticmethod
+    def _repoint(source, infos, canonical, drop, replacements, expected):
+        """Point relationships at the kept copy and forget the dropped members' content types"""
+        for rels_name in (name for name in infos if name.endswith(".rels")):
+            root = etree.fromstring(source.read(rels_name))
+            partname = posixpath.join(posixpath.dirname(posixpath.dirname(rels_name)),
+                                      posixpath.basename(rels_name)[:-len(".rels")])
+            changed = False
+            for rel in root.iter(f"{{{_RELS_NS}}}Relationship"):
+                if rel.get("TargetMode") == "External":
+                    continue
+                target = _resolve(partname, rel.get("Target"))
+                if target in drop:
+                    kept = canonical[target]
+                    rel.set("Target", posixpath.relpath(kept, posixpath.dirname(partname) or "."))
+                    changed = True
+            if changed:
+                replacements[rels_name] = _deflated(etree.tostring(root, encoding="UTF-8", standalone=True))
+                expected[rels_name] = infos[rels_name].CRC
+
+        types = etree.fromstring(source.read(_CONTENT_TYPES))
+        overrides = [o for o in types.iter(f"{{{_TYPES_NS}}}Override") if o.get("PartName").lstrip("/") in drop]
+        for override in overrides:
+            types.remove(override)
+        if overrides:
+            replacements[_CONTENT_TYPES] = _deflated(etree.tostring(types, encoding="UTF-8", standalone=True))
+            expected[_CONTENT_TYPES] = infos[_CONTENT_TYPES].CRC
+
+    def plan(self, template_path, template_digest):
+        """The MediaPlan for a template, built on first use"""
+        with self._lock:
+            plan = self._plans.get(template_digest)
+            if plan is not None:
+                self._plans.move_to_end(template_digest)
+        if plan is None:
+            with open(template_path, "rb") as f:
+                plan = self._build(f.read())
+            with self._lock:
+                self._plans[template_digest] = plan
+                # Every edit of a template is a new digest; keep the most recent plans only
+                while len(self._plans) > self.max_plans:
+                    self._plans.popitem(last=False)
+            logger.info("Media plan: %d images, %d -> %d bytes, %d duplicates, %.0f ms",
+                        len(plan.changes), plan.before, plan.after, len(plan.drop), plan.seconds * 1000)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._plans.clear()
+
+
+MEDIA_OPTIMIZER = MediaOptimizer(
+    dpi=int(os.environ.get("MEDIA_DPI", 150)),
+    jpeg_quality=int(os.environ.get("MEDIA_JPEG_QUALITY", 85)),
+)
+
+
+def report(template_path, optimizer=MEDIA_OPTIMIZER):
+    """Print a before/after table for a template's media"""
+    with open(template_path, "rb") as f:
+        source = f.read()
+    plan = optimizer.plan(template_path, hashlib.sha256(source).hexdigest())
+    started = time.perf_counter()
+    optimized = plan.apply(source)
+    applied = time.perf_counter() - started
+
+    print(f"{'member':<32} {'before KB':>10} {'after KB':>9}  pixels")
+    for change in plan.changes:
+        note = f"same as {change.duplicate_of}" if change.duplicate_of else (
+            "x".join(map(str, change.pixels)) if change.pixels else "kept"
+        )
+        print(f"{change.name:<32} {change.before / 1024:>10.1f} {change.after / 1024:>9.1f}  {note}")
+    print(f"media {plan.before / 1024:.1f} KB -> {plan.after / 1024:.1f} KB; "
+          f"document {len(source) / 1024:.1f} KB -> {len(optimized) / 1024:.1f} KB; "
+          f"plan {plan.seconds * 1000:.0f} ms, apply {applied * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        report(path)
@@ -0,0 +1,254 @@
+"""Pool of warm LibreOffice workers for DOCX to PDF conversion.
+
+Every worker is a pdf_worker.py process that owns one headless soffice,
+so conversions only pay for the conversion itself. Jobs go through a
+bounded queue; a job that runs past its timeout, or a worker that dies,
+gets the worker killed and restarted before it takes the next job. Both a
+conversion past its timeout and a job that waited too long for a worker
+raise PdfTimeout; a job whose caller gave up waiting is never converted.
+
+Configuration comes from the environment:
+    PDF_WORKERS        number of soffice workers (default 2)
+    PDF_QUEUE_SIZE     jobs allowed to wait for a worker (default 16)
+    PDF_TIMEOUT        seconds per conversion (default 60)
+    SOFFICE_PATH       soffice binary (default: soffice on PATH)
+    PDF_WORKER_PYTHON  Python able to import uno (default /usr/bin/python3)
+"""
+import itertools
+import json
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_worker.py")
+PDF_MIME = "application/pdf"
+
+
+class PdfConversionError(RuntimeError):
+    """Raised when a document could not be converted to PDF"""
+
+
+class PdfPoolBusy(PdfConversionError):
+    """Raised when the conversion queue is full"""
+
+
+class PdfTimeout(PdfConversionError):
+    """Raised when a conversion, or the wait for a worker, runs past its timeout"""
+
+
+def find_soffice():
+    """Locate the LibreOffice binary, or return None when it is not installed"""
+    return os.environ.get("SOFFICE_PATH") or shutil.which("soffice") or shutil.which("libreoffice")
+
+
+class PdfWorker:
+    """One pdf_worker.py process and the soffice instance it keeps warm"""
+
+    def __init__(self, soffice, python, scratch_dir, startup_timeout=60):
+        self.soffice = soffice
+        self.python = python
+        self.scratch_dir = scratch_dir
+        self.startup_timeout = startup_timeout
+        self.proc = None
+        self._lines = None
+        self._ids = itertools.count(1)
+        self.starts = 0
+
+    @property
+    def restarts(self):
+        return max(self.starts - 1, 0)
+
+    def start(self):
+        self.starts += 1
+        name = uuid.uuid4().hex
+        profile = os.path.join(self.scratch_dir, f"profile-{name}")
+        # New session so a timeout can kill the worker and its soffice together
+        self.proc = subprocess.Popen(
+            [self.python, WORKER_SCRIPT, "--soffice", self.soffice, "--profile", profile,
+             "--pipe", f"proposal-pdf-{name}", "--startup-timeout", str(self.startup_timeout)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, start_new_session=True,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self.proc, self._lines), daemon=True).start()
+        message = self._next_message(self.startup_timeout)
+        if not message.get("ready"):
+            raise PdfConversionError(f"PDF worker failed to start: {message}")
+
+    @staticmethod
+    def _read_lines(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def _next_message(self, timeout):
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise PdfTimeout(f"PDF conversion timed out after {timeout:g}s")
+        if line is None:
+            self.stop()
+            raise PdfConversionError("PDF worker exited unexpectedly")
+        return json.loads(line)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.proc.wait()
+        self.proc = None
+
+    def close(self):
+        """Ask the worker to shut soffice down cleanly, killing it if it hangs"""
+        if not self.alive():
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.stop()
+
+    def convert(self, docx_bytes, timeout):
+        if not self.alive():
+            self.stop()
+            self.start()
+        job_id = next(self._ids)
+        input_path = os.path.join(self.scratch_dir, f"{uuid.uuid4().hex}.docx")
+        output_path = input_path[:-5] + ".pdf"
+        try:
+            with open(input_path, "wb") as f:
+                f.write(docx_bytes)
+            self.proc.stdin.write(json.dumps({"id": job_id, "input": input_path, "output": output_path}) + "\n")
+            self.proc.stdin.flush()
+            message = self._next_message(timeout)
+            if not message.get("ok"):
+                raise PdfConversionError(message.get("error", "PDF conversion failed"))
+            with open(output_path, "rb") as f:
+                return f.read()
+        except (BrokenPipeError, OSError) as e:
+            self.stop()
+            raise PdfConversionError(f"PDF worker crashed: {e}") from e
+        finally:
+            for path in (input_path, output_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class PdfConverterPool:
+    """Fixed set of warm workers fed from a bounded job queue"""
+
+    def __init__(self, size=2, max_queue=16, timeout=60, soffice=None, python=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise PdfConversionError("LibreOffice (soffice) is not installed")
+        self.python = python or os.environ.get("PDF_WORKER_PYTHON", "/usr/bin/python3")
+        self.timeout = timeout
+        # Prefer RAM-backed scratch space; LibreOffice only reads and writes files
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        self.scratch_dir = tempfile.mkdtemp(prefix="proposal-pdf-", dir=base)
+        self._jobs = queue.Queue(maxsize=max_queue)
+        self._workers = [PdfWorker(self.soffice, self.python, self.scratch_dir) for _ in range(size)]
+        self._threads = []
+        for worker in self._workers:
+            thread = threading.Thread(target=self._serve, args=(worker,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _serve(self, worker):
+        try:
+            worker.start()
+        except (PdfConversionError, OSError):
+            # Retried when the first job arrives
+            worker.stop()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                worker.close()
+                return
+            docx_bytes, timeout, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(worker.convert(docx_bytes, timeout))
+            except Exception as e:
+                future.set_exception(e)
+
+    def submit(self, docx_bytes, timeout=None):
+        """Queue a conversion and return a Future for the PDF bytes"""
+        future = Future()
+        try:
+            self._jobs.put_nowait((docx_bytes, timeout or self.timeout, future))
+        except queue.Full:
+            raise PdfPoolBusy("Too many PDF conversions queued, try again shortly") from None
+        return future
+
+    def convert(self, docx_bytes, timeout=None):
+        """Convert .docx bytes to PDF bytes, blocking until done"""
+        timeout = timeout or self.timeout
+        future = self.submit(docx_bytes, timeout)
+        # Queue wait is bounded too, so a stuck pool cannot hang the caller forever
+        try:
+            return future.result(timeout=timeout * (len(self._workers) + 2))
+        except FutureTimeout:
+            # Still queued: no worker picks it up once the caller has given up
+            future.cancel()
+            raise PdfTimeout("No PDF worker was free in time, try again shortly") from None
+
+    @property
+    def restarts(self):
+        return sum(worker.restarts for worker in self._workers)
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout=15)
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """Process-wide pool, created on first use from the environment settings"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfConverterPool(
+                size=int(os.environ.get("PDF_WORKERS", 2)),
+                max_queue=int(os.environ.get("PDF_QUEUE_SIZE", 16)),
+                timeout=float(os.environ.get("PDF_TIMEOUT", 60)),
+            )
+        return _pool
+
+
+def pdf_filename(doc_filename):
+    return os.path.splitext(doc_filename)[0] + ".pdf"
+
+
+if __name__ == "__main__":
+    # Quick manual check: python pdf_pool.py in.docx out.pdf
+    pool = PdfConverterPool(size=1)
+    try:
+        with open(sys.argv[1], "rb") as f:
+            pdf = pool.convert(f.read())
+        with open(sys.argv[2], "wb") as f:
+            f.write(pdf)
+    finally:
+        pool.close()
@@ -0,0 +1,112 @@
+"""Long-lived DOCX to PDF converter process, driven by pdf_pool.py.
+
+Must run under a Python that can import uno (Debian's python3-uno, usually
+/usr/bin/python3). It starts one headless soffice listening on a private
+pipe, keeps it warm, and converts one job per JSON line read from stdin:
+
+    {"id": 1, "input": "/tmp/in.docx", "output": "/tmp/out.pdf"}
+
+Each job is answered on stdout with {"id": 1, "ok": true} or
+{"id": 1, "ok": false, "error": "..."}. Closing stdin shuts it down.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def _props(**values):
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+def start_office(soffice, profile_dir, pipe_name):
+    """Launch soffice with a private profile and a UNO listener on pipe_name"""
+    return subprocess.Popen(
+        [
+            soffice,
+            f"-env:UserInstallation={uno.systemPathToFileUrl(profile_dir)}",
+            "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+            f"--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def connect(pipe_name, office, timeout):
+    """Wait for the listener to come up and return its Desktop service"""
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext")
+            return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except Exception:
+            if office.poll() is not None or time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def convert(desktop, input_path, output_path):
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(input_path), "_blank", 0, _props(Hidden=True, ReadOnly=True)
+    )
+    if doc is None:
+        raise RuntimeError(f"LibreOffice could not load {input_path}")
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(output_path), _props(FilterName="writer_pdf_Export"))
+    finally:
+        doc.close(True)
+
+
+def reply(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm LibreOffice DOCX to PDF worker")
+    parser.add_argument("--soffice", default="soffice")
+    parser.add_argument("--profile", required=True, help="private LibreOffice user profile directory")
+    parser.add_argument("--pipe", required=True, help="UNO pipe name for this worker")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    office = start_office(args.soffice, os.path.abspath(args.profile), args.pipe)
+    try:
+        desktop = connect(args.pipe, office, args.startup_timeout)
+        reply({"ready": True, "pid": office.pid})
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            try:
+                convert(desktop, job["input"], job["output"])
+                reply({"id": job["id"], "ok": True})
+            except Exception as e:
+                reply({"id": job["id"], "ok": False, "error": f"{type(e).__name__}: {e}"})
+        try:
+            desktop.terminate()
+        except Exception:
+            pass
+    finally:
+        try:
+            office.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            office.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Boot-time prewarming, so the first proposal after a cold start is a warm one.
+
+prewarm() renders each of the most-used templates once with no values and,
+in the app process, builds its preview skeleton. That parses the template,
+loads or compiles its fragments, plans its media and imports everything a
+render touches, so the first real request finds all of it in memory. The
+most-used templates are ranked by the proposal history, in manifest order
+when there is none. The app prewarms in a background thread at boot, and
+every render worker process prewarms the same templates when it starts.
+
+Environment settings:
+    PREWARM_TEMPLATES   templates prewarmed at boot, most used first
+                        (default 4, 0 disables prewarming)
+"""
+import logging
+import os
+import time
+
+from history_store import get_history_store
+from proposal_config import PROPOSAL_CONFIG
+
+logger = logging.getLogger("proposal.prewarm")
+
+
+def prewarm_paths(templates_dir=".", limit=None):
+    """Absolute paths of the templates to prewarm, most used first"""
+    limit = int(os.environ.get("PREWARM_TEMPLATES", 4)) if limit is None else limit
+    if limit <= 0:
+        return []
+    history = get_history_store()
+    counts = history.proposal_counts() if history is not None else {}
+    # sorted() is stable, so proposals never generated keep manifest order
+    ranked = sorted(PROPOSAL_CONFIG, key=lambda name: -counts.get(name, 0))
+    paths = []
+    for selected_proposal in ranked:
+        path = os.path.abspath(os.path.join(templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"]))
+        if path not in paths:
+            paths.append(path)
+    return paths[:limit]
+
+
+def prewarm(template_paths, preview=True):
+    """Render each template once (and build its preview); returns {path: seconds}"""
+    from renderer import render_document
+
+    timings = {}
+    for path in template_paths:
+        started = time.perf_counter()
+        try:
+            render_document(path, {}, render_cache=None, budget=None)
+            if preview:
+                from html_preview import PREVIEW_STORE
+
+                PREVIEW_STORE.get(path)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.exception("Could not prewarm %s", path)
+            continue
+        timings[path] = time.perf_counter() - started
+    if timings:
+        logger.info("Prewarmed %d templates in %.0f ms", len(timings), sum(timings.values()) * 1000)
+    return timings
+
@@ -0,0 +1,104 @@
+"""Config-driven pricing engine.
+
+Services are priced from each proposal's pricing_fields and PRICING_RULES,
+one quote at a time or as a whole batch of scenarios in one NumPy call,
+which is what the what-if grids use.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+from proposal_config import PRICING_RULES, PROPOSAL_CONFIG
+
+
+def pricing_keys(selected_proposal):
+    """Price keys of a proposal, in the column order the engine uses"""
+    return [key for _, key in PROPOSAL_CONFIG[selected_proposal]["pricing_fields"]]
+
+
+def _line_item_matrix(keys, line_items):
+    if isinstance(line_items, Mapping):
+        if not keys:
+            # A proposal without prices is one scenario of nothing
+            return np.zeros((1, 0), dtype=np.int64)
+        columns = np.broadcast_arrays(*[np.asarray(line_items.get(key, 0), dtype=np.int64) for key in keys])
+        return np.atleast_2d(np.column_stack(columns) if columns[0].ndim else np.array(columns)[None, :])
+    matrix = np.atleast_2d(np.asarray(line_items, dtype=np.int64))
+    if matrix.shape[1] != len(keys):
+        raise ValueError(f"Expected {len(keys)} price columns ({', '.join(keys)}), got {matrix.shape[1]}")
+    return matrix
+
+
+def _per_currency(values, currencies, rows):
+    """Vectorized lookup of a per-currency rule value"""
+    currencies = np.broadcast_to(np.asarray(currencies), (rows,))
+    unique, inverse = np.unique(currencies, return_inverse=True)
+    return np.array([values.get(c, 0) for c in unique])[inverse], currencies
+
+
+def price_scenarios(selected_proposal, line_items, discounts=0.0, currencies="USD"):
+    """Price many scenarios of one proposal in a single batched call.
+
+    line_items is an (n, k) array in pricing_keys order or a mapping of
+    price key to scalar/array; discounts (fractions off the services sum)
+    and currencies may be scalars or length-n sequences. Returns a dict of
+    length-n arrays: services, discount, maintenance, total, addon, currency.
+    """
+    matrix = _line_item_matrix(pricing_keys(selected_proposal), line_items)
+    rows = matrix.shape[0]
+
+    services = matrix.sum(axis=1)
+    discount = np.floor(services * np.broadcast_to(np.asarray(discounts, dtype=float), (rows,))).astype(np.int64)
+    discounted = services - discount
+    # Truncates like int() did, prices are never negative
+    maintenance = np.floor(discounted * PRICING_RULES["maintenance_rate"]).astype(np.int64)
+    addon, currencies = _per_currency(PRICING_RULES["addon_price"], currencies, rows)
+
+    return {
+        "services": services,
+        "discount": discount,
+        "maintenance": maintenance,
+        "total": discounted + maintenance,
+        "addon": addon.astype(np.int64),
+        "currency": currencies,
+    }
+
+
+def quote(selected_proposal, numerical_values, currency, discount=0.0):
+    """Price a single proposal; returns plain ints keyed like price_scenarios"""
+    result = price_scenarios(selected_proposal, numerical_values, discount, currency)
+    return {
+        name: (str(values[0]) if name == "currency" else int(values[0]))
+        for name, values in result.items()
+    }
+
+
+def scenario_grid(selected_proposal, base_prices, discounts=(0.0,), currencies=("USD",),
+                  line_item_options=None, fx_rates=None):
+    """Price the cartesian product of discounts, currencies and line item options.
+
+    base_prices holds the entered price per key; line_item_options maps a
+    key to alternative prices to try instead. fx_rates converts base prices
+    into each currency (defaults to 1.0, i.e. prices already in that
+    currency). Returns the scenario inputs and priced outputs as columns.
+    """
+    keys = pricing_keys(selected_proposal)
+    line_item_options = line_item_options or {}
+    fx_rates = fx_rates or {}
+    axes = [np.asarray(discounts, dtype=float), np.asarray(currencies)]
+    axes += [np.asarray(line_item_options.get(key, [base_prices.get(key, 0)]), dtype=np.int64) for key in keys]
+
+    grids = np.meshgrid(*[np.arange(len(axis)) for axis in axes], indexing="ij")
+    picks = [axis[grid.ravel()] for axis, grid in zip(axes, grids)]
+    discount_col, currency_col, price_cols = picks[0], picks[1], picks[2:]
+
+    fx, _ = _per_currency({c: fx_rates.get(c, 1.0) for c in currencies}, currency_col, len(currency_col))
+    if price_cols:
+        matrix = np.rint(np.column_stack(price_cols) * fx[:, None]).astype(np.int64)
+    else:
+        matrix = np.zeros((len(currency_col), 0), dtype=np.int64)
+
+    columns = {"discount_rate": discount_col}
+    columns.update({key: matrix[:, i] for i, key in enumerate(keys)})
+    columns.update(price_scenarios(selected_proposal, matrix, discount_col, currency_col))
+    return columns
@@ -0,0 +1,121 @@
+"""Proposal types, team roles and pricing rules.
+
+Proposal types live in an external manifest (proposals.json next to this
+module, or the file named by PROPOSAL_MANIFEST) so templates can be added
+without touching code. PROPOSAL_CONFIG and MATRIX_2X2_TEMPLATES are
+filled from it at import and updated in place when template_registry
+hot-reloads it, so every importer sees the current entries.
+"""
+import json
+import os
+
+MANIFEST_PATH = os.environ.get("PROPOSAL_MANIFEST") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "proposals.json"
+)
+
+TEAM_TYPES = ("general", "marketing", "none")
+# Technical proposals laid out as a 2x2 pricing matrix, without additional tools
+LAYOUTS = ("standard", "matrix_2x2")
+
+
+def _pairs(entry, field, problems, name):
+    pairs = entry.get(field, [])
+    if not isinstance(pairs, list) or not all(
+        isinstance(pair, list) and len(pair) == 2 and all(isinstance(v, str) and v for v in pair) for pair in pairs
+    ):
+        problems.append(f"{name}: {field} must be a list of string pairs")
+        return ()
+    return tuple(tuple(pair) for pair in pairs)
+
+
+def parse_manifest(data):
+    """Validate a decoded manifest and return {proposal name: config}.
+
+    Raises ValueError listing every problem found, not just the first.
+    """
+    proposals = data.get("proposals") if isinstance(data, dict) else None
+    if not isinstance(proposals, dict) or not proposals:
+        raise ValueError("Manifest must contain a non-empty \"proposals\" object")
+
+    configs, problems = {}, []
+    for name, entry in proposals.items():
+        if not isinstance(entry, dict):
+            problems.append(f"{name}: entry must be an object")
+            continue
+        template = entry.get("template")
+        if not isinstance(template, str) or not template.endswith(".docx"):
+            problems.append(f"{name}: template must be a .docx file name")
+        if entry.get("team_type") not in TEAM_TYPES:
+            problems.append(f"{name}: team_type must be one of {', '.join(TEAM_TYPES)}")
+        if entry.get("layout", "standard") not in LAYOUTS:
+            problems.append(f"{name}: layout must be one of {', '.join(LAYOUTS)}")
+        pricing_fields = _pairs(entry, "pricing_fields", problems, name)
+        keys = [key for _, key in pricing_fields]
+        if len(set(keys)) != len(keys):
+            problems.append(f"{name}: duplicate pricing keys")
+        special_fields = _pairs(entry, "special_fields", problems, name)
+        config = {
+            "template": template,
+            "pricing_fields": list(pricing_fields),
+            "team_type": entry.get("team_type"),
+            "special_fields": list(special_fields),
+        }
+        if entry.get("layout", "standard") != "standard":
+            config["layout"] = entry["layout"]
+        configs[name] = config
+    if problems:
+        raise ValueError("Invalid proposal manifest:\n  " + "\n  ".join(problems))
+    return configs
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path, encoding="utf-8") as f:
+        return parse_manifest(json.load(f))
+
+
+# Proposal configurations
+PROPOSAL_CONFIG = {}
+MATRIX_2X2_TEMPLATES = []
+
+
+def apply_manifest(configs):
+    """Swap in new proposal configs without replacing the shared objects"""
+    for name in [name for name in PROPOSAL_CONFIG if name not in configs]:
+        del PROPOSAL_CONFIG[name]
+    PROPOSAL_CONFIG.update(configs)
+    MATRIX_2X2_TEMPLATES[:] = [name for name, config in configs.items() if config.get("layout") == "matrix_2x2"]
+
+
+apply_manifest(load_manifest())
+
+MARKETING_TEAM_ROLES = {
+    "Project Manager": "PM",
+    "Content Writers": "CW",
+    "Graphic Designer": "GD",
+    "SEO Specialists": "SE",
+    "Social Media Manager": "SM",
+    "Ad Campaign Manager": "AC"
+}
+
+GENERAL_TEAM_ROLES = {
+    "Project Manager": "P1",
+    "Frontend Developers": "F1",
+    "Business Analyst": "B1",
+    "AI/ML Developers": "A1",
+    "UI/UX Members": "U1",
+    "System Architect": "S1",
+    "Backend Developers": "BD1",
+    "AWS Developer": "AD1"
+}
+
+CURRENCY_SYMBOLS = {"USD": "$", "INR": "₹"}
+
+# Rules applied on top of the service prices of every proposal
+PRICING_RULES = {
+    # Annual Maintenance, as a share of the services sum
+    "maintenance_rate": 0.10,
+    # Appended to the total amount
+    "tax_note": {"INR": " + 18% GST"},
+    # Additional Features & Enhancements, a flat price per currency
+    "addon_price": {"USD": 250, "INR": 25000},
+}
@@ -0,0 +1,128 @@
+from pricing import quote
+from proposal_config import (
+    CURRENCY_SYMBOLS, GENERAL_TEAM_ROLES, MARKETING_TEAM_ROLES, MATRIX_2X2_TEMPLATES,
+    PRICING_RULES, PROPOSAL_CONFIG
+)
+
+
+def validate_phone_number(country, phone_number):
+    """Validate phone number based on country"""
+    if country.lower() == "india":
+        if not phone_number.startswith("+91"):
+            return False
+    else:
+        if not phone_number.startswith("+1"):
+            return False
+    return True
+
+def format_number_with_commas(number):
+    """Format number with commas (e.g., 10000 -> 10,000)"""
+    return f"{number:,}"
+
+def pricing_placeholders(selected_proposal, numerical_values, currency):
+    """Build the price placeholders, including maintenance, total and add-on prices"""
+    config = PROPOSAL_CONFIG[selected_proposal]
+    currency_symbol = CURRENCY_SYMBOLS[currency]
+    pricing_data = {}
+    for label, key in config["pricing_fields"]:
+        value = numerical_values.get(key, 0)
+        # Only show fields with a value, empty ones get their row removed
+        if value > 0:
+            pricing_data[f"<<{key}>>"] = f"{currency_symbol}{format_number_with_commas(value)}"
+        else:
+            pricing_data[f"<<{key}>>"] = ""
+
+    prices = quote(selected_proposal, numerical_values, currency)
+
+    # Annual Maintenance (10% of Total Amount)
+    pricing_data["<<AM-Price>>"] = f"{currency_symbol}{format_number_with_commas(prices['maintenance'])}"
+
+    # Total Amount, with the tax note for currencies that carry one
+    tax_note = PRICING_RULES["tax_note"].get(currency, "")
+    pricing_data["<<T-Price>>"] = f"{currency_symbol}{format_number_with_commas(prices['total'])}{tax_note}"
+
+    # Additional Features & Enhancements
+    pricing_data["<<AF-Price>>"] = f"{currency_symbol}{format_number_with_commas(prices['addon'])}"
+    return pricing_data
+
+def team_placeholders(team_type, counts):
+    """Map team role codes (e.g. P1) to their count placeholders"""
+    if team_type not in ("marketing", "general"):
+        return {}
+    roles = MARKETING_TEAM_ROLES if team_type == "marketing" else GENERAL_TEAM_ROLES
+    return {f"<<{code}>>": str(counts.get(code, 0)) for code in roles.values()}
+
+def client_placeholders(client):
+    """The client block every proposal for this client shares"""
+    return {
+        "<<Client Name>>": client.get("name", ""),
+        "<<Client Email>>": client.get("email", ""),
+        "<<Client Number>>": client.get("number", ""),
+        "<<Date>>": client["date"].strftime("%d-%m-%Y"),
+        "<<Country>>": client.get("country", "")
+    }
+
+def special_placeholders(selected_proposal, special_values):
+    """Values of the proposal's special fields, dates formatted as dd-mm-yyyy"""
+    special_data = {}
+    for field, wrapper in PROPOSAL_CONFIG[selected_proposal].get("special_fields", []):
+        if wrapper == "<<":
+            value = special_values.get(field, "")
+            if hasattr(value, "strftime"):
+                value = value.strftime("%d-%m-%Y")
+            special_data[f"<<{field}>>"] = value
+    return special_data
+
+def tool_placeholders(selected_proposal, tools):
+    """The additional tools, left empty for the 2x2 matrix templates"""
+    additional_tools_data = {"<<T1>>": "", "<<T2>>": ""}
+    if selected_proposal not in MATRIX_2X2_TEMPLATES:
+        additional_tools_data["<<T1>>"] = tools[0] or ""
+        additional_tools_data["<<T2>>"] = tools[1] or ""
+    return additional_tools_data
+
+def build_placeholders(selected_proposal, client, numerical_values, currency,
+                       team_counts=None, special_values=None, tools=("", "")):
+    """Resolve every placeholder of a proposal from plain input values.
+
+    client holds name, email, number, country and date (a date object);
+    special_values maps special field names such as VDate to their values.
+    """
+    config = PROPOSAL_CONFIG[selected_proposal]
+    placeholders = client_placeholders(client)
+    placeholders.update(pricing_placeholders(selected_proposal, numerical_values, currency))
+    placeholders.update(team_placeholders(config["team_type"], team_counts or {}))
+    placeholders.update(special_placeholders(selected_proposal, special_values or {}))
+    placeholders.update(tool_placeholders(selected_proposal, tools))
+    return placeholders
+
+def bundle_placeholders(selected_proposals, client, numerical_values, currency,
+                        team_counts=None, special_values=None, tools=("", "")):
+    """build_placeholders for several proposals for one client, as {proposal: placeholders}.
+
+    The client block is resolved once and the team counts once per team
+    type; only prices, special fields and tools are resolved per proposal.
+    numerical_values holds the prices of every proposal in the bundle, so
+    a price key two proposals share gets the same value in both.
+    """
+    shared = client_placeholders(client)
+    teams = {}
+    bundle = {}
+    for selected_proposal in selected_proposals:
+        team_type = PROPOSAL_CONFIG[selected_proposal]["team_type"]
+        if team_type not in teams:
+            teams[team_type] = team_placeholders(team_type, team_counts or {})
+        placeholders = dict(shared)
+        placeholders.update(pricing_placeholders(selected_proposal, numerical_values, currency))
+        placeholders.update(teams[team_type])
+        placeholders.update(special_placeholders(selected_proposal, special_values or {}))
+        placeholders.update(tool_placeholders(selected_proposal, tools))
+        bundle[selected_proposal] = placeholders
+    return bundle
+
+def proposal_filename(selected_proposal, client_name, date):
+    """File name offered for download, matching the proposal family"""
+    formatted_date = date.strftime("%d-%m-%Y")
+    if selected_proposal == "AI Automations Proposal and LPW":
+        return f"AI Automations Proposal and LPW - {client_name} {formatted_date}.docx"
+    return f"AI Automations Proposal - {client_name} {formatted_date}.docx"
@@ -0,0 +1,225 @@
+"""Content-addressed cache of rendered proposals.
+
+A render is identified by the sha256 of the template file plus the fully
+resolved placeholders, so identical clicks and Streamlit reruns return the
+stored bytes without touching python-docx. A size-bounded LRU lives in
+memory; an optional directory adds a larger tier that survives restarts.
+Keys include RENDER_VERSION, so files a different renderer wrote to that
+directory are never served. A disk tier that cannot be written (full or
+read-only) is logged and skipped; the render is still returned.
+
+Environment settings:
+    RENDER_CACHE_MB        memory tier size (default 64, 0 disables caching)
+    RENDER_CACHE_DIR       directory for the disk tier (disabled when unset)
+    RENDER_CACHE_DISK_MB   disk tier size (default 512)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from instrumentation import register_collector
+
+logger = logging.getLogger("proposal.render_cache")
+
+# Bump whenever a renderer change alters output for the same template and placeholders
+RENDER_VERSION = 2
+
+
+def render_key(template_digest, placeholders, output_format="docx"):
+    """Stable key for a template's content plus its resolved placeholder values"""
+    canonical = json.dumps(
+        [RENDER_VERSION, template_digest, output_format, sorted((str(k), str(v)) for k, v in placeholders.items())],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Two-tier LRU of rendered document bytes keyed by render_key"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk_size = 0
+        if disk_dir:
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning("Render cache directory %s is unusable, caching in memory only: %s", disk_dir, e)
+                self.disk_dir = None
+            else:
+                self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.bin")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".bin"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return cached bytes for key, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return data
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            data = self._read_disk(path)
+            if data is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                self._put_memory(key, data)
+                return data
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _read_disk(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Could not read %s from the render cache: %s", path, e)
+            return None
+        try:
+            # mtime doubles as the disk tier's recency
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        data = bytes(data)
+        self._put_memory(key, data)
+        if self.disk_dir:
+            self._put_disk(key, data)
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def _put_disk(self, key, data):
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # A full disk or read-only directory only costs the disk tier this entry
+            logger.warning("Could not write %s to the render cache: %s", key, e)
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self._disk_size += len(data)
+            over = self._disk_size > self.disk_max_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_size = total
+
+    def snapshot(self):
+        """Counters plus current tier sizes"""
+        with self._lock:
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                memory_bytes=self._size,
+                disk_bytes=self._disk_size,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def _from_env():
+    max_mb = float(os.environ.get("RENDER_CACHE_MB", 64))
+    if max_mb <= 0:
+        return None
+    return RenderCache(
+        max_bytes=int(max_mb * 1024 * 1024),
+        disk_dir=os.environ.get("RENDER_CACHE_DIR") or None,
+        disk_max_bytes=int(float(os.environ.get("RENDER_CACHE_DISK_MB", 512)) * 1024 * 1024),
+    )
+
+
+RENDER_CACHE = _from_env()
+
+
+def _cache_metrics():
+    if RENDER_CACHE is None:
+        return ""
+    stats = RENDER_CACHE.snapshot()
+    lines = [
+        "# HELP proposal_render_cache_requests_total Render cache lookups by result",
+        "# TYPE proposal_render_cache_requests_total counter",
+        f'proposal_render_cache_requests_total{{result="memory_hit"}} {stats["memory_hits"]}',
+        f'proposal_render_cache_requests_total{{result="disk_hit"}} {stats["disk_hits"]}',
+        f'proposal_render_cache_requests_total{{result="miss"}} {stats["misses"]}',
+        "# HELP proposal_render_cache_bytes Bytes held by each render cache tier",
+        "# TYPE proposal_render_cache_bytes gauge",
+        f'proposal_render_cache_bytes{{tier="memory"}} {stats["memory_bytes"]}',
+        f'proposal_render_cache_bytes{{tier="disk"}} {stats["disk_bytes"]}',
+    ]
+    return "\n".join(lines)
+
+
+register_collector(_cache_metrics)
@@ -0,0 +1,137 @@
+import gc
+import io
+import os
+from contextlib import ExitStack, nullcontext
+
+from admission import RENDER_BUDGET
+from docx_render import replace_indexed
+from docx_stream import render_stream
+from docx_writer import changed_parts, save_docx
+from fragments import FRAGMENT_STORE
+from media_optimizer import MEDIA_OPTIMIZE, MEDIA_OPTIMIZER
+from pdf_pool import get_pdf_pool
+from render_cache import RENDER_CACHE, render_key
+from template_cache import TEMPLATE_CACHE
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Templates at least this large (in MB) are rendered by the streaming engine; 0 disables it
+STREAM_TEMPLATE_MB = float(os.environ.get("STREAM_TEMPLATE_MB", 0))
+
+
+def _stages(trace):
+    return trace.stage if trace is not None else (lambda name: nullcontext())
+
+
+def cache_format(output_format, optimize_media=None):
+    """The format a render is cached under; media-optimized output (MEDIA_OPTIMIZE) is kept apart"""
+    optimize_media = MEDIA_OPTIMIZE if optimize_media is None else optimize_media
+    return f"{output_format}+media" if optimize_media else output_format
+
+
+def lookup_render(template_path, placeholders, output_format, cache=TEMPLATE_CACHE, render_cache=RENDER_CACHE,
+                  trace=None, optimize_media=None):
+    """Look a render up in the output cache; returns (key, bytes or None) and flags a hit on trace"""
+    if render_cache is None:
+        return None, None
+    with _stages(trace)("cache_lookup"):
+        key = render_key(cache.digest(template_path), placeholders, cache_format(output_format, optimize_media))
+        data = render_cache.get(key)
+    if trace is not None:
+        trace.cache_hit = data is not None
+    return key, data
+
+
+def _streamed(template_path):
+    return STREAM_TEMPLATE_MB > 0 and os.path.getsize(template_path) >= STREAM_TEMPLATE_MB * 1024 * 1024
+
+
+def render_engine(template_path, fragments=FRAGMENT_STORE):
+    """The engine render_document is expected to use: stream, fragments or docx.
+
+    Nothing is compiled here: a template counts as fragments only once it
+    is known to compile (see FragmentStore.is_compiled), and as docx, the
+    costlier engine, until then.
+    """
+    if _streamed(template_path):
+        return "stream"
+    return "fragments" if fragments is not None and fragments.is_compiled(template_path) else "docx"
+
+
+def render_document(template_path, placeholders, cache=TEMPLATE_CACHE, trace=None, render_cache=RENDER_CACHE,
+                    fragments=FRAGMENT_STORE, optimize_media=None, budget=RENDER_BUDGET):
+    """Render a proposal entirely in memory and return the .docx bytes.
+
+    trace is an optional instrumentation.RenderTrace that times each stage;
+    its cache_hit says whether the bytes came from render_cache. Repeated
+    renders of the same template and placeholders come straight from
+    render_cache. Templates are rendered from their compiled fragments
+    (see fragments.py) unless fragments is None or the template cannot be
+    compiled, in which case python-docx edits a parsed copy. Templates of
+    STREAM_TEMPLATE_MB or more are streamed instead (see docx_stream.py),
+    so no parsed copy of them is ever held in memory. With optimize_media
+    (default MEDIA_OPTIMIZE) the template's images are shrunk and
+    deduplicated, see media_optimizer.py. The render itself waits for its
+    share of budget, see admission.py.
+    """
+    stage = _stages(trace)
+    optimize_media = MEDIA_OPTIMIZE if optimize_media is None else optimize_media
+    key, data = lookup_render(template_path, placeholders, "docx", cache, render_cache, trace, optimize_media)
+    if data is not None:
+        return data
+
+    streamed = _streamed(template_path)
+    compiled = None
+    if not streamed and fragments is not None:
+        with stage("template_load"):
+            compiled = fragments.get(template_path)
+    engine = "stream" if streamed else "fragments" if compiled is not None else "docx"
+    with ExitStack() as admitted:
+        # Admitted before the parsed copy is made, so waiting renders hold no tree
+        if budget is not None:
+            with stage("admission"):
+                admitted.enter_context(budget.admit(template_path, engine))
+        if streamed:
+            with stage("streaming"):
+                buffer = io.BytesIO()
+                render_stream(template_path, placeholders, buffer)
+                data = buffer.getvalue()
+        elif compiled is not None:
+            data = compiled.render(placeholders, stage)
+        else:
+            with stage("template_load"):
+                template = cache.get(template_path)
+            doc = replace_indexed(template.doc, template.index, placeholders, stage=stage)
+            with stage("serialization"):
+                buffer = io.BytesIO()
+                save_docx(doc, template.source, buffer, changed_parts(template.index))
+                data = buffer.getvalue()
+            # The parsed copy is held by reference cycles; free it before releasing its budget
+            # instead of at some later full collection, so copies cannot pile up
+            del doc, template
+            gc.collect(1)
+        if optimize_media:
+            with stage("media_optimization"):
+                data = MEDIA_OPTIMIZER.plan(template_path, cache.digest(template_path)).apply(data)
+    if budget is not None and trace is not None and trace.trace_memory:
+        budget.learn(template_path, engine, trace.peak_alloc_bytes)
+    if key is not None:
+        render_cache.put(key, data)
+    return data
+
+
+def render_pdf(template_path, placeholders, cache=TEMPLATE_CACHE, trace=None, render_cache=RENDER_CACHE):
+    """Render a proposal and convert it with the LibreOffice pool, caching the PDF"""
+    stage = _stages(trace)
+    key, data = lookup_render(template_path, placeholders, "pdf", cache, render_cache, trace)
+    if data is not None:
+        return data
+
+    docx_bytes = render_document(template_path, placeholders, cache, trace, render_cache)
+    with stage("pdf_conversion"):
+        data = get_pdf_pool().convert(docx_bytes)
+    if trace is not None:
+        # A cached .docx still had to be converted
+        trace.cache_hit = False
+    if key is not None:
+        render_cache.put(key, data)
+    return data
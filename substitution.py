@@ -0,0 +1,38 @@
+import re
+from functools import lru_cache
+
+PLACEHOLDER_MARKER = "<<"
+# A whole placeholder as written in a template, e.g. <<Client Name>>
+PLACEHOLDER_TOKEN = re.compile(r"<<[^<>\n]+>>")
+
+
+@lru_cache(maxsize=64)
+def _compile_keys(keys):
+    # Longest keys first so overlapping placeholders resolve like a full match
+    alternation = "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+    return re.compile(alternation)
+
+
+class PlaceholderMatcher:
+    """Replace every placeholder of a set in a single scan of the text"""
+
+    def __init__(self, placeholders):
+        self.values = {k: str(v) for k, v in placeholders.items()}
+        self.pattern = _compile_keys(tuple(sorted(self.values))) if self.values else None
+
+    def _lookup(self, match):
+        return self.values[match.group(0)]
+
+    def sub(self, text):
+        """Return text with placeholders replaced, or the same object if nothing matched"""
+        if self.pattern is None or PLACEHOLDER_MARKER not in text:
+            return text
+        new_text = self.pattern.sub(self._lookup, text)
+        return text if new_text == text else new_text
+
+
+def get_matcher(placeholders):
+    """Accept a placeholders dict or an already built matcher"""
+    if isinstance(placeholders, PlaceholderMatcher):
+        return placeholders
+    return PlaceholderMatcher(placeholders)
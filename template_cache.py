@@ -0,0 +1,84 @@
+import copy
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from docx import Document
+
+from docx_render import build_placeholder_index, template_placeholders
+
+# source keeps the template's bytes so output can reuse its untouched zip members,
+# digest is their sha256 and identifies the template content in output caches,
+# placeholders holds every <<...>> token the template contains
+CachedTemplate = namedtuple("CachedTemplate", ["doc", "index", "source", "digest", "placeholders"])
+
+
+class TemplateCache:
+    """LRU cache of parsed templates keyed by path and modification time"""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def _load(self, template_path):
+        key = (os.path.abspath(template_path), os.path.getmtime(template_path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        with open(template_path, "rb") as f:
+            source = f.read()
+        doc = Document(io.BytesIO(source))
+        entry = CachedTemplate(
+            doc, build_placeholder_index(doc), source, hashlib.sha256(source).hexdigest(), template_placeholders(doc)
+        )
+
+        with self._lock:
+            # Drop stale entries for the same file before inserting the new one
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale]
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def warm(self, template_path):
+        """Parse and index a template ahead of its first render; returns the shared entry"""
+        return self._load(template_path)
+
+    def get(self, template_path):
+        """Return a CachedTemplate whose doc is a private copy safe to edit"""
+        entry = self._load(template_path)
+        return entry._replace(doc=copy.deepcopy(entry.doc))
+
+    def digest(self, template_path):
+        """sha256 of the template file, without parsing it"""
+        stat = os.stat(template_path)
+        key = (os.path.abspath(template_path), stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key[:2])
+            if entry is not None:
+                return entry.digest
+            digest = self._digests.get(key)
+        if digest is None:
+            with open(template_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            with self._lock:
+                for stale in [k for k in self._digests if k[0] == key[0]]:
+                    del self._digests[stale]
+                self._digests[key] = digest
+        return digest
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+
+
+TEMPLATE_CACHE = TemplateCache()
@@ -0,0 +1,180 @@
+"""Startup validation and hot reload of the proposal template manifest.
+
+At startup every template named in the manifest is parsed once (which also
+warms TEMPLATE_CACHE) and its <<...>> tokens are compared with the keys the
+proposal supplies:
+
+    missing   keys listed in pricing_fields/special_fields that the
+              template never mentions, so the entered value goes nowhere
+    unfilled  tokens in the template that no input fills, so they would be
+              left verbatim in the generated document
+
+A polling watcher then reloads only what changed: an edited template is
+re-parsed and re-checked on its own, and an edited manifest is re-validated
+and applied in place, re-checking just the entries whose config changed.
+An invalid manifest is reported and the previous one stays active.
+
+Environment settings:
+    PROPOSAL_MANIFEST        manifest path (default proposals.json)
+    TEMPLATE_WATCH_SECONDS   polling interval (default 2, 0 disables hot reload)
+"""
+import logging
+import os
+import threading
+from collections import namedtuple
+from datetime import date
+
+from proposal_config import MANIFEST_PATH, PROPOSAL_CONFIG, apply_manifest, load_manifest
+from proposals import build_placeholders
+from template_cache import TEMPLATE_CACHE
+
+logger = logging.getLogger("proposal.templates")
+
+TemplateReport = namedtuple("TemplateReport", ["template", "found", "missing", "unfilled", "error"])
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def supplied_placeholders(selected_proposal):
+    """Every placeholder build_placeholders fills for this proposal"""
+    return frozenset(build_placeholders(selected_proposal, {"date": date.today()}, {}, "USD"))
+
+
+def configured_placeholders(config):
+    """Placeholders for the keys the manifest lists explicitly"""
+    keys = [key for _, key in config["pricing_fields"]]
+    keys += [field for field, wrapper in config["special_fields"] if wrapper == "<<"]
+    return frozenset(f"<<{key}>>" for key in keys)
+
+
+class TemplateRegistry:
+    """Per-proposal template reports, kept current by polling file mtimes"""
+
+    def __init__(self, manifest_path=MANIFEST_PATH, templates_dir=".", cache=TEMPLATE_CACHE):
+        self.manifest_path = manifest_path
+        self.templates_dir = templates_dir
+        self.cache = cache
+        self.reports = {}
+        self._manifest_mtime = None
+        self._template_mtimes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def template_path(self, selected_proposal):
+        return os.path.join(self.templates_dir, PROPOSAL_CONFIG[selected_proposal]["template"])
+
+    def _scan(self, selected_proposal):
+        """Parse one template and compare its tokens with the proposal's keys"""
+        config = PROPOSAL_CONFIG[selected_proposal]
+        path = self.template_path(selected_proposal)
+        self._template_mtimes[selected_proposal] = _mtime(path)
+        try:
+            found = self.cache.warm(path).placeholders
+        except FileNotFoundError:
+            report = TemplateReport(config["template"], frozenset(), frozenset(), frozenset(), "template file not found")
+        except Exception as e:
+            report = TemplateReport(config["template"], frozenset(), frozenset(), frozenset(), f"{type(e).__name__}: {e}")
+        else:
+            report = TemplateReport(
+                config["template"], found,
+                configured_placeholders(config) - found,
+                found - supplied_placeholders(selected_proposal),
+                None,
+            )
+        self.reports[selected_proposal] = report
+        self._log(selected_proposal, report)
+        return report
+
+    @staticmethod
+    def _log(selected_proposal, report):
+        if report.error:
+            logger.warning("%s: %s (%s)", selected_proposal, report.error, report.template)
+            return
+        if report.missing:
+            logger.warning("%s: %s has no %s", selected_proposal, report.template, ", ".join(sorted(report.missing)))
+        if report.unfilled:
+            logger.warning("%s: nothing fills %s in %s", selected_proposal, ", ".join(sorted(report.unfilled)),
+                           report.template)
+
+    def load(self):
+        """Read the manifest and check every template; invalid manifests raise ValueError"""
+        with self._lock:
+            self._manifest_mtime = _mtime(self.manifest_path)
+            apply_manifest(load_manifest(self.manifest_path))
+            self.reports.clear()
+            self._template_mtimes.clear()
+            for selected_proposal in list(PROPOSAL_CONFIG):
+                self._scan(selected_proposal)
+        return self.reports
+
+    def check(self):
+        """Reload whatever changed since the last check; returns the proposals re-checked"""
+        with self._lock:
+            changed = []
+            manifest_mtime = _mtime(self.manifest_path)
+            if manifest_mtime != self._manifest_mtime:
+                self._manifest_mtime = manifest_mtime
+                try:
+                    configs = load_manifest(self.manifest_path)
+                except (OSError, ValueError) as e:
+                    logger.error("Keeping the previous proposal manifest: %s", e)
+                else:
+                    previous = dict(PROPOSAL_CONFIG)
+                    apply_manifest(configs)
+                    for name in [name for name in self.reports if name not in configs]:
+                        del self.reports[name]
+                        self._template_mtimes.pop(name, None)
+                    changed = [name for name, config in configs.items() if previous.get(name) != config]
+                    logger.info("Reloaded proposal manifest: %d proposals, %d changed", len(configs), len(changed))
+
+            for selected_proposal in PROPOSAL_CONFIG:
+                if selected_proposal not in changed and \
+                        _mtime(self.template_path(selected_proposal)) != self._template_mtimes.get(selected_proposal):
+                    changed.append(selected_proposal)
+            for selected_proposal in changed:
+                self._scan(selected_proposal)
+            return changed
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Template hot reload failed")
+
+    def start(self, interval=None):
+        """Start the polling watcher once; a no-op when the interval is 0"""
+        interval = float(os.environ.get("TEMPLATE_WATCH_SECONDS", 2) if interval is None else interval)
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_template_registry(templates_dir="."):
+    """Process-wide registry: validated on first use, then watched for changes"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            registry = TemplateRegistry(templates_dir=templates_dir)
+            registry.load()
+            registry.start()
+            _registry = registry
+        return _registry
@@ -0,0 +1,68 @@
+"""The render path as the app shipped it before the render engines, kept verbatim.
+
+Copied unchanged from the first version of app.py so the engines are
+checked against what proposals used to look like, not against today's
+docx_render.py. Do not edit: when the expected output really changes,
+say so in the test that compares against it.
+"""
+from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
+from docx.oxml.ns import qn
+
+def apply_formatting(new_run, original_run):
+    """Copy formatting from original run to new run"""
+    if original_run.font.name:
+        new_run.font.name = original_run.font.name
+        new_run._element.rPr.rFonts.set(qn('w:eastAsia'), original_run.font.name)
+    if original_run.font.size:
+        new_run.font.size = original_run.font.size
+    if original_run.font.color.rgb:
+        new_run.font.color.rgb = original_run.font.color.rgb
+    new_run.bold = original_run.bold
+    new_run.italic = original_run.italic
+
+def replace_in_paragraph(para, placeholders):
+    """Handle paragraph replacements preserving formatting"""
+    original_runs = para.runs.copy()
+    full_text = para.text
+    for ph, value in placeholders.items():
+        full_text = full_text.replace(ph, str(value))
+
+    if full_text != para.text:
+        para.clear()
+        new_run = para.add_run(full_text)
+        if original_runs:
+            original_run = next((r for r in original_runs if r.text), None)
+            if original_run:
+                apply_formatting(new_run, original_run)
+
+def replace_and_format(doc, placeholders):
+    """Enhanced replacement with table cell handling"""
+    # Process paragraphs
+    for para in doc.paragraphs:
+        replace_in_paragraph(para, placeholders)
+
+    # Process tables
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell.tables:
+                    for nested_table in cell.tables:
+                        for nested_row in nested_table.rows:
+                            for nested_cell in nested_row.cells:
+                                for para in nested_cell.paragraphs:
+                                    replace_in_paragraph(para, placeholders)
+                else:
+                    for para in cell.paragraphs:
+                        replace_in_paragraph(para, placeholders)
+                cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+    return doc
+
+def remove_empty_rows(table):
+    """Remove rows from the table where the second cell is empty or has no value."""
+    rows_to_remove = []
+    for row in table.rows:
+        if len(row.cells) > 1 and row.cells[1].text.strip() == "":
+            rows_to_remove.append(row)
+    # Remove rows in reverse order to avoid index issues
+    for row in reversed(rows_to_remove):
+        table._tbl.remove(row._element)
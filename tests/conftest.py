@@ -0,0 +1,177 @@
+"""Shared fixtures: synthetic templates and the reference render of the original app.
+
+Every cache, store and history the modules under test would create lives
+in a temporary directory for the session, and nothing starts watching or
+prewarming templates in the background.
+"""
+import io
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read at import by the modules under test, so set before any of them is imported
+_STATE_DIR = tempfile.mkdtemp(prefix="proposal-tests-")
+os.environ.update({
+    "XDG_CACHE_HOME": os.path.join(_STATE_DIR, "cache"),
+    "XDG_DATA_HOME": os.path.join(_STATE_DIR, "data"),
+    "FRAGMENT_DIR": os.path.join(_STATE_DIR, "fragments"),
+    "PROPOSAL_HISTORY_DB": "",
+    "TEMPLATE_WATCH_SECONDS": "0",
+    "PREWARM_TEMPLATES": "0",
+    "RENDER_MEMORY_MB": "0",
+    "MEDIA_OPTIMIZE": "0",
+    "STREAM_TEMPLATE_MB": "0",
+})
+for name in ("RENDER_CACHE_DIR", "PROPOSAL_API_TOKEN", "PROPOSAL_API_PORT", "PROPOSAL_MANIFEST"):
+    os.environ.pop(name, None)
+
+import pytest
+from docx import Document
+
+import baseline_render
+from benchmarks.synthetic import SAMPLE_PLACEHOLDERS, build_template
+from pdf_pool import PdfConverterPool
+from proposal_config import PROPOSAL_CONFIG
+
+# Small versions of the benchmark cases the original render path handled
+# completely: run-split placeholders, pricing tables with one level of
+# nested team tables, several tables and an embedded image
+TEMPLATE_CASES = {
+    "plain": dict(paragraphs=40, placeholder_every=5),
+    "nested": dict(paragraphs=30, placeholder_every=3, tables=2, table_depth=1, images=1, image_size=(40, 30)),
+    "dense": dict(paragraphs=20, placeholder_every=1, table_depth=1),
+}
+# Team tables nested deeper than the original path looked (user-003 fills them too)
+DEEP_CASE = dict(paragraphs=20, placeholder_every=2, tables=3, table_depth=4)
+
+# Values that stress substitution: empties (rows are pruned), whitespace,
+# tabs and line breaks (become w:tab / w:br) and XML special characters
+_AWKWARD = ["", " ", " lead", "trail ", "a\tb", "x\ny\r z", "A&B <c> d", "  \n "]
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+
+def placeholder_variants():
+    """(id, placeholders) pairs covering the sample values, all-empty and awkward text"""
+    yield "sample", dict(SAMPLE_PLACEHOLDERS)
+    yield "empty", {key: "" for key in SAMPLE_PLACEHOLDERS}
+    for n, _ in enumerate(_AWKWARD):
+        keys = list(SAMPLE_PLACEHOLDERS)
+        yield f"awkward-{n}", {key: _AWKWARD[(n + i) % len(_AWKWARD)] for i, key in enumerate(keys)}
+
+
+VARIANTS = list(placeholder_variants())
+
+
+def zip_members(data):
+    """{member name: uncompressed bytes} of a .docx given as bytes"""
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        assert z.testzip() is None
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def story_members(members):
+    return {name for name in members
+            if name.startswith("word/") and name.endswith(".xml")
+            and any(kind in name for kind in ("document", "header", "footer"))}
+
+
+def reference_render(template_path, placeholders):
+    """The original render (baseline_render.py), with headers and footers substituted as well.
+
+    The original path left headers and footers alone; every engine now
+    fills them, so their paragraphs go through the original substitution
+    too.
+    """
+    doc = Document(template_path)
+    baseline_render.replace_and_format(doc, placeholders)
+    for section in doc.sections:
+        for story in (section.header, section.footer):
+            if not story.is_linked_to_previous:
+                for para in story.paragraphs:
+                    baseline_render.replace_in_paragraph(para, placeholders)
+    for table in doc.tables:
+        baseline_render.remove_empty_rows(table)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def assert_matches_reference(data, template_path, placeholders):
+    """Story parts as the original render wrote them; every other member as the template holds it"""
+    members = zip_members(data)
+    expected = zip_members(reference_render(template_path, placeholders))
+    with open(template_path, "rb") as f:
+        template = zip_members(f.read())
+    assert list(members) == list(template)
+    stories = story_members(template)
+    assert stories
+    for name in template:
+        assert members[name] == (expected[name] if name in stories else template[name]), name
+
+
+@pytest.fixture(scope="session")
+def template_files(tmp_path_factory):
+    """{case: path} of synthetic templates, one per TEMPLATE_CASES entry and DEEP_CASE as deep"""
+    directory = tmp_path_factory.mktemp("templates")
+    paths = {}
+    for case, options in dict(TEMPLATE_CASES, deep=DEEP_CASE).items():
+        path = directory / f"{case}.docx"
+        path.write_bytes(build_template(**options))
+        paths[case] = str(path)
+    return paths
+
+
+@pytest.fixture(params=list(TEMPLATE_CASES))
+def case_path(request, template_files):
+    """Each template the original render path fully handled"""
+    return template_files[request.param]
+
+
+@pytest.fixture(scope="session")
+def templates_dir(tmp_path_factory):
+    """A templates folder holding a small synthetic template for every configured proposal"""
+    directory = tmp_path_factory.mktemp("proposal-templates")
+    data = build_template(paragraphs=20, placeholder_every=5)
+    for config in PROPOSAL_CONFIG.values():
+        (directory / config["template"]).write_bytes(data)
+    return str(directory)
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """A small template of this test's own, free to be edited"""
+    path = tmp_path / "template.docx"
+    path.write_bytes(build_template(**TEMPLATE_CASES["plain"]))
+    return str(path)
+
+
+@pytest.fixture
+def fake_pdf_pool(tmp_path, monkeypatch):
+    """Factory of PdfConverterPools whose workers run fake_pdf_worker.py; returns (pool, job log path)"""
+    python = tmp_path / "fake-python"
+    python.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(ROOT, "tests", "fake_pdf_worker.py")}" "$@"\n')
+    python.chmod(python.stat().st_mode | stat.S_IXUSR)
+    log = tmp_path / "pdf-jobs.log"
+    log.write_text("")
+    monkeypatch.setenv("FAKE_PDF_LOG", str(log))
+    pools = []
+
+    def make_pool(size=1, timeout=60, hang=False):
+        pool = PdfConverterPool(size=size, timeout=timeout, soffice="hang" if hang else "fake", python=str(python))
+        pools.append(pool)
+        return pool, log
+
+    yield make_pool
+    for pool in pools:
+        for worker in pool._workers:
+            worker.stop()
+        pool.close()
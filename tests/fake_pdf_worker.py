@@ -0,0 +1,39 @@
+"""Stands in for pdf_worker.py where LibreOffice is not installed.
+
+Speaks the worker's JSON-lines protocol: reports ready, then answers each
+job with a tiny PDF. It never answers a job whose input starts with
+b"hang", nor any job when started with --soffice hang. Every job it
+receives is appended to the file named by FAKE_PDF_LOG.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("worker_script")
+    parser.add_argument("--soffice")
+    parser.add_argument("--profile")
+    parser.add_argument("--pipe")
+    parser.add_argument("--startup-timeout")
+    args = parser.parse_args()
+
+    print(json.dumps({"ready": True, "pid": os.getpid()}), flush=True)
+    for line in sys.stdin:
+        job = json.loads(line)
+        with open(os.environ["FAKE_PDF_LOG"], "a") as log:
+            log.write(line)
+        with open(job["input"], "rb") as f:
+            data = f.read()
+        if args.soffice == "hang" or data.startswith(b"hang"):
+            time.sleep(3600)
+        with open(job["output"], "wb") as f:
+            f.write(b"%PDF-1.4 fake\n")
+        print(json.dumps({"id": job["id"], "ok": True}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from admission import MemoryBudget, RenderRejected
+
+
+def test_renders_wait_for_their_share(template_path):
+    budget = MemoryBudget(1024, max_wait=5)
+    admitted = []
+
+    def wait_for_share():
+        with budget.admit(template_path, "docx") as cost:
+            admitted.append(cost)
+
+    with budget.admit(template_path, "fragments") as cost:
+        assert cost == 1024
+        waiter = threading.Thread(target=wait_for_share)
+        waiter.start()
+        waiter.join(0.2)
+        assert admitted == [] and budget.snapshot()["waiting"] == 1
+    waiter.join(5)
+    assert admitted == [1024]
+
+
+def test_rejects_after_waiting_too_long(template_path):
+    budget = MemoryBudget(1024)
+    with budget.admit(template_path, "fragments"):
+        with pytest.raises(RenderRejected):
+            with budget.admit(template_path, "fragments", timeout=0.05):
+                pass
+    assert budget.snapshot()["rejected"] == 1
+    assert budget.snapshot()["in_use_bytes"] == 0
+
+
+def test_estimates_scale_with_the_engine_and_learn_from_peaks(template_path):
+    budget = MemoryBudget(1 << 40)
+    assert budget.estimate(template_path, "docx") > budget.estimate(template_path, "fragments")
+    budget.learn(template_path, "fragments", 1 << 30)
+    assert budget.estimate(template_path, "fragments") == 1 << 30
@@ -0,0 +1,108 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+import api
+import pdf_pool
+from renderer import DOCX_MIME
+
+TOKEN = "test-token"
+ROW = {"proposal": "Make & CRM Automation", "client_name": "Acme", "date": "2026-01-05",
+       "prices": {"M-Price": 1500, "C-Price": 900}}
+
+
+@pytest.fixture(scope="module")
+def server(templates_dir):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    app = api.create_app(templates_dir, token=TOKEN)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "API server did not start"
+        time.sleep(0.02)
+    yield port
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def post(port, body, token=TOKEN):
+    """(status, headers, body) of a POST /render"""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request("POST", "/render", body if isinstance(body, (str, bytes)) else json.dumps(body), headers)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_renders_a_docx(server):
+    status, headers, body = post(server, ROW)
+    assert status == 200
+    assert headers["content-type"] == DOCX_MIME
+    assert body.startswith(b"PK")
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_requires_the_token(server, token):
+    status, headers, _ = post(server, ROW, token=token)
+    assert status == 401
+    assert headers["www-authenticate"] == "Bearer"
+
+
+@pytest.mark.parametrize("body", [
+    "{not json",
+    [ROW],
+    dict(ROW, proposal="Nope"),
+    dict(ROW, prices={"M-Price": "lots"}),
+    dict(ROW, prices={"M-Price": -1}),
+    dict(ROW, client_name=["Acme"]),
+    dict(ROW, date="tomorrow"),
+    dict(ROW, output_format="odt"),
+    dict(ROW, proposals="Make & CRM Automation"),
+    dict(ROW, client_name="Acme\x01Corp"),
+], ids=["json", "not-object", "proposal", "price", "negative", "name-type", "date", "format", "bundle",
+        "control-char"])
+def test_malformed_requests_get_400(server, body):
+    status, _, response = post(server, body)
+    assert status == 400, response
+    assert json.loads(response)["error"]
+
+
+def test_pdf_timeout_gets_504(server, fake_pdf_pool, monkeypatch):
+    pool, log = fake_pdf_pool(timeout=0.3, hang=True)
+    monkeypatch.setattr(pdf_pool, "_pool", pool)
+    status, headers, body = post(server, dict(ROW, client_name="Slow PDF", output_format="pdf"))
+    assert status == 504, body
+    assert "timed out" in json.loads(body)["error"]
+    assert headers["retry-after"] == "5"
+    assert len(log.read_text().splitlines()) == 1
+
+
+@pytest.mark.parametrize("host, token, allowed", [
+    ("127.0.0.1", None, False),
+    ("localhost", None, False),
+    ("::1", None, False),
+    ("0.0.0.0", TOKEN, False),
+    ("0.0.0.0", None, True),
+])
+def test_exposure_allowed(host, token, allowed):
+    api.check_exposure(host, token, allowed)
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "192.168.1.10", "example.com"])
+def test_exposure_refused_without_a_token(host):
+    with pytest.raises(ValueError, match="PROPOSAL_API_TOKEN"):
+        api.check_exposure(host, None)
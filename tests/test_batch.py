@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+import batch
+
+PROPOSAL = "Make & CRM Automation"
+
+
+def _row(**fields):
+    return dict({"proposal": PROPOSAL, "client_name": "Acme", "date": "2026-01-05"}, **fields)
+
+
+def test_resolve_row():
+    selected_proposal, placeholders, filename = batch.resolve_row(_row(prices={"M-Price": 1500}, team={"P1": 2}))
+    assert selected_proposal == PROPOSAL
+    assert placeholders["<<Client Name>>"] == "Acme"
+    assert filename.endswith(".docx")
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"proposal": "Nope"}, "Unknown proposal type"),
+    ({"proposal": ["Make & CRM Automation"]}, "Unknown proposal type"),
+    ({"date": "05/01/2026"}, "does not match format"),
+    ({"date": 20260105}, "Dates must be"),
+    ({"prices": {"M-Price": "lots"}}, "M-Price must be a number"),
+    ({"prices": {"M-Price": -5}}, "must not be negative"),
+    ({"prices": {"M-Price": True}}, "must be a number"),
+    ({"prices": {"M-Price": float("nan")}}, "must be a number"),
+    ({"prices": [1500]}, "prices must be an object"),
+    ({"team": {"P1": "two"}}, "P1 must be a number"),
+    ({"client_name": 42}, "client_name must be a string"),
+    ({"currency": "XYZ"}, "Unknown currency"),
+])
+def test_resolve_row_rejects_bad_fields(fields, message):
+    with pytest.raises(ValueError, match=message):
+        batch.resolve_row(_row(**fields))
+
+
+@pytest.mark.parametrize("proposals", ["Make & CRM Automation", [PROPOSAL, 3]])
+def test_resolve_bundle_rejects_bad_proposal_lists(proposals):
+    with pytest.raises(ValueError, match="proposals must be a list"):
+        batch.resolve_bundle(_row(proposals=proposals))
+
+
+def test_read_rows_reports_bad_lines(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"client_name": "A"}\n{not json\n\n[1, 2]\n{"client_name": "B"}\n')
+    rows = list(batch.read_rows(str(path)))
+    assert [(number, row) for number, row, _ in rows] == [
+        (1, {"client_name": "A"}), (2, None), (4, None), (5, {"client_name": "B"}),
+    ]
+    assert rows[1][2].startswith("Invalid JSON") and rows[2][2] == "Row must be a JSON object"
+
+
+_render_row = batch.render_row
+
+
+def _crash_on_client(job):
+    """render_row, except that a row for client "Crash" takes its worker process down"""
+    if job[1].get("client_name") == "Crash":
+        os._exit(1)
+    return _render_row(job)
+
+
+def test_run_batch_reports_failed_rows_and_renders_the_rest(tmp_path, templates_dir, monkeypatch):
+    monkeypatch.setattr(batch, "render_row", _crash_on_client)
+    rows = [
+        _row(client_name="A"),
+        "{not json",
+        _row(client_name="Crash"),
+        [1, 2],
+        _row(client_name="B"),
+        _row(client_name="C", proposal="Nope"),
+        _row(client_name="D"),
+    ]
+    input_path = tmp_path / "rows.jsonl"
+    input_path.write_text("\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n")
+    output_path = tmp_path / "out.zip"
+
+    rendered, files, errors, _ = batch.run_batch(str(input_path), str(output_path), templates_dir, workers=2,
+                                                 progress=False)
+
+    assert (rendered, files) == (3, 3)
+    assert [number for number, _ in errors] == [2, 3, 4, 6]
+    assert "died" in dict(errors)[3] and "Unknown proposal type" in dict(errors)[6]
+    with zipfile.ZipFile(output_path) as archive:
+        names = archive.namelist()
+        report = list(csv.reader(io.StringIO(archive.read("errors.csv").decode())))
+    assert sorted(name for name in names if name.endswith(".docx")) == sorted(
+        batch.resolve_row(_row(client_name=name))[2] for name in "ABD"
+    )
+    assert report[0] == ["row", "error"] and len(report) == 5
+
+
+def test_run_batch_counts_rows_and_files_apart(tmp_path, templates_dir):
+    rows = [
+        _row(client_name="A", variants=[{"currency": "USD"}, {"currency": "INR"}]),
+        _row(client_name="B"),
+    ]
+    input_path = tmp_path / "rows.jsonl"
+    input_path.write_text("\n".join(json.dumps(row) for row in rows) + "\n")
+
+    rendered, files, errors, _ = batch.run_batch(str(input_path), str(tmp_path / "out.zip"), templates_dir,
+                                                 workers=1, progress=False)
+
+    assert (rendered, files, errors) == (2, 3, [])
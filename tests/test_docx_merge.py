@@ -0,0 +1,63 @@
+import io
+import zipfile
+
+import pytest
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches
+from lxml import etree
+from PIL import Image
+
+from bundle import assemble_bundle
+from docx_merge import merge_documents
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def _proposal(title):
+    """A document with images in its body, header and footer"""
+    doc = Document()
+    doc.add_paragraph(title)
+    doc.add_paragraph().add_run().add_picture(_png("red"), width=Inches(1))
+    doc.sections[0].header.paragraphs[0].add_run().add_picture(_png("blue"), width=Inches(1))
+    doc.sections[0].footer.paragraphs[0].add_run().add_picture(_png("green"), width=Inches(1))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def test_drawing_ids_are_unique_across_every_part():
+    merged = merge_documents([_proposal(f"Proposal {n}") for n in range(3)])
+    ids = []
+    with zipfile.ZipFile(io.BytesIO(merged)) as z:
+        for name in z.namelist():
+            if name.endswith(".xml"):
+                ids += [e.get("id") for e in etree.fromstring(z.read(name)).iter(qn("wp:docPr"))]
+        images = [name for name in z.namelist() if name.startswith("word/media/")]
+    assert len(ids) == 9
+    assert len(set(ids)) == 9
+    # Each distinct image is stored once
+    assert len(images) == 3
+
+
+def test_merged_document_keeps_every_proposal_in_order():
+    merged = Document(io.BytesIO(merge_documents([_proposal(f"Proposal {n}") for n in range(3)])))
+    titles = [p.text for p in merged.paragraphs if p.text.startswith("Proposal")]
+    assert titles == ["Proposal 0", "Proposal 1", "Proposal 2"]
+    assert len(merged.sections) == 3
+
+
+def test_assemble_bundle_zips_members_in_order():
+    files = [("b.docx", b"second"), ("a.docx", b"first")]
+    with zipfile.ZipFile(io.BytesIO(assemble_bundle(files))) as z:
+        assert [(name, z.read(name)) for name in z.namelist()] == files
+
+
+def test_assemble_bundle_rejects_unknown_formats():
+    with pytest.raises(ValueError, match="Unknown bundle format"):
+        assemble_bundle([("a.docx", b"")], "pdf")
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+from docx import Document
+
+from conftest import VARIANTS, reference_render, story_members, zip_members
+from docx_render import build_placeholder_index, replace_and_format, replace_indexed
+
+VARIANT_IDS = [name for name, _ in VARIANTS]
+
+
+def _rendered(template_path, render):
+    doc = Document(template_path)
+    render(doc)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return zip_members(buffer.getvalue())
+
+
+def _stories(members):
+    return {name: members[name] for name in story_members(members)}
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_walk_matches_original_render(case_path, placeholders):
+    walked = _rendered(case_path, lambda doc: replace_and_format(doc, placeholders))
+    assert _stories(walked) == _stories(zip_members(reference_render(case_path, placeholders)))
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_indexed_render_matches_walk(template_files, placeholders):
+    for path in template_files.values():
+        index = build_placeholder_index(Document(path))
+        indexed = _rendered(path, lambda doc: replace_indexed(doc, index, placeholders))
+        assert _stories(indexed) == _stories(_rendered(path, lambda doc: replace_and_format(doc, placeholders)))
+
+
+def test_fills_deeply_nested_tables_and_headers(template_files):
+    doc = Document(template_files["deep"])
+    replace_and_format(doc, VARIANTS[0][1])
+    for root in (doc.element, doc.sections[0].header._element):
+        assert "<<" not in "".join(root.itertext())
+    assert "Acme Corp" in "".join(doc.sections[0].header._element.itertext())
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+import renderer
+from conftest import VARIANTS, assert_matches_reference, zip_members
+from docx_stream import render_stream
+from template_cache import TemplateCache
+
+VARIANT_IDS = [name for name, _ in VARIANTS]
+
+
+def _streamed(template_path, placeholders):
+    buffer = io.BytesIO()
+    render_stream(template_path, placeholders, buffer)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_matches_original_render(case_path, placeholders):
+    assert_matches_reference(_streamed(case_path, placeholders), case_path, placeholders)
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_deep_nesting_matches_docx_engine(template_files, placeholders):
+    path = template_files["deep"]
+    expected = renderer.render_document(path, placeholders, cache=TemplateCache(), render_cache=None,
+                                        fragments=None, budget=None)
+    assert zip_members(_streamed(path, placeholders)) == zip_members(expected)
+
+
+def test_render_document_streams_large_templates(template_files, monkeypatch):
+    path = template_files["nested"]
+    monkeypatch.setattr(renderer, "STREAM_TEMPLATE_MB", 0.000001)
+    assert renderer.render_engine(path) == "stream"
+    placeholders = VARIANTS[0][1]
+    data = renderer.render_document(path, placeholders, cache=TemplateCache(), render_cache=None, budget=None)
+    assert_matches_reference(data, path, placeholders)
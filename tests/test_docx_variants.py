@@ -0,0 +1,19 @@
+from conftest import VARIANTS, assert_matches_reference, zip_members
+from docx_variants import render_variants
+from renderer import render_document
+from template_cache import TemplateCache
+
+
+def test_variants_match_original_render(case_path):
+    rendered = dict(render_variants(case_path, VARIANTS, cache=TemplateCache()))
+    assert list(rendered) == [name for name, _ in VARIANTS]
+    for name, placeholders in VARIANTS:
+        assert_matches_reference(rendered[name], case_path, placeholders)
+
+
+def test_deep_nesting_matches_single_renders(template_files):
+    path, cache = template_files["deep"], TemplateCache()
+    for name, data in render_variants(path, VARIANTS, cache=cache):
+        expected = render_document(path, dict(VARIANTS)[name], cache=cache, render_cache=None,
+                                   fragments=None, budget=None)
+        assert zip_members(data) == zip_members(expected), name
@@ -0,0 +1,32 @@
+import io
+import zipfile
+
+import pytest
+
+from conftest import VARIANTS, assert_matches_reference, story_members
+from renderer import render_document
+from template_cache import TemplateCache
+
+VARIANT_IDS = [name for name, _ in VARIANTS]
+
+
+def _render(template_path, placeholders):
+    return render_document(template_path, placeholders, cache=TemplateCache(), render_cache=None,
+                           fragments=None, budget=None)
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_matches_original_render(case_path, placeholders):
+    assert_matches_reference(_render(case_path, placeholders), case_path, placeholders)
+
+
+def test_untouched_members_keep_their_compressed_bytes(case_path):
+    data = _render(case_path, VARIANTS[0][1])
+    with zipfile.ZipFile(io.BytesIO(data)) as output, zipfile.ZipFile(case_path) as template:
+        stories = story_members(template.namelist())
+        for info in template.infolist():
+            if info.filename in stories:
+                continue
+            copied = output.getinfo(info.filename)
+            assert (copied.CRC, copied.compress_size, copied.compress_type) == \
+                (info.CRC, info.compress_size, info.compress_type), info.filename
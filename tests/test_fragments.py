@@ -0,0 +1,135 @@
+import os
+import pickle
+
+import pytest
+
+import fragments
+from conftest import VARIANTS, assert_matches_reference, zip_members
+from fragments import _ARTIFACT_MAGIC, _DIGEST_SIZE, _MAC_SIZE, FragmentStore, FragmentUnsupported, default_store_dir
+from renderer import render_document, render_engine
+from template_cache import TemplateCache
+
+VARIANT_IDS = [name for name, _ in VARIANTS]
+
+_unpickled = []
+
+
+class _Tripwire:
+    """Records being unpickled, standing in for a payload that runs code"""
+
+    def __reduce__(self):
+        return _unpickled.append, ("tripped",)
+
+
+def _store(tmp_path):
+    return FragmentStore(cache=TemplateCache(), store_dir=str(tmp_path / "store"))
+
+
+def test_artifacts_live_in_the_store_not_next_to_the_template(template_path, tmp_path):
+    store = _store(tmp_path)
+    assert store.get(template_path) is not None
+    artifact = store.artifact_path(template_path)
+    assert os.path.dirname(artifact) == store.store_dir
+    assert os.path.exists(artifact)
+    assert not [name for name in os.listdir(os.path.dirname(template_path)) if name.endswith(".fragments")]
+
+
+def test_same_name_in_another_folder_gets_its_own_artifact(tmp_path):
+    store = _store(tmp_path)
+    assert store.artifact_path(str(tmp_path / "a" / "t.docx")) != store.artifact_path(str(tmp_path / "b" / "t.docx"))
+
+
+def test_default_store_dir_follows_xdg_cache_home(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_store_dir() == str(tmp_path / "proposal-generator" / "fragments")
+
+
+def test_round_trips_through_the_artifact(template_path, tmp_path):
+    store = _store(tmp_path)
+    compiled = store.get(template_path)
+    digest = store.cache.digest(template_path)
+    reread = store._read(store.artifact_path(template_path), digest)
+    assert reread is not None and reread.digest == compiled.digest == digest
+
+
+def test_tampered_artifact_is_not_unpickled(template_path, tmp_path):
+    store = _store(tmp_path)
+    store.get(template_path)
+    artifact = store.artifact_path(template_path)
+    with open(artifact, "rb") as f:
+        data = f.read()
+    # A valid header in front of a payload the store never signed
+    header = data[:len(_ARTIFACT_MAGIC) + _DIGEST_SIZE + _MAC_SIZE]
+    with open(artifact, "wb") as f:
+        f.write(header + pickle.dumps(_Tripwire()))
+
+    _unpickled.clear()
+    fresh = FragmentStore(cache=store.cache, store_dir=store.store_dir)
+    assert fresh._read(artifact, store.cache.digest(template_path)) is None
+    # Recompiled instead, and the artifact rewritten
+    assert fresh.get(template_path) is not None
+    assert _unpickled == []
+    assert fresh._read(artifact, store.cache.digest(template_path)) is not None
+
+
+def test_plain_pickle_is_not_unpickled(template_path, tmp_path):
+    store = _store(tmp_path)
+    os.makedirs(store.store_dir)
+    with open(store.artifact_path(template_path), "wb") as f:
+        f.write(pickle.dumps(_Tripwire()))
+    _unpickled.clear()
+    assert store.get(template_path) is not None
+    assert _unpickled == []
+
+
+def test_artifact_of_an_edited_template_is_ignored(template_path, tmp_path):
+    store = _store(tmp_path)
+    store.get(template_path)
+    artifact = store.artifact_path(template_path)
+    with open(template_path, "ab") as f:
+        f.write(b"\0")
+    assert store._read(artifact, store.cache.digest(template_path)) is None
+
+
+def _render(template_path, placeholders, cache, fragments):
+    return render_document(template_path, placeholders, cache=cache, render_cache=None, fragments=fragments,
+                           budget=None)
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_matches_original_render(case_path, placeholders, tmp_path):
+    store = _store(tmp_path)
+    assert store.get(case_path) is not None
+    assert_matches_reference(_render(case_path, placeholders, store.cache, store), case_path, placeholders)
+
+    # A second store renders from the artifact the first one wrote instead of compiling
+    reloaded = FragmentStore(cache=store.cache, store_dir=store.store_dir)
+    assert reloaded._read(reloaded.artifact_path(case_path), store.cache.digest(case_path)) is not None
+    assert_matches_reference(_render(case_path, placeholders, store.cache, reloaded), case_path, placeholders)
+
+
+@pytest.mark.parametrize("placeholders", [p for _, p in VARIANTS], ids=VARIANT_IDS)
+def test_deep_nesting_matches_docx_engine(template_files, placeholders, tmp_path):
+    path, store = template_files["deep"], _store(tmp_path)
+    expected = _render(path, placeholders, store.cache, None)
+    assert zip_members(_render(path, placeholders, store.cache, store)) == zip_members(expected)
+
+
+def test_engine_is_docx_until_the_template_is_known_to_compile(template_path, tmp_path):
+    store = _store(tmp_path)
+    assert render_engine(template_path, store) == "docx"
+    assert not store.is_compiled(template_path)
+    store.get(template_path)
+    assert render_engine(template_path, store) == "fragments"
+    # Another process sharing the store directory sees the artifact
+    assert render_engine(template_path, _store(tmp_path)) == "fragments"
+
+
+def test_engine_of_a_template_that_cannot_compile_is_docx(template_path, tmp_path, monkeypatch):
+    def unsupported(template):
+        raise FragmentUnsupported("nested placeholder paragraph")
+
+    monkeypatch.setattr(fragments, "compile_template", unsupported)
+    store = _store(tmp_path)
+    assert store.get(template_path) is None
+    assert render_engine(template_path, store) == "docx"
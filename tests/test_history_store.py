@@ -0,0 +1,97 @@
+import hashlib
+import os
+from datetime import date
+
+import pytest
+
+from history_store import HistoryStore, TemplateChanged, default_path
+from renderer import render_document
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    stores = []
+
+    def open_store(**options):
+        store = HistoryStore(str(tmp_path / "history.db"), **options)
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def _record(store, template_path, name, data, proposal_date=date(2026, 1, 5), proposal="Make & CRM Automation"):
+    client = {"name": name, "email": f"{name.lower()}@example.com", "date": proposal_date}
+    store.record(proposal, client, {"<<Client Name>>": name}, "DOCX", f"{name}.docx", template_path, data)
+
+
+def test_default_path_follows_xdg_data_home(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+    assert default_path() == str(tmp_path / "proposal-generator" / "history.db")
+
+
+def test_search_by_name_proposal_and_date(open_store, template_path):
+    store = open_store()
+    _record(store, template_path, "Acme", b"1", date(2026, 1, 5))
+    _record(store, template_path, "Acorn", b"2", date(2026, 2, 5), proposal="Shopify Website")
+    _record(store, template_path, "Beta", b"3", date(2026, 3, 5))
+    store.flush()
+
+    entries, total = store.search("ac")
+    assert total == 2 and [e.client_name for e in entries] == ["Acorn", "Acme"]
+    assert store.search("ACORN@")[1] == 1
+    assert store.search(proposal="Shopify Website")[1] == 1
+    entries, total = store.search(date_from=date(2026, 2, 1), date_to=date(2026, 3, 5))
+    assert [e.client_name for e in entries] == ["Beta", "Acorn"]
+    assert store.search(date_to=date(2026, 1, 4))[1] == 0
+    assert store.proposal_counts() == {"Make & CRM Automation": 2, "Shopify Website": 1}
+
+
+def test_outputs_are_not_kept_by_default(open_store, template_path):
+    store = open_store()
+    _record(store, template_path, "Acme", b"document")
+    store.flush()
+    assert store.output(hashlib.sha256(b"document").hexdigest()) is None
+
+
+def test_oldest_generations_beyond_max_rows_are_deleted(open_store, template_path):
+    store = open_store(max_rows=3)
+    for n in range(5):
+        _record(store, template_path, f"Client {n}", b"x")
+    store.flush()
+    entries, total = store.search()
+    assert total == 3
+    assert [e.client_name for e in entries] == ["Client 4", "Client 3", "Client 2"]
+
+
+def test_outputs_are_bounded_and_follow_their_generations(open_store, template_path):
+    store = open_store(keep_outputs=True, max_rows=3, max_output_bytes=10)
+    outputs = [f"output {n}".encode() for n in range(4)]
+    for n, data in enumerate(outputs):
+        _record(store, template_path, f"Client {n}", data)
+        store.flush()
+    kept = [store.output(hashlib.sha256(data).hexdigest()) for data in outputs]
+    # Only the most recent fits the byte cap; the first lost its generation too
+    assert kept == [None, None, None, outputs[3]]
+
+
+def test_download_renders_again_from_the_stored_placeholders(open_store, template_path):
+    store = open_store()
+    data = render_document(template_path, {"<<Client Name>>": "Acme"})
+    _record(store, template_path, "Acme", data)
+    store.flush()
+    entry = store.search()[0][0]
+    assert store.download(entry, templates_dir=os.path.dirname(template_path)) == data
+
+
+def test_download_refuses_a_changed_template(open_store, template_path):
+    store = open_store()
+    _record(store, template_path, "Acme", b"old")
+    store.flush()
+    entry = store.search()[0][0]
+    with open(template_path, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(TemplateChanged):
+        store.download(entry, templates_dir=os.path.dirname(template_path))
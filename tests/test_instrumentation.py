@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+import instrumentation
+from instrumentation import RenderTrace, process_peak_rss_kb, register_collector, render_metrics
+
+MB = 1024 * 1024
+needs_peak_reset = pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK),
+                                      reason="VmHWM cannot be reset here")
+
+
+def _touch(size):
+    """size bytes that are really resident, unlike a zero-filled bytearray"""
+    return b"\x01" * size
+
+
+def test_repeated_stage_adds_up():
+    trace = RenderTrace("test", trace_memory=True)
+    for _ in range(2):
+        with trace.stage("template_load"):
+            time.sleep(0.01)
+            block = bytearray(64 * 1024)
+        del block
+    record = trace.stages["template_load"]
+    assert record["wall_ms"] >= 20
+    assert record["peak_alloc_kb"] >= 64
+    assert {"cpu_ms", "rss_kb", "rss_delta_kb"} <= set(record)
+
+
+@needs_peak_reset
+def test_stage_records_its_own_peak_rss():
+    trace = RenderTrace("test", trace_memory=False)
+    with trace.stage("substitution"):
+        block = _touch(64 * MB)
+        del block
+    with trace.stage("serialization"):
+        pass
+    peak = trace.stages["substitution"]["peak_rss_kb"]
+    assert peak - trace.stages["substitution"]["rss_kb"] >= 48 * 1024
+    # The next stage starts over, while the process keeps its lifetime peak
+    assert trace.stages["serialization"]["peak_rss_kb"] < peak - 48 * 1024
+    assert process_peak_rss_kb() >= peak
+
+
+@needs_peak_reset
+def test_peak_survives_a_stage_started_inside_it():
+    outer, inner = RenderTrace("outer", trace_memory=False), RenderTrace("inner", trace_memory=False)
+    with outer.stage("substitution"):
+        block = _touch(64 * MB)
+        del block
+        with inner.stage("admission"):
+            pass
+    assert outer.stages["substitution"]["peak_rss_kb"] - inner.stages["admission"]["peak_rss_kb"] >= 48 * 1024
+
+
+def test_finish_reports_process_peak_and_extras():
+    trace = RenderTrace("test", trace_memory=False)
+    with trace.stage("serialization"):
+        pass
+    payload = trace.finish(output_bytes=10, cache_hit=False)
+    assert payload["stages"].keys() == {"serialization"}
+    assert payload["process_peak_rss_kb"] > 0
+    assert (payload["output_bytes"], payload["cache_hit"]) == (10, False)
+    assert "peak_alloc_kb" not in payload
+
+
+def test_metrics_include_stages_and_collectors(monkeypatch):
+    monkeypatch.setattr(instrumentation, "COLLECTORS", list(instrumentation.COLLECTORS))
+    trace = RenderTrace("metrics test", trace_memory=False)
+    with trace.stage("cache_lookup"):
+        pass
+    trace.finish()
+    register_collector(lambda: "test_collector_gauge 1")
+    metrics = render_metrics()
+    assert 'proposal_type="metrics test",stage="cache_lookup"' in metrics
+    assert "test_collector_gauge 1" in metrics
+
+
+def test_stages_of_another_process_are_tagged_and_left_out_of_the_peak():
+    trace = RenderTrace("test", trace_memory=False)
+    with trace.stage("admission"):
+        pass
+    trace.merge({"substitution": {"wall_ms": 1.0, "peak_rss_kb": 10 ** 9}}, "worker")
+    payload = trace.finish()
+    assert payload["stages"]["substitution"]["process"] == "worker"
+    assert "process" not in payload["stages"]["admission"]
+    assert payload.get("peak_rss_kb", 0) < 10 ** 9
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+import job_queue
+import pdf_pool
+import renderer
+from admission import MemoryBudget
+from conftest import zip_members
+from job_queue import ADMITTING, DONE, FAILED, TIMED_OUT, Job, JobQueue
+from render_cache import RenderCache
+from renderer import lookup_render
+
+PLACEHOLDERS = {"<<Client Name>>": "Acme"}
+
+
+@pytest.fixture(scope="module")
+def jobs():
+    queue = JobQueue(workers=1, max_queue=4, timeout=60, render_cache=None)
+    yield queue
+    queue.close()
+
+
+def _finished(status, size):
+    job = Job("test", "template.docx", {}, "DOCX", 60)
+    job.status, job.result = status, b"x" * size
+    return job
+
+
+def test_renders_and_releases(jobs, template_path):
+    job_id = jobs.submit("test", template_path, PLACEHOLDERS)
+    job = jobs.wait(job_id, timeout=60)
+    assert job.status == DONE, job.error
+    assert zip_members(job.result)
+    assert jobs.release(job_id) is job
+    assert jobs.get(job_id) is None
+
+
+def test_missing_template_fails_the_job(jobs, tmp_path):
+    job = jobs.wait(jobs.submit("test", str(tmp_path / "missing.docx"), PLACEHOLDERS), timeout=60)
+    assert job.status == FAILED
+    assert "Template file not found" in job.error
+
+
+def test_handoff_leaves_the_trace_open(jobs, template_path):
+    job = jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS, handoff=True), timeout=60)
+    assert job.status == DONE
+    with job.trace.stage("download_handoff"):
+        pass
+    payload = job.finish_trace()
+    assert "download_handoff" in payload["stages"]
+    # Measured in the render worker, not in this process
+    assert payload["stages"]["template_load"]["process"] == "worker"
+    assert "process" not in payload["stages"]["download_handoff"]
+    assert payload["output_bytes"] == len(job.result)
+    assert job.finish_trace() is None
+
+
+def test_waits_for_memory_as_admitting_and_is_not_released_early(jobs, template_path, monkeypatch):
+    budget = MemoryBudget(1024, max_wait=30)
+    monkeypatch.setattr(job_queue, "RENDER_BUDGET", budget)
+    release = threading.Event()
+
+    def hold_budget(held):
+        with budget.admit(template_path, "fragments"):
+            held.set()
+            release.wait(30)
+
+    held = threading.Event()
+    holder = threading.Thread(target=hold_budget, args=(held,))
+    holder.start()
+    held.wait(10)
+    try:
+        job_id = jobs.submit("test", template_path, PLACEHOLDERS)
+        deadline = time.monotonic() + 10
+        while jobs.get(job_id).status != ADMITTING:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert jobs.snapshot()[ADMITTING] == 1
+        assert jobs.release(job_id) is None
+        assert jobs.get(job_id) is not None
+    finally:
+        release.set()
+        holder.join()
+    assert jobs.wait(job_id, timeout=60).status == DONE
+
+
+def test_trims_finished_jobs_by_count_and_bytes():
+    queue = JobQueue(workers=0, history=3, history_bytes=25)
+    old, middle, new = (_finished(DONE, 10) for _ in range(3))
+    running = Job("test", "template.docx", {}, "DOCX", 60)
+    for job in (old, running, middle, new):
+        queue._jobs[job.id] = job
+    with queue._lock:
+        queue._trim()
+    # Over both limits: the oldest finished job goes, the running one stays
+    assert list(queue._jobs) == [running.id, middle.id, new.id]
+    assert queue.snapshot()["held_bytes"] == 20
+
+
+def test_timed_out_job_is_killed(jobs, template_path):
+    job = jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS, timeout=0.001), timeout=60)
+    assert job.status == TIMED_OUT
+    # The worker is restarted for the next job
+    assert jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS), timeout=60).status == DONE
+    assert jobs.snapshot()["worker_restarts"] >= 1
+
+
+def test_pdf_timeout_times_the_job_out(jobs, template_path, fake_pdf_pool, monkeypatch):
+    pool, _ = fake_pdf_pool(hang=True)
+    monkeypatch.setattr(pdf_pool, "_pool", pool)
+    # The conversion gets what is left of the job's own timeout
+    job = jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS, output_format="PDF", timeout=2), timeout=60)
+    assert job.status == TIMED_OUT
+    assert job.error.startswith("PDF conversion timed out after")
+
+
+def test_failure_without_a_message_is_named(jobs, template_path, monkeypatch):
+    def raise_bare(*args, **kwargs):
+        raise TimeoutError()
+
+    monkeypatch.setattr(jobs, "_render", raise_bare)
+    job = jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS), timeout=60)
+    assert (job.status, job.error) == (FAILED, "TimeoutError")
+
+
+def test_media_optimized_output_has_a_key_of_its_own(template_path, monkeypatch):
+    cache = RenderCache()
+    optimized, _ = lookup_render(template_path, PLACEHOLDERS, "docx", render_cache=cache, optimize_media=True)
+    cache.put(optimized, b"optimized")
+    queue = JobQueue(workers=1, render_cache=cache)
+    try:
+        monkeypatch.setattr(renderer, "MEDIA_OPTIMIZE", True)
+        job = queue.wait(queue.submit("test", template_path, PLACEHOLDERS), timeout=60)
+        assert (job.result, job.cache_hit) == (b"optimized", True)
+        monkeypatch.setattr(renderer, "MEDIA_OPTIMIZE", False)
+        job = queue.wait(queue.submit("test", template_path, PLACEHOLDERS), timeout=60)
+        assert job.status == DONE
+        assert not job.cache_hit
+        assert zip_members(job.result)
+    finally:
+        queue.close()
+
+
+def test_admission_charges_the_engine_the_template_uses(jobs, template_path, monkeypatch):
+    engines = []
+
+    class Budget(MemoryBudget):
+        def admit(self, template_path, engine, timeout=None):
+            engines.append(engine)
+            return super().admit(template_path, engine, timeout)
+
+    monkeypatch.setattr(job_queue, "RENDER_BUDGET", Budget(1024 * 1024 * 1024))
+    for _ in range(2):
+        assert jobs.wait(jobs.submit("test", template_path, PLACEHOLDERS), timeout=60).status == DONE
+    # Sized as python-docx until the worker has compiled the template into the shared store
+    assert engines == ["docx", "fragments"]
@@ -0,0 +1,68 @@
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+from docx.shared import Inches
+from PIL import Image, ImageCms
+
+from media_optimizer import _EXIF_ORIENTATION, MediaOptimizer
+
+_EXIF_ARTIST = 0x013B
+
+
+def _jpeg(orientation=1, mode="RGB", size=(400, 300)):
+    """A noisy JPEG at top quality, tagged with an artist, an orientation and an sRGB profile"""
+    image = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).convert(mode)
+    exif = Image.Exif()
+    exif[_EXIF_ARTIST] = "Proposal Team"
+    exif[_EXIF_ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes() if mode == "RGB" else None
+    image.save(buffer, "JPEG", quality=100, exif=exif.tobytes(),
+               **({"icc_profile": icc_profile} if icc_profile else {}))
+    return buffer.getvalue()
+
+
+def _template(tmp_path, image):
+    doc = Document()
+    doc.add_paragraph("<<Client Name>>")
+    doc.add_paragraph().add_run().add_picture(io.BytesIO(image), width=Inches(1))
+    path = tmp_path / "template.docx"
+    doc.save(str(path))
+    return str(path)
+
+
+def test_downsampled_jpeg_keeps_exif_and_icc_profile():
+    original = _jpeg()
+    data, pixels = MediaOptimizer(dpi=100)._optimize_image(original, "JPEG", (914400, 685800))
+    assert pixels == (100, 75)
+    with Image.open(io.BytesIO(data)) as image, Image.open(io.BytesIO(original)) as before:
+        assert image.getexif()[_EXIF_ARTIST] == "Proposal Team"
+        assert image.info["icc_profile"] == before.info["icc_profile"]
+
+
+@pytest.mark.parametrize("orientation, mode", [(6, "RGB"), (2, "RGB"), (1, "CMYK")])
+def test_rotated_and_cmyk_images_are_kept(orientation, mode):
+    assert MediaOptimizer(dpi=100)._optimize_image(_jpeg(orientation, mode), "JPEG", (914400, 685800)) is None
+
+
+def test_plan_shrinks_the_document_and_keeps_it_valid(tmp_path):
+    path = _template(tmp_path, _jpeg())
+    with open(path, "rb") as f:
+        source = f.read()
+    plan = MediaOptimizer(dpi=100).plan(path, "digest")
+    optimized = plan.apply(source)
+    assert len(optimized) < len(source)
+    with zipfile.ZipFile(io.BytesIO(optimized)) as z:
+        assert z.testzip() is None
+    Document(io.BytesIO(optimized))
+
+
+def test_plans_are_kept_for_the_most_recent_templates(tmp_path):
+    path = _template(tmp_path, _jpeg(size=(40, 30)))
+    optimizer = MediaOptimizer(max_plans=2)
+    plans = [optimizer.plan(path, digest) for digest in ("a", "b", "a", "c")]
+    assert list(optimizer._plans) == ["a", "c"]
+    assert plans[2] is plans[0]
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import VARIANTS
+from pdf_pool import PdfConverterPool, PdfTimeout, find_soffice
+from renderer import render_document
+from template_cache import TemplateCache
+
+
+def _jobs(log):
+    return len(log.read_text().splitlines())
+
+
+def test_converts_on_a_warm_worker(fake_pdf_pool):
+    pool, log = fake_pdf_pool()
+    assert pool.convert(b"docx") == b"%PDF-1.4 fake\n"
+    assert pool.convert(b"docx") == b"%PDF-1.4 fake\n"
+    assert _jobs(log) == 2 and pool.restarts == 0
+
+
+def test_conversion_past_its_timeout_raises_pdf_timeout(fake_pdf_pool):
+    pool, _ = fake_pdf_pool(timeout=0.5)
+    with pytest.raises(PdfTimeout, match="timed out after 0.5s"):
+        pool.convert(b"hang")
+    # The hung worker was killed; the next job gets a fresh one
+    assert pool.convert(b"docx") == b"%PDF-1.4 fake\n"
+    assert pool.restarts == 1
+
+
+def test_job_the_caller_gave_up_on_is_not_converted(fake_pdf_pool):
+    pool, log = fake_pdf_pool(timeout=1)
+    blocker = pool.submit(b"hang")
+    with pytest.raises(PdfTimeout, match="No PDF worker was free"):
+        pool.convert(b"docx", timeout=0.1)
+    with pytest.raises(PdfTimeout):
+        blocker.result(timeout=10)
+    assert pool.convert(b"docx") == b"%PDF-1.4 fake\n"
+    # The blocker and the last job; the abandoned one never reached a worker
+    assert _jobs(log) == 2
+
+
+@pytest.mark.skipif(find_soffice() is None, reason="LibreOffice is not installed")
+def test_converts_with_libreoffice(template_files):
+    docx = render_document(template_files["nested"], VARIANTS[0][1], cache=TemplateCache(), render_cache=None,
+                           budget=None)
+    pool = PdfConverterPool(size=1)
+    try:
+        pdf = pool.convert(docx)
+        assert pdf.startswith(b"%PDF")
+        # The worker stays warm for the next document
+        assert pool.convert(docx).startswith(b"%PDF")
+        assert pool.restarts == 0
+    finally:
+        pool.close()
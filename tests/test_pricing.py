@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from pricing import price_scenarios, quote, scenario_grid
+from proposal_config import PROPOSAL_CONFIG
+
+PROPOSAL = "Make & CRM Automation"
+
+
+@pytest.fixture
+def no_prices(monkeypatch):
+    monkeypatch.setitem(PROPOSAL_CONFIG, "Consulting", dict(PROPOSAL_CONFIG[PROPOSAL], pricing_fields=[]))
+    return "Consulting"
+
+
+def test_quote():
+    result = quote(PROPOSAL, {"M-Price": 1500, "C-Price": 901}, "USD", discount=0.1)
+    assert result == {"services": 2401, "discount": 240, "maintenance": 216, "total": 2377, "addon": 250,
+                      "currency": "USD"}
+
+
+def test_scenarios_match_single_quotes():
+    prices = np.array([[1000, 0], [1500, 900], [7, 3]])
+    batch = price_scenarios(PROPOSAL, prices, discounts=[0.0, 0.25, 0.5], currencies=["USD", "INR", "USD"])
+    for n, (row, discount, currency) in enumerate(zip(prices, [0.0, 0.25, 0.5], ["USD", "INR", "USD"])):
+        single = quote(PROPOSAL, {"M-Price": row[0], "C-Price": row[1]}, currency, discount)
+        assert {name: values[n] for name, values in batch.items()} == single
+
+
+def test_quote_without_pricing_fields(no_prices):
+    assert quote(no_prices, {}, "INR") == {"services": 0, "discount": 0, "maintenance": 0, "total": 0,
+                                           "addon": 25000, "currency": "INR"}
+
+
+def test_scenario_grid_without_pricing_fields(no_prices):
+    grid = scenario_grid(no_prices, {}, discounts=(0.0, 0.1), currencies=("USD", "INR"))
+    assert len(grid["total"]) == 4
+    assert not grid["total"].any()
+    assert list(grid["addon"]) == [250, 25000, 250, 25000]
+
+
+def test_wrong_number_of_price_columns():
+    with pytest.raises(ValueError, match="Expected 2 price columns"):
+        price_scenarios(PROPOSAL, [[1, 2, 3]])
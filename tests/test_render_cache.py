@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import pytest
+
+import render_cache
+import renderer
+from instrumentation import RenderTrace
+from render_cache import RenderCache, render_key
+from template_cache import TemplateCache
+
+PLACEHOLDERS = {"<<Client Name>>": "Acme", "<<Date>>": "01-01-2026"}
+
+
+def test_key_depends_on_template_placeholders_and_format():
+    key = render_key("abc", PLACEHOLDERS)
+    assert key == render_key("abc", dict(reversed(list(PLACEHOLDERS.items()))))
+    assert key != render_key("abd", PLACEHOLDERS)
+    assert key != render_key("abc", dict(PLACEHOLDERS, **{"<<Date>>": "02-01-2026"}))
+    assert key != render_key("abc", PLACEHOLDERS, "pdf")
+
+
+def test_key_changes_with_render_version(monkeypatch):
+    key = render_key("abc", PLACEHOLDERS)
+    monkeypatch.setattr(render_cache, "RENDER_VERSION", render_cache.RENDER_VERSION + 1)
+    assert render_key("abc", PLACEHOLDERS) != key
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    RenderCache(disk_dir=str(tmp_path)).put("ab" * 32, b"data")
+    cache = RenderCache(disk_dir=str(tmp_path))
+    assert cache.get("ab" * 32) == b"data"
+    assert cache.snapshot()["disk_hits"] == 1
+
+
+def test_unwritable_disk_tier_still_caches_in_memory(tmp_path, monkeypatch, caplog):
+    cache = RenderCache(disk_dir=str(tmp_path))
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tempfile, "mkstemp", disk_full)
+    cache.put("cd" * 32, b"data")
+    assert "Could not write" in caplog.text
+    assert cache.get("cd" * 32) == b"data"
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files]
+
+
+def test_unusable_disk_directory_disables_the_disk_tier(tmp_path, caplog):
+    blocker = tmp_path / "file"
+    blocker.write_bytes(b"")
+    cache = RenderCache(disk_dir=str(blocker / "cache"))
+    assert cache.disk_dir is None
+    assert "unusable" in caplog.text
+    cache.put("ef" * 32, b"data")
+    assert cache.get("ef" * 32) == b"data"
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["fragments", "stream"])
+def test_trace_reports_cache_hits(template_path, monkeypatch, stream):
+    if stream:
+        monkeypatch.setattr(renderer, "STREAM_TEMPLATE_MB", 0.000001)
+    cache, outputs = TemplateCache(), RenderCache()
+    first, second = RenderTrace("test"), RenderTrace("test")
+    data = renderer.render_document(template_path, PLACEHOLDERS, cache=cache, trace=first, render_cache=outputs,
+                                    budget=None)
+    again = renderer.render_document(template_path, PLACEHOLDERS, cache=cache, trace=second, render_cache=outputs,
+                                     budget=None)
+    assert again == data
+    assert (first.cache_hit, second.cache_hit) == (False, True)